@@ -1,8 +1,20 @@
 # app.py
+import os
+import time
+
+_page_start = time.perf_counter()
+
 import streamlit as st
-from model.mobilenet_model import predict_image
+from model import loader as image_model
+from model import image_store, similar_cases
+from utils import metrics, result_cache, triage_journal
+from utils.artifacts import check_freshness
+from utils.differential import rank_differential
 from utils.helpers import analyze_symptoms
 
+# Sampling profiler, only if $METRICS_PROFILE_HZ is set
+metrics.start_profiler()
+
 # Page configuration
 st.set_page_config(
     page_title="AI Clinic Buddy",
@@ -92,14 +104,62 @@ with st.sidebar:
     - Improves healthcare access
     """)
     
+    st.markdown("---")
+    st.markdown("### 🧠 Image Model")
+    model_state, model_detail = image_model.status()
+    if model_state == image_model.READY:
+        st.success(f"Ready ({model_detail})")
+    elif model_state == image_model.FAILED:
+        st.error(f"Unavailable: {model_detail}")
+    else:
+        st.info("Loading in the background. Symptom analysis is available now.")
+    
+    # Stat-only check against data/artifacts.json; the sources are not re-read
+    stale_artifacts = check_freshness()
+    if stale_artifacts:
+        st.warning("Derived data is out of date: " + ", ".join(
+            f"{name} ({reason})" for name, reason in sorted(stale_artifacts.items())
+        ) + ". Run `python scripts/build_artifacts.py`.")
+    
     st.markdown("---")
     st.markdown("### 🔒 Privacy & Security")
-    st.markdown("""
-    - No personal data stored
-    - Images processed temporarily
+    retention_hours = image_store.get_store().max_age / 3600
+    st.markdown(f"""
+    - Symptom notes are kept only as keys of the result cache, so repeated notes are answered at once
+    - Uploaded photos (with a thumbnail and the model input) are kept on this server for up to
+      {retention_hours:.0f} hours after they were last viewed, then deleted
     - Local or secure cloud processing
     - Transparent AI decisions
     """)
+    if os.environ.get(result_cache.CACHE_DIR_ENV_VAR):
+        st.caption("The result cache is saved to disk, so its notes outlive a restart.")
+    if similar_cases.enabled():
+        st.caption("Similar-case archive is on: image embeddings and results are kept, never the photos.")
+    
+    journal = triage_journal.get_journal()
+    if journal is not None:
+        st.markdown("### 📡 Offline Sync")
+        st.caption("Results are journaled on this device (risk, confidence, symptom codes and a photo hash; "
+                   "never the notes or photos).")
+        sync_url = os.environ.get(triage_journal.SYNC_URL_ENV_VAR)
+        if sync_url and st.button("Sync now", use_container_width=True):
+            try:
+                report = journal.sync(sync_url, triage_journal.device_id())
+                st.success(f"Uploaded {report.records} results ({report.sent_bytes / 1024:.1f} KB)")
+            except OSError as e:
+                st.warning(f"Offline, results stay on the device: {e}")
+        st.caption(f"{journal.pending} results waiting to be uploaded")
+    
+    if os.environ.get(metrics.SIDEBAR_ENV_VAR):
+        with st.expander("📈 Performance"):
+            snapshot = metrics.snapshot()
+            st.table([{"stage": name, "count": stage["count"], "mean ms": stage["mean_ms"],
+                       "p95 ms ≤": stage["p95_ms"]} for name, stage in snapshot["stages"].items()])
+            for name, cache in snapshot["caches"].items():
+                if cache["hit_rate"] is not None:
+                    st.caption(f"{name}: {cache['hit_rate']:.0%} cache hits")
+            for error in snapshot["errors"]:
+                st.caption(f"⚠️ {error['stage']}: {error['count']} × {error['type']}")
 
 # Main content area
 st.markdown("---")
@@ -109,19 +169,42 @@ col1, col2 = st.columns([1, 1])
 
 with col1:
     st.subheader("📷 Image Analysis")
+    # A new key empties the uploader, so the session keeps only a reference to the stored photo
+    uploader_key = f"image_upload_{st.session_state.get('upload_generation', 0)}"
     uploaded_file = st.file_uploader(
         "Upload a medical image",
         type=["jpg", "jpeg", "png"],
-        help="Upload images of rashes, wounds, eye infections, or skin conditions"
+        help="Upload images of rashes, wounds, eye infections, or skin conditions",
+        key=uploader_key,
     )
-    
     if uploaded_file:
-        st.image(uploaded_file, caption="Uploaded image", use_container_width=True)
+        try:
+            st.session_state.image_ref = image_store.get_store().put(uploaded_file)
+        except ValueError:
+            st.session_state.image_ref = None
+            st.session_state.image_error = "⚠️ This file could not be read as an image. Please upload a JPG or PNG photo."
+        st.session_state.upload_generation = st.session_state.get("upload_generation", 0) + 1
+        st.rerun()
+    if st.session_state.get("image_error"):
+        st.error(st.session_state.pop("image_error"))
+    
+    image_ref = st.session_state.get("image_ref")
+    if image_ref is not None and image_store.get_store().get(image_ref.key) is None:
+        st.info("The previous image has expired. Please upload it again.")
+        image_ref = st.session_state.image_ref = None
+    
+    if image_ref is not None:
+        st.image(image_ref.thumbnail, caption="Uploaded image", use_container_width=True)
         if st.button("🔍 Analyze Image", type="primary", use_container_width=True):
-            with st.spinner("🤖 AI is analyzing the image..."):
-                risk, recommendation, educational_note, confidence = predict_image(uploaded_file)
+            spinner_text = ("🤖 AI is analyzing the image..." if image_model.is_ready()
+                            else "🧠 Loading the image model, then analyzing...")
+            with st.spinner(spinner_text):
+                # Blocks this session's script run until the result is in. With a model server the
+                # inference runs in a worker process, so other sessions are not held up meanwhile
+                risk, recommendation, educational_note, confidence = image_model.predict_image(image_ref.model_input)
             
             # Display results with styling
+            render_start = time.perf_counter()
             risk_colors = {
                 "High": ("🔴", "risk-high", "#f44336"),
                 "Medium": ("🟠", "risk-medium", "#ff9800"),
@@ -143,6 +226,27 @@ with col1:
             st.markdown(f"**💡 Educational Note:**")
             st.markdown(educational_note)
             st.markdown('</div>', unsafe_allow_html=True)
+            metrics.observe("render_result", time.perf_counter() - render_start)
+            
+            if journal is not None:
+                try:
+                    journal.record_image(image_ref.digest, risk, confidence)
+                except Exception as e:
+                    print(f"⚠️ Could not journal the image result: {e}")
+
+            if image_model.is_ready() and similar_cases.enabled():
+                try:
+                    similar = similar_cases.record_and_find_similar(image_ref.model_input, risk, confidence)
+                except Exception as e:
+                    similar = []
+                    print(f"⚠️ Similar case lookup failed: {e}")
+                if similar:
+                    with st.expander("🗂️ Similar previous cases (for the health worker)"):
+                        for case in similar:
+                            case_emoji = risk_colors.get(case["risk"], ("⚪",))[0]
+                            seen = time.strftime("%Y-%m-%d", time.localtime(case["time"]))
+                            st.markdown(f"- {case_emoji} **{case['risk']}** ({case['confidence']:.0%} confidence), "
+                                        f"{seen} · similarity {case['similarity']:.0%}")
 
 with col2:
     st.subheader("📝 Symptom Analysis")
@@ -179,6 +283,7 @@ Low risk examples:
                 risk, recommendation, educational_note = analyze_symptoms(symptoms)
             
             # Display results with styling
+            render_start = time.perf_counter()
             risk_colors = {
                 "High": ("🔴", "risk-high", "#f44336"),
                 "Medium": ("🟠", "risk-medium", "#ff9800"),
@@ -197,6 +302,24 @@ Low risk examples:
             st.markdown(f"**💡 Educational Note:**")
             st.markdown(educational_note)
             st.markdown('</div>', unsafe_allow_html=True)
+            metrics.observe("render_result", time.perf_counter() - render_start)
+            
+            if journal is not None:
+                try:
+                    journal.record_symptoms(symptoms, risk)
+                except Exception as e:
+                    print(f"⚠️ Could not journal the symptom result: {e}")
+            
+            differential = rank_differential(symptoms, k=3)
+            if differential:
+                with st.expander("🩻 Conditions with similar symptoms (for the health worker)"):
+                    for candidate in differential:
+                        st.markdown(f"**{candidate.disease}** — match {candidate.score:.0%}")
+                        st.caption(f"Matched: {', '.join(candidate.matched_symptoms)}")
+                        if candidate.description:
+                            st.markdown(candidate.description)
+                        if candidate.precautions:
+                            st.markdown("Precautions: " + "; ".join(candidate.precautions))
 
 # Disclaimer section
 st.markdown("---")
@@ -225,3 +348,9 @@ st.markdown("""
     <p>Empowering healthcare workers through ethical AI</p>
 </div>
 """, unsafe_allow_html=True)
+
+# Whole script run, including any analysis triggered by this interaction
+metrics.observe("page_run", time.perf_counter() - _page_start)
+
+# Load TensorFlow and the image model only after the first page has rendered
+image_model.start_loading()
@@ -0,0 +1,289 @@
+"""
+Load-adaptive inference over a ladder of MobileNetV2 variants
+
+Selected with INFERENCE_BACKEND=adaptive. Next to the full model (alpha
+1.0 at 224x224, loaded like the Keras engine, warm-start snapshot
+included) it keeps cheaper variants loaded and warm, by default
+
+    0.75@160    0.5@128    0.35@96
+
+($ADAPTIVE_VARIANTS takes the same "alpha@resolution" list). Every variant
+takes the usual 224x224 batch and resizes it inside its traced graph, so
+preprocessing, micro-batching and the model server are unchanged.
+
+For each forward pass a LoadController picks the level from the images in
+flight (plus the model server backlog, when there is one) and the p95
+latency of recent passes. It moves one step cheaper when either crosses
+its threshold, and one step back once both are well below it and the
+level has held for a while. Images a cheaper variant is unsure of (top-1
+probability below `escalate_below`) are run again on the full model.
+
+Results of cheaper variants are not written to the result cache, whose
+keys name the full model. Only the ImageNet classifier adapts; with a
+trained image head, images are scored from backbone embeddings as before.
+TensorFlow is only imported when the engine is built.
+"""
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from model import warm_start
+from utils import metrics
+
+VARIANTS_ENV_VAR = "ADAPTIVE_VARIANTS"
+
+
+class Variant(NamedTuple):
+    """One MobileNetV2 width multiplier and input resolution."""
+    alpha: float
+    resolution: int
+
+    @property
+    def name(self) -> str:
+        return f"mobilenet_v2_{self.alpha}_{self.resolution}"
+
+    @property
+    def cost(self) -> float:
+        """Relative compute of a forward pass (about alpha² · resolution²)."""
+        return self.alpha ** 2 * self.resolution ** 2
+
+
+FULL = Variant(1.0, 224)
+DEFAULT_VARIANTS = (Variant(0.75, 160), Variant(0.5, 128), Variant(0.35, 96))
+# Widths and resolutions Keras has ImageNet weights for
+ALPHAS = (0.35, 0.5, 0.75, 1.0, 1.3, 1.4)
+RESOLUTIONS = (96, 128, 160, 192, 224)
+
+
+def parse_variants(spec: str) -> tuple:
+    """
+    Cheaper variants from "alpha@resolution,..." text, most expensive first.
+
+    Raises:
+        ValueError: A variant is malformed or has no ImageNet weights
+    """
+    variants = set()
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        alpha, _, resolution = item.partition("@")
+        variant = Variant(float(alpha), int(resolution))
+        if variant.alpha not in ALPHAS or variant.resolution not in RESOLUTIONS:
+            raise ValueError(f"No ImageNet weights for MobileNetV2 {item!r}")
+        if variant != FULL:
+            variants.add(variant)
+    return tuple(sorted(variants, key=lambda variant: -variant.cost))
+
+
+def configured_variants() -> tuple:
+    """Cheaper variants from $ADAPTIVE_VARIANTS, or DEFAULT_VARIANTS."""
+    spec = os.environ.get(VARIANTS_ENV_VAR)
+    return parse_variants(spec) if spec else DEFAULT_VARIANTS
+
+
+def build_variant_engine(variant: Variant):
+    """An InferenceEngine serving one variant on 224x224 batches."""
+    import tensorflow as tf
+    from model.mobilenet_model import INPUT_SIGNATURE, InferenceEngine
+    size = (variant.resolution, variant.resolution)
+    model = tf.keras.applications.MobileNetV2(
+        alpha=variant.alpha,
+        input_shape=(*size, 3),
+        weights=warm_start.weights_path(variant.alpha, variant.resolution),
+        include_top=True,
+    )
+    serving_fn = tf.function(
+        lambda images: model(tf.image.resize(images, size), training=False),
+        input_signature=[INPUT_SIGNATURE],
+    )
+    return InferenceEngine(model, serving_fn=serving_fn, version=f"{variant.name}-keras")
+
+
+class LoadController:
+    """Chooses the serving level (0 = full model) from queue depth and recent latency."""
+
+    def __init__(self, levels: int, depth_high: int = 8, p95_high: float = 0.25, window: int = 32,
+                 hold: float = 5.0, recover_ratio: float = 0.5):
+        """
+        Args:
+            levels: Number of levels, the full model being level 0
+            depth_high: Images in flight above which to step down
+            p95_high: Seconds of p95 pass latency above which to step down
+            window: Recent passes the p95 is taken over
+            hold: Seconds a level is kept before stepping back up
+            recover_ratio: Fraction of both thresholds to be under before stepping back up
+        """
+        self.levels = levels
+        self.depth_high = depth_high
+        self.p95_high = p95_high
+        self.hold = hold
+        self.recover_ratio = recover_ratio
+        self.level = 0
+        self._latencies = deque(maxlen=window)
+        self._changed = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """Latency of one pass, at the level it was served at."""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def p95(self) -> float:
+        with self._lock:
+            latencies = sorted(self._latencies)
+        return latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+
+    def choose(self, depth: int) -> int:
+        """Level for the next pass, given the images now in flight."""
+        p95 = self.p95()
+        with self._lock:
+            now = time.monotonic()
+            if (depth > self.depth_high or p95 > self.p95_high) and self.level < self.levels - 1:
+                self._step(self.level + 1, now)
+            elif (self.level > 0 and now - self._changed >= self.hold
+                  and depth <= self.depth_high * self.recover_ratio and p95 <= self.p95_high * self.recover_ratio):
+                self._step(self.level - 1, now)
+            return self.level
+
+    def reset(self):
+        """Back to the full model with no latency history."""
+        with self._lock:
+            self._step(0, time.monotonic())
+
+    def _step(self, level: int, now: float):
+        # Latencies of the previous level say nothing about the new one
+        self.level = level
+        self._changed = now
+        self._latencies.clear()
+
+
+class AdaptiveEngine:
+    """
+    Serves the variant ladder with the same interface as InferenceEngine.
+    """
+
+    def __init__(self, full, variants: Sequence[tuple] = (), escalate_below: float = 0.4,
+                 controller: Optional[LoadController] = None, backlog: Optional[Callable[[], int]] = None):
+        """
+        Args:
+            full: Engine of the full model
+            variants: (Variant, engine) pairs, most expensive first
+            escalate_below: Top-1 probability under which a cheaper variant's answer is redone
+            controller: Level chooser (defaults to a LoadController over all levels)
+            backlog: Images queued ahead of this engine (e.g. the model server's request queue)
+        """
+        self.engines = [(FULL, full), *variants]
+        self.version = full.version
+        self.escalate_below = escalate_below
+        self.controller = controller or LoadController(len(self.engines))
+        self.backlog = backlog
+        self.warm = False
+        self.served = Counter()
+        self.escalated = Counter()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._last = threading.local()
+
+    @classmethod
+    def build(cls, full, variants: Optional[Sequence[Variant]] = None, **kwargs) -> "AdaptiveEngine":
+        """Load the cheaper variants (default: configured_variants()) next to a full-model engine."""
+        variants = configured_variants() if variants is None else variants
+        return cls(full, [(variant, build_variant_engine(variant)) for variant in variants], **kwargs)
+
+    def warmup(self, batch_sizes=(1,)):
+        """Warm every variant, so a step down never pays for tracing."""
+        for _, engine in self.engines:
+            if not engine.warm:
+                engine.warmup(batch_sizes)
+        self.warm = True
+        return self
+
+    def reset(self):
+        """Forget load and counts, e.g. of the warm-up passes."""
+        self.controller.reset()
+        with self._lock:
+            self.served.clear()
+            self.escalated.clear()
+
+    def depth(self) -> int:
+        try:
+            queued = self.backlog() if self.backlog is not None else 0
+        except NotImplementedError:  # multiprocessing queues cannot count on macOS
+            queued = 0
+        return self._in_flight + queued
+
+    def predict(self, batch):
+        """
+        Run a batch at the level the current load calls for.
+
+        Args:
+            batch: Array of shape (N, 224, 224, 3)
+
+        Returns:
+            np.ndarray: Class probabilities of shape (N, 1000)
+        """
+        count = len(batch)
+        with self._lock:
+            self._in_flight += count
+        start = time.perf_counter()
+        try:
+            level = self.controller.choose(self.depth())
+            variant, engine = self.engines[level]
+            with metrics.timed(f"forward {variant.name}"):
+                probabilities = engine.predict(batch)
+            served = [variant.name] * count
+            if level:
+                unsure = np.flatnonzero(probabilities.max(axis=1) < self.escalate_below)
+                if unsure.size:
+                    probabilities = np.array(probabilities)  # .numpy() may hand out a read-only view
+                    with metrics.timed(f"forward {FULL.name}"):
+                        probabilities[unsure] = self.engines[0][1].predict(np.asarray(batch)[unsure])
+                    for i in unsure:
+                        served[i] = FULL.name
+                    with self._lock:
+                        self.escalated[variant.name] += int(unsure.size)
+        finally:
+            with self._lock:
+                self._in_flight -= count
+        self.controller.record(time.perf_counter() - start)
+        with self._lock:
+            self.served.update(served)
+        self._last.variants = served
+        return probabilities
+
+    def last_variants(self) -> List[str]:
+        """Variant that served each image of this thread's last predict() call."""
+        return getattr(self._last, "variants", [])
+
+    def last_full(self) -> bool:
+        """Whether every image of this thread's last predict() call was served by the full model."""
+        return all(name == FULL.name for name in self.last_variants())
+
+
+_active: Optional[AdaptiveEngine] = None
+
+
+def activate(engine: AdaptiveEngine) -> AdaptiveEngine:
+    """Make `engine` the one reported in the metrics."""
+    global _active
+    _active = engine
+    return engine
+
+
+@metrics.register_collector
+def _variant_samples():
+    """Images served and escalated per variant, the current level and its p95."""
+    engine = _active
+    if engine is None:
+        return
+    level = engine.controller.level
+    for index, (variant, _) in enumerate(engine.engines):
+        labels = {"variant": variant.name}
+        yield "image_variant_active", labels, int(index == level)
+        yield "image_variant_images_total", labels, engine.served[variant.name]
+        if index:
+            yield "image_variant_escalations_total", labels, engine.escalated[variant.name]
+    yield "image_variant_pass_p95_seconds", {}, engine.controller.p95()
+    yield "image_variant_depth", {}, engine.depth()
@@ -0,0 +1,113 @@
+"""
+Dynamic micro-batching for concurrent image inference requests
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from model.mobilenet_model import UNKNOWN_RESULT, predict_arrays, preprocess_image
+
+
+class MicroBatcher:
+    """
+    Collects concurrent image requests and serves them with one forward pass.
+
+    Callers submit images from any thread. A background worker waits for the
+    first request, then keeps collecting until it has ``max_batch_size``
+    images or ``max_wait_ms`` milliseconds have passed, runs a single batched
+    prediction and resolves each caller's future with its own result.
+    """
+
+    def __init__(self, max_batch_size=16, max_wait_ms=10.0, predict_fn=predict_arrays):
+        """
+        Args:
+            max_batch_size: Largest number of images per forward pass
+            max_wait_ms: Longest time to hold the first request while filling a batch
+            predict_fn: Function mapping a list of preprocessed arrays to results
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.predict_fn = predict_fn
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit_array(self, array) -> Future:
+        """
+        Queue an already preprocessed image.
+
+        Args:
+            array: (224, 224, 3) model input array
+
+        Returns:
+            Future: Resolves to (risk_level, recommendation, educational_note, confidence)
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("MicroBatcher has been stopped")
+        future = Future()
+        self._queue.put((array, future))
+        return future
+
+    def submit(self, uploaded_file) -> Future:
+        """
+        Decode an image on the calling thread and queue it for inference.
+
+        Args:
+            uploaded_file: Uploaded image file
+
+        Returns:
+            Future: Resolves to (risk_level, recommendation, educational_note, confidence)
+        """
+        try:
+            array = preprocess_image(uploaded_file)
+        except Exception:
+            future = Future()
+            future.set_result(UNKNOWN_RESULT)
+            return future
+        return self.submit_array(array)
+
+    def predict(self, uploaded_file, timeout=None):
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(uploaded_file).result(timeout=timeout)
+
+    def stop(self):
+        """Stop the worker after it drains requests already queued."""
+        self._stopped.set()
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self):
+        """Block for the first request, then fill the batch until full or timed out."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            arrays = [array for array, _ in batch]
+            try:
+                results = self.predict_fn(arrays)
+            except Exception:
+                results = [UNKNOWN_RESULT] * len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
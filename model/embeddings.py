@@ -0,0 +1,270 @@
+"""
+Pooled backbone embeddings with a content-addressed feature cache
+
+Images are embedded by one or more headless ImageNet backbones (global
+average pooled features, include_top=False). Each backbone's embedding of an
+image is cached on disk under a hash of the image bytes and the backbone
+version, so training, evaluating or swapping the head over the same images
+never runs a backbone twice. TensorFlow is only imported when a backbone has
+to run, so re-scoring from cached embeddings does not load it at all.
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from model.preprocessing import IMAGE_SIZE, preprocess_into, read_upload
+from utils import metrics
+from utils.result_cache import content_key
+from utils.symptom_index import DATA_DIR
+
+EMBEDDING_CACHE_DIR = os.path.join(DATA_DIR, "embeddings")
+# Comma separated backbones concatenated into one feature vector
+BACKBONES_ENV_VAR = "IMAGE_BACKBONES"
+DEFAULT_BACKBONES = ("mobilenet_v2",)
+
+
+def _mobilenet_v2():
+    import tensorflow as tf
+    from model.mobilenet_model import get_model
+    # Shares weights with the classifier: its pooled features feed the "predictions" layer
+    model = get_model()
+    return tf.keras.Model(model.input, model.get_layer("predictions").input), lambda images: images
+
+
+def _efficientnet_b0():
+    import tensorflow as tf
+    model = tf.keras.applications.EfficientNetB0(
+        weights="imagenet", include_top=False, pooling="avg", input_shape=(IMAGE_SIZE, IMAGE_SIZE, 3)
+    )
+    # EfficientNet rescales internally and expects pixels in [0, 255], inputs here are in [-1, 1]
+    return model, lambda images: (images + 1.0) * 127.5
+
+
+# Backbone name -> builder returning (pooled feature model, input transform)
+BACKBONES = {
+    "mobilenet_v2": _mobilenet_v2,
+    "efficientnet_b0": _efficientnet_b0,
+}
+
+
+def backbone_version(name: str) -> str:
+    """Identifier of a backbone's weights, used in embedding cache keys."""
+    if name not in BACKBONES:
+        raise ValueError(f"Unknown backbone: {name!r}")
+    return f"{name}-imagenet-avgpool"
+
+
+def backbone_names(names: Optional[Sequence[str]] = None) -> Tuple[str, ...]:
+    """Backbones to use: the given names, else $IMAGE_BACKBONES, else DEFAULT_BACKBONES."""
+    if names is None:
+        configured = os.environ.get(BACKBONES_ENV_VAR, "")
+        names = [name.strip() for name in configured.split(",") if name.strip()] or DEFAULT_BACKBONES
+    for name in names:
+        backbone_version(name)
+    return tuple(names)
+
+
+class Backbone:
+    """
+    A headless network served through a traced tf.function.
+
+    Returns one L2-normalized pooled embedding per image, so features from
+    several backbones can be concatenated with equal weight.
+    """
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Key of BACKBONES
+        """
+        import tensorflow as tf
+        from model.mobilenet_model import INPUT_SIGNATURE
+
+        model, to_input = BACKBONES[name]()
+        self.name = name
+        self.version = backbone_version(name)
+        self.dim = int(model.output.shape[-1])
+        self._serve = tf.function(
+            lambda images: tf.math.l2_normalize(model(to_input(images), training=False), axis=-1),
+            input_signature=[INPUT_SIGNATURE],
+        )
+
+    def warmup(self):
+        self.embed(np.zeros((1, IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.float32))
+        return self
+
+    def embed(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            batch: Preprocessed images of shape (N, 224, 224, 3) in [-1, 1]
+
+        Returns:
+            np.ndarray: float32 embeddings of shape (N, dim)
+        """
+        import tensorflow as tf
+        with metrics.timed("embed"):
+            return self._serve(tf.convert_to_tensor(batch, dtype=tf.float32)).numpy()
+
+
+_backbones: Dict[str, Backbone] = {}
+_backbones_lock = threading.Lock()
+
+
+def get_backbone(name: str) -> Backbone:
+    """Get or build a warmed backbone (one per process)."""
+    backbone = _backbones.get(name)
+    if backbone is None:
+        with _backbones_lock:
+            backbone = _backbones.get(name)
+            if backbone is None:
+                backbone = _backbones[name] = Backbone(name).warmup()
+    return backbone
+
+
+class EmbeddingStore:
+    """
+    Content-addressed embeddings: one float16 .npy file per image and
+    backbone, fronted by an in-memory LRU.
+
+    Files are written atomically, so concurrent workers may share a store.
+    """
+
+    def __init__(self, root: str = EMBEDDING_CACHE_DIR, max_entries: int = 4096):
+        """
+        Args:
+            root: Directory the embeddings are kept in
+            max_entries: Embeddings kept in memory
+        """
+        self.root = root
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        version, digest = key.split(":", 1)
+        return os.path.join(self.root, version, digest[:2], f"{digest}.npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Cached embedding for a key, or None."""
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+        try:
+            vector = np.load(self._path(key)).astype(np.float32)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self._remember(key, vector)
+        return vector
+
+    def put(self, key: str, vector: np.ndarray):
+        """Store an embedding in memory and on disk."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+        np.save(tmp_path, vector.astype(np.float16))
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._remember(key, np.asarray(vector, dtype=np.float32))
+
+    def _remember(self, key, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+_store = EmbeddingStore()
+
+
+def get_store() -> EmbeddingStore:
+    """The process-wide embedding store."""
+    return _store
+
+
+def embed_arrays(batch: np.ndarray, backbones: Optional[Sequence[str]] = None) -> np.ndarray:
+    """
+    Embed already preprocessed images without the cache.
+
+    Args:
+        batch: (N, 224, 224, 3) float32 images in [-1, 1]
+        backbones: Backbone names (defaults to backbone_names())
+
+    Returns:
+        np.ndarray: (N, total dim) concatenated embeddings
+    """
+    return np.concatenate([get_backbone(name).embed(batch) for name in backbone_names(backbones)], axis=1)
+
+
+def embed_uploads(files: Sequence, backbones: Optional[Sequence[str]] = None,
+                  store: Optional[EmbeddingStore] = None) -> Tuple[np.ndarray, List[int]]:
+    """
+    Embed images, running each backbone only on images it has not seen.
+
+    Images missing from the cache are decoded once into a shared batch
+    buffer and each backbone runs one forward pass over the ones it lacks.
+
+    Args:
+        files: Image paths or file-like uploads
+        backbones: Backbone names (defaults to backbone_names())
+        store: Embedding cache (defaults to get_store())
+
+    Returns:
+        tuple: ((M, total dim) embeddings, indices into files of the M images
+        that could be read and decoded)
+    """
+    names = backbone_names(backbones)
+    store = store or get_store()
+    keys: List[Dict[str, str]] = []
+    cached: List[Dict[str, np.ndarray]] = []
+    readable = []
+    for i, uploaded_file in enumerate(files):
+        try:
+            data = read_upload(uploaded_file)
+        except Exception:
+            continue
+        file_keys = {name: content_key(data, backbone_version(name)) for name in names}
+        found = {name: store.get(key) for name, key in file_keys.items()}
+        readable.append((i, data))
+        keys.append(file_keys)
+        cached.append({name: vector for name, vector in found.items() if vector is not None})
+
+    # Decode only the images some backbone still needs, once each
+    needed = [row for row in range(len(readable)) if len(cached[row]) < len(names)]
+    batch = np.empty((len(needed), IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.float32)
+    decoded = []
+    for row in needed:
+        try:
+            preprocess_into(io.BytesIO(readable[row][1]), batch[len(decoded)])
+            decoded.append(row)
+        except Exception:
+            pass
+    undecodable = set(needed) - set(decoded)
+
+    for name in names:
+        missing = [slot for slot, row in enumerate(decoded) if name not in cached[row]]
+        if not missing:
+            continue
+        vectors = get_backbone(name).embed(batch[missing])
+        for slot, vector in zip(missing, vectors):
+            row = decoded[slot]
+            cached[row][name] = vector
+            store.put(keys[row][name], vector)
+
+    rows = [row for row in range(len(readable)) if row not in undecodable]
+    if not rows:
+        return np.empty((0, 0), dtype=np.float32), []
+    features = np.stack([np.concatenate([cached[row][name] for name in names]) for row in rows])
+    return features.astype(np.float32), [readable[row][0] for row in rows]
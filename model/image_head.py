@@ -0,0 +1,207 @@
+"""
+Lightweight trainable heads over cached image embeddings
+
+Heads map backbone embeddings to the risk tiers of locally labelled
+skin/wound photos. They are pure numpy, train on CPU in seconds and are
+saved as .npz files with the backbones they were trained on, so a head can
+be swapped or retrained without touching the backbone.
+"""
+import hashlib
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_HEAD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_head.npz")
+# Labelled images live in data/labelled_images/<risk tier>/
+RISK_LEVELS = ("High", "Medium", "Low")
+
+
+def risk_label(name: str) -> str:
+    """Canonical risk tier for a label directory name ("high" -> "High")."""
+    for level in RISK_LEVELS:
+        if name.strip().lower() == level.lower():
+            return level
+    raise ValueError(f"Label {name!r} is not one of {', '.join(RISK_LEVELS)}")
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    return logits / logits.sum(axis=1, keepdims=True)
+
+
+class LogisticHead:
+    """Multinomial logistic regression on standardized embeddings, fit by full-batch gradient descent."""
+
+    kind = "logistic"
+
+    def __init__(self, l2: float = 1e-3, epochs: int = 300, learning_rate: float = 0.5):
+        """
+        Args:
+            l2: Weight decay
+            epochs: Gradient steps over the full training set
+            learning_rate: Step size
+        """
+        self.l2 = l2
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.classes: Tuple[str, ...] = ()
+
+    def fit(self, features: np.ndarray, labels: Sequence[str]) -> "LogisticHead":
+        self.classes = tuple(sorted(set(labels)))
+        targets = np.eye(len(self.classes), dtype=np.float32)[[self.classes.index(label) for label in labels]]
+        self.mean = features.mean(axis=0)
+        self.scale = features.std(axis=0) + 1e-6
+        x = (features - self.mean) / self.scale
+        self.weights = np.zeros((x.shape[1], len(self.classes)), dtype=np.float32)
+        self.bias = np.zeros(len(self.classes), dtype=np.float32)
+        for _ in range(self.epochs):
+            error = (_softmax(x @ self.weights + self.bias) - targets) / len(x)
+            self.weights -= self.learning_rate * (x.T @ error + self.l2 * self.weights)
+            self.bias -= self.learning_rate * error.sum(axis=0)
+        return self
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        return _softmax((features - self.mean) / self.scale @ self.weights + self.bias)
+
+    def params(self) -> Dict[str, np.ndarray]:
+        return {"mean": self.mean, "scale": self.scale, "weights": self.weights, "bias": self.bias}
+
+    def set_params(self, params: Dict[str, np.ndarray]):
+        self.mean, self.scale = params["mean"], params["scale"]
+        self.weights, self.bias = params["weights"], params["bias"]
+
+
+class KNNHead:
+    """Cosine k-nearest-neighbour vote, weighted by similarity."""
+
+    kind = "knn"
+
+    def __init__(self, k: int = 5):
+        """
+        Args:
+            k: Neighbours voting for each image
+        """
+        self.k = k
+        self.classes: Tuple[str, ...] = ()
+
+    def fit(self, features: np.ndarray, labels: Sequence[str]) -> "KNNHead":
+        self.classes = tuple(sorted(set(labels)))
+        self.points = features / (np.linalg.norm(features, axis=1, keepdims=True) + 1e-12)
+        self.targets = np.array([self.classes.index(label) for label in labels], dtype=np.int64)
+        return self
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        queries = features / (np.linalg.norm(features, axis=1, keepdims=True) + 1e-12)
+        similarity = queries @ self.points.T
+        k = min(self.k, len(self.points))
+        nearest = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        votes = np.zeros((len(features), len(self.classes)), dtype=np.float32)
+        weights = np.maximum(np.take_along_axis(similarity, nearest, axis=1), 0) + 1e-6
+        np.add.at(votes, (np.arange(len(features))[:, None], self.targets[nearest]), weights)
+        return votes / votes.sum(axis=1, keepdims=True)
+
+    def params(self) -> Dict[str, np.ndarray]:
+        return {"points": self.points, "targets": self.targets, "k": np.array(self.k)}
+
+    def set_params(self, params: Dict[str, np.ndarray]):
+        self.points, self.targets, self.k = params["points"], params["targets"], int(params["k"])
+
+
+HEADS = {head.kind: head for head in (LogisticHead, KNNHead)}
+
+
+def save_head(head, backbones: Sequence[str], path: str = DEFAULT_HEAD_PATH) -> str:
+    """
+    Write a fitted head and the backbones its features come from, atomically.
+
+    Returns:
+        str: path
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, kind=np.array(head.kind), classes=np.array(head.classes),
+             backbones=np.array(list(backbones)), **head.params())
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_head(path: str = DEFAULT_HEAD_PATH):
+    """
+    Load a head written by save_head().
+
+    The returned head has ``backbones`` (names to embed with) and ``version``
+    (a hash of the file, used in result cache keys) attributes.
+    """
+    with open(path, "rb") as f:
+        version = f"head-{hashlib.blake2b(f.read(), digest_size=8).hexdigest()}"
+    with np.load(path) as data:
+        params = {name: data[name] for name in data.files}
+    head = HEADS[str(params.pop("kind"))]()
+    head.classes = tuple(str(label) for label in params.pop("classes"))
+    head.backbones = tuple(str(name) for name in params.pop("backbones"))
+    head.set_params(params)
+    head.version = version
+    return head
+
+
+def evaluate(make_head, features: np.ndarray, labels: Sequence[str], folds: int = 5, seed: int = 0) -> dict:
+    """
+    Stratified k-fold cross-validation of a head.
+
+    Args:
+        make_head: Callable returning an unfitted head
+        features: (N, D) embeddings
+        labels: N labels
+        folds: Number of folds (capped by the smallest class size)
+        seed: Shuffle seed
+
+    Returns:
+        dict: accuracy, macro_recall, per-class recall and the confusion matrix
+        (rows true, columns predicted) over all held-out predictions
+    """
+    labels = np.asarray(labels)
+    classes = tuple(sorted(set(labels.tolist())))
+    folds = max(2, min(folds, min(int((labels == c).sum()) for c in classes)))
+    rng = np.random.default_rng(seed)
+    assignment = np.empty(len(labels), dtype=np.int64)
+    for c in classes:
+        members = rng.permutation(np.flatnonzero(labels == c))
+        assignment[members] = np.arange(len(members)) % folds
+
+    confusion = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    for fold in range(folds):
+        train, test = assignment != fold, assignment == fold
+        head = make_head().fit(features[train], labels[train].tolist())
+        predicted = np.asarray(head.classes)[head.predict_proba(features[test]).argmax(axis=1)]
+        for true, guess in zip(labels[test], predicted):
+            confusion[classes.index(true), classes.index(guess)] += 1
+
+    recall = confusion.diagonal() / np.maximum(confusion.sum(axis=1), 1)
+    return {
+        "accuracy": float(confusion.diagonal().sum() / max(confusion.sum(), 1)),
+        "macro_recall": float(recall.mean()),
+        "recall": dict(zip(classes, recall.tolist())),
+        "classes": classes,
+        "confusion": confusion,
+        "folds": folds,
+    }
+
+
+# Loaded once per path; None where there is no usable head
+_heads: Dict[str, object] = {}
+
+
+def get_head(path: Optional[str] = None):
+    """The trained head at path (default DEFAULT_HEAD_PATH), or None if there is none."""
+    path = path or DEFAULT_HEAD_PATH
+    if path not in _heads:
+        head = None
+        if os.path.exists(path):
+            try:
+                head = load_head(path)
+            except Exception as e:
+                print(f"⚠️ Could not load image head {path}: {e}")
+        _heads[path] = head
+    return _heads[path]
@@ -0,0 +1,214 @@
+"""
+Content-addressed store for uploaded photos and their derivatives
+
+A 12MP upload is hashed, written to disk once however many sessions upload
+it, and reduced once to the two images the app works with: a thumbnail to
+show and the 224x224 model input. Sessions keep only the ImageRef (a few
+short strings), so their memory does not grow with the photos they upload.
+
+The store lives in $IMAGE_STORE_DIR (default: a directory in the system
+temp dir), laid out by the BLAKE2 hash of the upload bytes:
+
+    originals/<ab>/<key>          the upload as received
+    thumbnails/<ab>/<key>.jpg     longest side THUMBNAIL_SIZE, EXIF orientation applied
+    inputs/<ab>/<key>.png         224x224 RGB exactly as decode_image() makes it
+
+The model input is lossless and already at network size, so decoding it
+again reproduces the pixels of the original decode and every path that
+takes an image path or upload (result cache, model server, embeddings)
+gives the same answer as before at a fraction of the cost. Files are
+written under a temporary name and renamed, and concurrent uploads of the
+same photo wait for one another instead of decoding it twice. Photos not
+looked at for `max_age` seconds, or the least recently used ones beyond
+`max_bytes`, are deleted.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+from PIL import Image, ImageOps
+
+from model.preprocessing import decode_image, read_upload
+
+STORE_DIR_ENV_VAR = "IMAGE_STORE_DIR"
+DEFAULT_STORE_DIR = os.path.join(tempfile.gettempdir(), "ai-clinic-buddy-images")
+THUMBNAIL_SIZE = 512
+_KINDS = {"originals": "", "thumbnails": ".jpg", "inputs": ".png"}
+
+
+class ImageRef(NamedTuple):
+    """A stored photo, all a session needs to keep."""
+    key: str
+    size: int
+    thumbnail: str
+    model_input: str
+
+    @property
+    def digest(self) -> bytes:
+        """16-byte BLAKE2 digest of the upload bytes, as journaled."""
+        return bytes.fromhex(self.key)
+
+
+class ImageStore:
+    """Deduplicated on-disk photos with cached thumbnail and model-input derivatives."""
+
+    def __init__(self, root: str, thumbnail_size: int = THUMBNAIL_SIZE,
+                 max_bytes: int = 2 * 1024 ** 3, max_age: float = 24 * 3600):
+        """
+        Args:
+            root: Directory the store is kept in
+            thumbnail_size: Longest side of thumbnails in pixels
+            max_bytes: Disk budget for originals and derivatives
+            max_age: Seconds a photo is kept after it was last stored or looked up
+        """
+        self.root = root
+        self.thumbnail_size = thumbnail_size
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        # key -> (bytes on disk, last use), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.bytes = 0
+        for kind in _KINDS:
+            os.makedirs(os.path.join(root, kind), exist_ok=True)
+        found = []
+        for folder, _, files in os.walk(os.path.join(root, "originals")):
+            for name in files:
+                key = name
+                if name.endswith(".tmp") or not self._complete(key):
+                    self._delete(key)
+                    continue
+                found.append((os.path.getmtime(self._path("originals", key)), key))
+        for used, key in sorted(found):
+            self._remember(key, self._disk_size(key), used)
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.root, kind, key[:2], key + _KINDS[kind])
+
+    def _complete(self, key: str) -> bool:
+        return all(os.path.exists(self._path(kind, key)) for kind in _KINDS)
+
+    def _disk_size(self, key: str) -> int:
+        return sum(os.path.getsize(self._path(kind, key)) for kind in _KINDS)
+
+    def _ref(self, key: str) -> ImageRef:
+        return ImageRef(key, os.path.getsize(self._path("originals", key)),
+                        self._path("thumbnails", key), self._path("inputs", key))
+
+    def _remember(self, key: str, size: int, used: float):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[0]
+        self._entries[key] = (size, used)
+        self.bytes += size
+
+    def _delete(self, key: str):
+        for kind in _KINDS:
+            for path in (self._path(kind, key), self._path(kind, key) + ".tmp"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _write(self, path: str, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = path + ".tmp"
+        write(temporary)
+        os.replace(temporary, path)
+
+    def put(self, uploaded_file) -> ImageRef:
+        """
+        Store an upload (once) and make its derivatives (once).
+
+        Args:
+            uploaded_file: Image path, Streamlit upload or file-like object
+
+        Returns:
+            ImageRef: Reference to the stored photo
+
+        Raises:
+            ValueError: The upload is not a readable image
+        """
+        data = read_upload(uploaded_file)
+        key = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if not self._complete(key):
+                try:
+                    self._derive(key, data)
+                except Exception:
+                    self._delete(key)
+                    raise
+            with self._lock:
+                self._key_locks.pop(key, None)
+                os.utime(self._path("originals", key))
+                self._remember(key, self._disk_size(key), time.time())
+                self._evict(keep=key)
+        return self._ref(key)
+
+    def _derive(self, key: str, data: bytes):
+        # Decoded in draft mode at reduced size, the full 12MP frame is never materialized
+        try:
+            image = Image.open(io.BytesIO(data))
+            if image.format == "JPEG":
+                image.draft("RGB", (self.thumbnail_size, self.thumbnail_size))
+            thumbnail = ImageOps.exif_transpose(image).convert("RGB")
+            thumbnail.thumbnail((self.thumbnail_size, self.thumbnail_size), Image.Resampling.BILINEAR)
+            model_input = decode_image(io.BytesIO(data))
+        except Exception as e:
+            raise ValueError(f"Not a readable image: {e}") from e
+        self._write(self._path("thumbnails", key), lambda path: thumbnail.save(path, "JPEG", quality=85))
+        self._write(self._path("inputs", key), lambda path: model_input.save(path, "PNG"))
+
+        def write_original(path):
+            with open(path, "wb") as f:
+                f.write(data)
+        # The original goes last: it marks the photo as stored
+        self._write(self._path("originals", key), write_original)
+
+    def get(self, key: str) -> Optional[ImageRef]:
+        """A stored photo by key, or None if it was never stored or has been evicted."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._complete(key):
+                return None
+            self._remember(key, entry[0], time.time())
+            os.utime(self._path("originals", key))
+        return self._ref(key)
+
+    def original(self, key: str) -> str:
+        """Path to a stored photo's original bytes."""
+        return self._path("originals", key)
+
+    def _evict(self, keep: str):
+        cutoff = time.time() - self.max_age
+        while self._entries:
+            key, (size, used) = next(iter(self._entries.items()))
+            if key == keep or (used >= cutoff and self.bytes <= self.max_bytes):
+                break
+            del self._entries[key]
+            self.bytes -= size
+            self._delete(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ImageStore:
+    """The process-wide store in $IMAGE_STORE_DIR."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ImageStore(os.environ.get(STORE_DIR_ENV_VAR) or DEFAULT_STORE_DIR)
+    return _store
@@ -0,0 +1,255 @@
+"""
+Lazy, background loading of the image inference subsystem
+
+Importing model.mobilenet_model pulls in TensorFlow and the MobileNetV2
+weights, which takes several seconds. This module has no heavy imports, so
+the UI and text triage can start immediately while the image model loads in
+a background thread or on the first image request.
+
+With $MODEL_SERVER_WORKERS set, the model is loaded by that many worker
+processes of a model.server.ModelServer instead, and every session of the
+app submits its images to the shared pool.
+
+Either way the model is reported ready only once it is warm: loaded from
+the warm-start snapshot or built from the bundled weights, then run on
+synthetic batches through the whole scoring path (model/warm_start.py).
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+from utils import metrics
+
+IDLE = "idle"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+# Result returned when the image model could not be loaded at all
+UNAVAILABLE_RESULT = (
+    "Unknown",
+    "Please try again or consult a healthcare professional directly.",
+    "Image analysis is currently unavailable on this device.",
+    0.0,
+)
+
+# Result for an image the model server could not decode (as mobilenet_model.UNKNOWN_RESULT)
+UNREADABLE_RESULT = (
+    "Unknown",
+    "Please try again or consult a healthcare professional directly.",
+    "An error occurred during image analysis.",
+    0.0,
+)
+
+_lock = threading.Lock()
+_done = threading.Event()
+_thread = None
+_state = IDLE
+_module = None
+_server = None
+_error = None
+_load_seconds = None
+_warmup_seconds = None
+
+
+def _load():
+    global _state, _module, _server, _error, _load_seconds, _warmup_seconds
+    start = time.perf_counter()
+    try:
+        from model.server import start_server, worker_count
+        workers = worker_count()
+        if workers:
+            _server = start_server(workers)
+            _server.wait_ready()
+            _load_seconds = time.perf_counter() - start
+            _state = READY
+            return
+        from model import embeddings, mobilenet_model, warm_start
+        mobilenet_model.get_engine()
+        head = mobilenet_model.get_head()
+        if head is not None:
+            for name in head.backbones:
+                embeddings.get_backbone(name)
+        _warmup_seconds = warm_start.warm_up(mobilenet_model)
+        _module = mobilenet_model
+        # status() reads the timings as soon as the state says READY, so they are set first
+        _load_seconds = time.perf_counter() - start
+        _state = READY
+    except Exception as e:
+        if _server is not None:
+            _server.stop()
+            _server = None
+        _error = e
+        _load_seconds = time.perf_counter() - start
+        _state = FAILED
+        print(f"⚠️ Could not load image model: {e}")
+    finally:
+        _done.set()
+
+
+def start_loading():
+    """Start loading TensorFlow and the model in a background thread (once)."""
+    global _thread, _state
+    with _lock:
+        if _thread is None:
+            _state = LOADING
+            _thread = threading.Thread(target=_load, name="image-model-loader", daemon=True)
+            _thread.start()
+
+
+def status():
+    """
+    Current load status of the image model.
+
+    Returns:
+        tuple: (state, detail) where state is idle, loading, ready or failed
+    """
+    if _state == READY:
+        if _server is not None:
+            ready = sum(worker["ready"] for worker in _server.health()["workers"])
+            return _state, f"{ready}/{_server.workers} worker processes, loaded in {_load_seconds:.1f}s"
+        return _state, f"loaded in {_load_seconds:.1f}s, warmed up in {_warmup_seconds:.1f}s"
+    if _state == FAILED:
+        return _state, str(_error)
+    return _state, ""
+
+
+def is_ready():
+    """Whether the image model has finished loading successfully."""
+    return _state == READY
+
+
+def get_module(timeout=None):
+    """
+    Get model.mobilenet_model, starting and waiting for the load if needed.
+
+    Args:
+        timeout: Seconds to wait for the background load (None waits forever)
+
+    Returns:
+        module: The loaded model.mobilenet_model module, or None when the
+        model is served by worker processes
+    """
+    start_loading()
+    if not _done.wait(timeout):
+        raise TimeoutError("Image model is still loading")
+    if _module is None and _server is None:
+        raise RuntimeError(f"Image model failed to load: {_error}")
+    return _module
+
+
+@metrics.register_collector
+def _model_samples():
+    """Load state, warmth and worker gauges of the image model."""
+    for state in (IDLE, LOADING, READY, FAILED):
+        yield "image_model_state", {"state": state}, int(_state == state)
+    if _load_seconds is not None:
+        yield "image_model_load_seconds", {}, _load_seconds
+    if _warmup_seconds is not None:
+        yield "image_model_warmup_seconds", {}, _warmup_seconds
+    if _module is not None:
+        engine = _module._engine
+        yield "image_model_warm", {}, int(bool(engine is not None and getattr(engine, "warm", False)))
+    if _server is not None:
+        for index, worker in enumerate(_server.health()["workers"]):
+            labels = {"worker": str(index)}
+            yield "model_server_worker_ready", labels, int(worker["ready"] and worker["alive"])
+            yield "model_server_worker_restarts_total", labels, worker["restarts"]
+            yield "model_server_worker_jobs", labels, worker["jobs"]
+
+
+def server_health():
+    """Health of the model server's workers, or None when the model runs in-process."""
+    return _server.health() if _server is not None else None
+
+
+def submit_image(uploaded_file):
+    """
+    Queue an image for analysis, loading the model first if necessary.
+
+    With a model server the image is preprocessed on the calling thread and
+    analyzed by a worker process while the caller carries on; in-process the
+    analysis runs before this returns.
+
+    Args:
+        uploaded_file: Uploaded image file
+
+    Returns:
+        Future: Resolves to (risk_level, recommendation, educational_note, confidence)
+    """
+    result = Future()
+    try:
+        module = get_module()
+    except RuntimeError:
+        result.set_result(UNAVAILABLE_RESULT)
+        return result
+    if module is not None:
+        result.set_result(module.predict_image(uploaded_file))
+        return result
+
+    def resolve(job):
+        error = job.exception()
+        if error is None:
+            result.set_result(job.result())
+        else:
+            result.set_result(UNREADABLE_RESULT if isinstance(error, ValueError) else UNAVAILABLE_RESULT)
+    try:
+        _server.submit(uploaded_file).add_done_callback(resolve)
+    except RuntimeError:
+        result.set_result(UNAVAILABLE_RESULT)
+    except Exception:
+        result.set_result(UNREADABLE_RESULT)
+    return result
+
+
+def predict_images(files):
+    """
+    Analyze several images, loading the model first if necessary.
+
+    In-process the images share one forward pass; with a model server they
+    are all submitted at once and the workers batch them.
+
+    Args:
+        files: Sequence of image paths or uploads
+
+    Returns:
+        list: (risk_level, recommendation, educational_note, confidence) per file
+    """
+    try:
+        module = get_module()
+    except RuntimeError:
+        return [UNAVAILABLE_RESULT] * len(files)
+    if module is not None:
+        return module.predict_images(files)
+    return [job.result() for job in [submit_image(f) for f in files]]
+
+
+def embed_image(uploaded_file, backbones):
+    """
+    Embedding of one image by the given backbones, or None if it cannot be read.
+
+    Runs on the model server's workers when there is one, so the app process
+    never loads TensorFlow.
+    """
+    module = get_module()
+    if module is None:
+        try:
+            return _server.embed(uploaded_file, backbones)
+        except ValueError:
+            return None
+    from model.embeddings import embed_uploads
+    features, positions = embed_uploads([uploaded_file], backbones)
+    return features[0] if positions else None
+
+
+def predict_image(uploaded_file):
+    """
+    Analyze a medical image, loading the model first if necessary.
+
+    Args:
+        uploaded_file: Uploaded image file
+
+    Returns:
+        tuple: (risk_level, recommendation, educational_note, confidence)
+    """
+    return submit_image(uploaded_file).result()
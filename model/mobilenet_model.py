@@ -1,17 +1,36 @@
 # model/mobilenet_model.py
+import io
+import os
+
 import tensorflow as tf
 import numpy as np
-from PIL import Image
 import streamlit as st
 
+from model import warm_start
+from model.embeddings import embed_arrays, embed_uploads
+from model.image_head import get_head
+from model.preprocessing import IMAGE_SIZE, preprocess_image, preprocess_into
+from model.preprocessing import read_upload as _read_upload
+from utils import metrics
+from utils.result_cache import ResultCache, content_key, persistent_path
+
 # Global model variable for caching
 _model = None
+_engine = None
+
+# Serving backend: "keras", "tflite" (dynamic-range), "tflite-int8" or "adaptive"
+BACKEND_ENV_VAR = "INFERENCE_BACKEND"
+ADAPTIVE_BACKEND = "adaptive"
+TFLITE_BACKENDS = {"tflite": "dynamic", "tflite-int8": "int8"}
+
+# Fixed serving input: any batch size of 224x224 RGB float32 images
+INPUT_SIGNATURE = tf.TensorSpec(shape=(None, IMAGE_SIZE, IMAGE_SIZE, 3), dtype=tf.float32, name="images")
 
 @st.cache_resource
 def load_model():
-    """Load MobileNetV2 model with ImageNet weights for feature extraction."""
+    """Load MobileNetV2 model with ImageNet weights (bundled ones when available)."""
     model = tf.keras.applications.MobileNetV2(
-        weights="imagenet",
+        weights=warm_start.weights_path(),
         input_shape=(224, 224, 3),
         include_top=True
     )
@@ -24,67 +43,336 @@ def get_model():
         _model = load_model()
     return _model
 
-def predict_image(uploaded_file):
+class InferenceEngine:
     """
-    Analyze medical image and return risk assessment.
+    Serves the network through a traced tf.function instead of Model.predict.
     
-    Args:
-        uploaded_file: Uploaded image file
-        
-    Returns:
-        tuple: (risk_level, recommendation, educational_note, confidence)
+    Model.predict builds a data adapter, runs the callbacks loop and progress
+    handling on every call, which costs more than the forward pass itself for
+    a single image. The engine traces the model once for a fixed input
+    signature and then calls the compiled graph directly.
     """
-    try:
-        # Load and preprocess image
-        img = Image.open(uploaded_file)
-        # Convert RGBA to RGB if necessary
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        img = img.resize((224, 224))
-        img_array = np.array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
+    
+    def __init__(self, model=None, serving_fn=None, version="mobilenet_v2-keras"):
+        """
+        Args:
+            model: Keras model to wrap (defaults to get_model())
+            serving_fn: Already traced callable, e.g. from a SavedModel
+            version: Identifier of the served weights, used in result cache keys
+        """
+        if serving_fn is None:
+            model = model if model is not None else get_model()
+            serving_fn = tf.function(
+                lambda images: model(images, training=False),
+                input_signature=[INPUT_SIGNATURE],
+            )
+        self.model = model
+        self._serve = serving_fn
+        self.version = version
+        self.warm = False
+    
+    @classmethod
+    def from_saved_model(cls, export_dir, version=None):
+        """
+        Load an engine from a SavedModel written by export_saved_model().
         
-        # Get model predictions
-        model = get_model()
-        preds = model.predict(img_array, verbose=0)
+        Args:
+            export_dir: SavedModel directory
+            version: Identifier of the served weights (defaults to one named after export_dir)
+            
+        Returns:
+            InferenceEngine: Engine serving the exported graph
+        """
+        loaded = tf.saved_model.load(export_dir)
+        serving_fn = loaded.signatures["serving_default"]
+        engine = cls(
+            serving_fn=lambda images: next(iter(serving_fn(images=images).values())),
+            version=version or f"mobilenet_v2-savedmodel-{os.path.basename(os.path.normpath(export_dir))}",
+        )
+        engine._loaded = loaded  # keep the trackable objects alive
+        return engine
+    
+    def warmup(self, batch_sizes=(1,)):
+        """
+        Run synthetic batches so graph tracing and kernel setup happen up front.
         
-        # Decode top 3 predictions
-        decoded = tf.keras.applications.mobilenet_v2.decode_predictions(preds, top=3)[0]
+        Args:
+            batch_sizes: Batch sizes to run once each
+        """
+        for batch_size in batch_sizes:
+            self.predict(np.zeros((batch_size, 224, 224, 3), dtype=np.float32))
+        self.warm = True
+        return self
+    
+    def predict(self, batch):
+        """
+        Run the network on a batch of preprocessed images.
         
-        # Extract predictions
-        top_prediction = decoded[0][1].lower()
-        confidence = float(decoded[0][2])
+        Args:
+            batch: Array of shape (N, 224, 224, 3)
+            
+        Returns:
+            np.ndarray: Class probabilities of shape (N, 1000)
+        """
+        images = tf.convert_to_tensor(batch, dtype=tf.float32)
+        return self._serve(images).numpy()
+    
+    def export_saved_model(self, export_dir):
+        """
+        Export the traced serving function as a SavedModel.
         
-        # Medical risk assessment based on ImageNet categories
-        # High-risk indicators
-        high_risk_terms = [
-            "infection", "wound", "rash", "ulcer", "abscess", "lesion",
-            "blister", "eruption", "dermatitis", "eczema", "boil"
-        ]
+        Args:
+            export_dir: Directory to write the SavedModel to
+        """
+        module = tf.Module()
+        module.model = self.model
+        module.serve = tf.function(
+            lambda images: {"predictions": self.model(images, training=False)},
+            input_signature=[INPUT_SIGNATURE],
+        )
+        tf.saved_model.save(module, export_dir, signatures={"serving_default": module.serve})
+
+def get_engine(saved_model_dir=None, backend=None):
+    """
+    Get or build the warmed inference engine (with caching).
+    
+    TFLite backends are converted once and cached next to this module. If
+    they cannot be built or loaded, the Keras engine is used instead. The
+    Keras engine starts from the warm-start snapshot when it is fresh, and
+    writes one after building the model otherwise (see model/warm_start.py).
+    The adaptive backend serves it next to cheaper variants chosen by load
+    (see model/adaptive.py).
+    
+    Args:
+        saved_model_dir: Optional SavedModel to serve instead of the Keras model
+        backend: "keras", "tflite", "tflite-int8" or "adaptive" (defaults to $INFERENCE_BACKEND)
         
-        # Medium-risk indicators
-        medium_risk_terms = [
-            "bruise", "swelling", "inflammation", "sore", "cut", "scratch"
-        ]
+    Returns:
+        InferenceEngine, TFLiteEngine or AdaptiveEngine: Warmed engine
+    """
+    global _engine
+    if _engine is None:
+        backend = (backend or os.environ.get(BACKEND_ENV_VAR) or "keras").lower()
+        if backend in TFLITE_BACKENDS:
+            try:
+                from model.tflite_backend import TFLiteEngine
+                _engine = TFLiteEngine.build(
+                    TFLITE_BACKENDS[backend],
+                    model_dir=os.path.dirname(os.path.abspath(__file__)),
+                ).warmup(warm_start.WARMUP_BATCH_SIZES)
+            except Exception as e:
+                print(f"⚠️ Could not load {backend} backend, falling back to Keras: {e}")
+        elif backend not in ("keras", ADAPTIVE_BACKEND):
+            print(f"⚠️ Unknown inference backend {backend!r}, using Keras")
+        if _engine is None:
+            if saved_model_dir:
+                _engine = InferenceEngine.from_saved_model(saved_model_dir).warmup(warm_start.WARMUP_BATCH_SIZES)
+            else:
+                _engine = _keras_engine()
+            if backend == ADAPTIVE_BACKEND:
+                try:
+                    from model.adaptive import AdaptiveEngine, activate
+                    _engine = activate(AdaptiveEngine.build(_engine).warmup(warm_start.WARMUP_BATCH_SIZES))
+                except Exception as e:
+                    print(f"⚠️ Could not load the adaptive variants, serving the full model only: {e}")
+    return _engine
+
+def _keras_engine():
+    """The Keras engine, from the warm-start snapshot when it is fresh."""
+    snapshot_dir = warm_start.fresh_snapshot()
+    if snapshot_dir is not None:
+        try:
+            # Same weights as the Keras model, so cached results stay valid
+            return InferenceEngine.from_saved_model(snapshot_dir, version="mobilenet_v2-keras").warmup(
+                warm_start.WARMUP_BATCH_SIZES)
+        except Exception as e:
+            print(f"⚠️ Could not load the warm-start snapshot, building the model: {e}")
+    engine = InferenceEngine(get_model()).warmup(warm_start.WARMUP_BATCH_SIZES)
+    if warm_start.snapshot_enabled():
+        try:
+            warm_start.write_snapshot(engine)
+        except Exception as e:
+            print(f"⚠️ Could not write the warm-start snapshot: {e}")
+    return engine
+
+# Results of single-image requests, keyed by upload bytes and scoring version
+_result_cache = ResultCache(max_entries=256, path=persistent_path("image_results"), name="image_results")
+
+# Medical risk assessment based on ImageNet categories
+# High-risk indicators
+HIGH_RISK_TERMS = [
+    "infection", "wound", "rash", "ulcer", "abscess", "lesion",
+    "blister", "eruption", "dermatitis", "eczema", "boil"
+]
+
+# Medium-risk indicators
+MEDIUM_RISK_TERMS = [
+    "bruise", "swelling", "inflammation", "sore", "cut", "scratch"
+]
+
+# Result returned when an image cannot be analyzed
+UNKNOWN_RESULT = (
+    "Unknown",
+    "Please try again or consult a healthcare professional directly.",
+    "An error occurred during image analysis.",
+    0.0,
+)
+
+# Recommendation and educational note per risk tier
+RISK_MESSAGES = {
+    "High": (
+        "Visit a healthcare provider as soon as possible. This may require immediate medical attention.",
+        "Skin infections and rashes can indicate various conditions. Early medical intervention is important.",
+    ),
+    "Medium": (
+        "Monitor the condition closely. Consider visiting a clinic within 24-48 hours if it worsens.",
+        "Keep the area clean and avoid scratching. Watch for signs of infection like increased redness or pus.",
+    ),
+    "Low": (
+        "Monitor your symptoms and stay alert for changes. Maintain good hygiene.",
+        "Continue monitoring. If symptoms persist or worsen, consult a healthcare professional.",
+    ),
+}
+
+def assess_predictions(decoded):
+    """
+    Map decoded ImageNet predictions for one image to a risk assessment.
+    
+    Args:
+        decoded: Top-k (class_id, label, score) tuples for one image
+        
+    Returns:
+        tuple: (risk_level, recommendation, educational_note, confidence)
+    """
+    confidence = float(decoded[0][2])
+    
+    # Analyze predictions
+    all_predictions = " ".join([pred[1].lower() for pred in decoded])
+    
+    if any(term in all_predictions for term in HIGH_RISK_TERMS):
+        risk = "High"
+    elif any(term in all_predictions for term in MEDIUM_RISK_TERMS):
+        risk = "Medium"
+    else:
+        risk = "Low"
+    
+    return (risk, *RISK_MESSAGES[risk], confidence)
+
+def assess_probabilities(classes, probabilities):
+    """
+    Map a trained head's class probabilities for one image to a risk assessment.
+    
+    Args:
+        classes: Risk tier of each probability column
+        probabilities: Probabilities for one image
         
-        # Analyze predictions
-        all_predictions = " ".join([pred[1].lower() for pred in decoded])
+    Returns:
+        tuple: (risk_level, recommendation, educational_note, confidence)
+    """
+    best = int(np.argmax(probabilities))
+    risk = classes[best]
+    return (risk, *RISK_MESSAGES[risk], float(probabilities[best]))
+
+def scoring_version():
+    """Identifier of what scores images: the trained head if there is one, else the classifier."""
+    head = get_head()
+    return head.version if head is not None else get_engine().version
+
+def predict_arrays(arrays):
+    """
+    Run one forward pass over already preprocessed images.
+    
+    Args:
+        arrays: Sequence of (224, 224, 3) arrays, or an already stacked
+            (N, 224, 224, 3) float32 batch which is used without copying
         
-        if any(term in all_predictions for term in high_risk_terms):
-            risk = "High"
-            recommendation = "Visit a healthcare provider as soon as possible. This may require immediate medical attention."
-            educational_note = "Skin infections and rashes can indicate various conditions. Early medical intervention is important."
-        elif any(term in all_predictions for term in medium_risk_terms):
-            risk = "Medium"
-            recommendation = "Monitor the condition closely. Consider visiting a clinic within 24-48 hours if it worsens."
-            educational_note = "Keep the area clean and avoid scratching. Watch for signs of infection like increased redness or pus."
-        else:
-            risk = "Low"
-            recommendation = "Monitor your symptoms and stay alert for changes. Maintain good hygiene."
-            educational_note = "Continue monitoring. If symptoms persist or worsen, consult a healthcare professional."
+    Returns:
+        list: (risk_level, recommendation, educational_note, confidence) per image
+    """
+    if len(arrays) == 0:
+        return []
+    batch = arrays if isinstance(arrays, np.ndarray) else np.stack(arrays)
+    head = get_head()
+    if head is not None:
+        features = embed_arrays(batch, head.backbones)
+        with metrics.timed("head"):
+            probabilities = head.predict_proba(features)
+            return [assess_probabilities(head.classes, p) for p in probabilities]
+    with metrics.timed("forward"):
+        preds = get_engine().predict(batch)
+    with metrics.timed("label_decode"):
+        decoded = warm_start.decode_predictions(preds, top=3)
+        return [assess_predictions(d) for d in decoded]
+
+def predict_images(files):
+    """
+    Analyze several medical images with a single model forward pass.
+    
+    With a trained image head, images are scored from their (cached)
+    backbone embeddings instead of the ImageNet classifier. Images that
+    fail to decode get the "Unknown" result without affecting the rest of
+    the batch.
+    
+    Args:
+        files: Sequence of uploaded image files
         
-        return risk, recommendation, educational_note, confidence
+    Returns:
+        list: (risk_level, recommendation, educational_note, confidence) per file
+    """
+    results = [UNKNOWN_RESULT] * len(files)
+    head = get_head()
+    if head is not None:
+        # Embeddings are cached by content, so only unseen images reach a backbone
+        try:
+            features, positions = embed_uploads(files, head.backbones)
+            with metrics.timed("head"):
+                for i, p in zip(positions, head.predict_proba(features) if positions else []):
+                    results[i] = assess_probabilities(head.classes, p)
+        except Exception as e:
+            metrics.count_error("predict", e)
+        return results
+    
+    # Decoded images are written straight into consecutive rows of one buffer
+    batch = np.empty((len(files), IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.float32)
+    positions = []
+    for i, uploaded_file in enumerate(files):
+        try:
+            preprocess_into(uploaded_file, batch[len(positions)])
+            positions.append(i)
+        except Exception:
+            pass  # counted by the decode stage
+    
+    try:
+        for i, result in zip(positions, predict_arrays(batch[:len(positions)])):
+            results[i] = result
+    except Exception as e:
+        metrics.count_error("predict", e)
+    return results
+
+def predict_image(uploaded_file):
+    """
+    Analyze medical image and return risk assessment.
+    
+    Results are cached by a hash of the upload bytes and the scoring version,
+    so resubmitting the same photo skips decoding and the forward pass.
+    
+    Args:
+        uploaded_file: Uploaded image file
         
+    Returns:
+        tuple: (risk_level, recommendation, educational_note, confidence)
+    """
+    try:
+        data = _read_upload(uploaded_file)
     except Exception as e:
-        # Fallback in case of errors
-        return "Unknown", "Please try again or consult a healthcare professional directly.", "An error occurred during image analysis.", 0.0
+        metrics.count_error("read_upload", e)
+        return UNKNOWN_RESULT
+    key = content_key(data, scoring_version())
+    result = _result_cache.get(key)
+    if result is None:
+        result = predict_images([io.BytesIO(data)])[0]
+        # Answers of a cheaper adaptive variant are not the full model's to cache
+        last_full = getattr(_engine, "last_full", None)
+        if result is not UNKNOWN_RESULT and (last_full is None or last_full()):
+            _result_cache.put(key, result)
+    return result
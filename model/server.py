@@ -0,0 +1,453 @@
+"""
+Local model server: a pool of inference worker processes shared by every session
+
+Each worker process loads the model once and serves jobs from a common
+request queue, so concurrent uploads run on separate cores instead of
+taking turns on one thread. Images are decoded and preprocessed by the
+caller straight into a slot of a shared-memory buffer; only the job id and
+slot number go through the queue, and a worker runs the network on the
+slot in place (jobs picked up together are stacked into one batch). The
+buffer also records which job owns each slot, so a queued job that was
+failed meanwhile, and whose slot went to another image, is skipped.
+
+A supervisor thread restarts workers that die or hang and retries their
+jobs once. Every message a worker sends carries its generation, so what a
+replaced worker left in the result queue is dropped rather than credited
+to its successor. This module does not import TensorFlow, only the workers do.
+"""
+import atexit
+import io
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Optional, Sequence
+
+import numpy as np
+
+from model.preprocessing import IMAGE_SIZE, preprocess_into, read_upload
+from utils import metrics
+from utils.result_cache import ResultCache, content_key
+
+# Worker processes to serve the image model with; 0 runs it in the app process
+WORKERS_ENV_VAR = "MODEL_SERVER_WORKERS"
+PREDICT = "predict"
+EMBED = "embed"
+SLOT_SHAPE = (IMAGE_SIZE, IMAGE_SIZE, 3)
+SLOT_BYTES = int(np.prod(SLOT_SHAPE)) * 4
+# Owner of a free slot
+NO_JOB = -1
+# Attempts per job before a crashing job is failed instead of retried
+MAX_ATTEMPTS = 2
+# Restarts after which a worker that crashes while loading the model is given up on
+MAX_START_ATTEMPTS = 3
+
+
+def _slot_arrays(buffer, slots: int):
+    """The images and the owning job id of each slot, in the shared buffer."""
+    images = np.ndarray((slots, *SLOT_SHAPE), dtype=np.float32, buffer=buffer)
+    owners = np.ndarray((slots,), dtype=np.int64, buffer=buffer, offset=slots * SLOT_BYTES)
+    return images, owners
+
+
+def _worker_main(index, generation, shm_name, slots, requests, results, max_batch):
+    """Worker process: load the model, then serve jobs until a None sentinel."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    images, owners = _slot_arrays(shm.buf, slots)
+    try:
+        from model import embeddings, mobilenet_model, warm_start
+        from model.adaptive import FULL
+        engine = mobilenet_model.get_engine()
+        if hasattr(engine, "backlog"):
+            # The adaptive engine steps down when requests pile up behind this worker too
+            engine.backlog = requests.qsize
+        head = mobilenet_model.get_head()
+        for name in head.backbones if head is not None else ():
+            embeddings.get_backbone(name)
+        # Jobs are only routed to a worker once it reports ready, so it warms up first
+        warm_start.warm_up(mobilenet_model, sorted({1, max_batch}))
+        results.put(("ready", index, generation, os.getpid(), mobilenet_model.scoring_version()))
+    except Exception as e:
+        results.put(("failed", index, generation, os.getpid(), str(e)))
+        return
+
+    stopping = False
+    while not stopping:
+        job = requests.get()
+        if job is None:
+            break
+        jobs = [job]
+        while len(jobs) < max_batch:
+            try:
+                job = requests.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                stopping = True
+                break
+            jobs.append(job)
+        # A job failed while queued has given up its slot, possibly to another image
+        jobs = [job for job in jobs if owners[job[2]] == job[0]]
+        if not jobs:
+            continue
+        results.put(("taken", index, generation, [job_id for job_id, *_ in jobs]))
+
+        # Jobs of one kind (and backbones) share a forward pass
+        groups = {}
+        for job in jobs:
+            groups.setdefault((job[1], job[3] if len(job) > 3 else None), []).append(job)
+        for (kind, backbones), group in groups.items():
+            slot_ids = [slot for _, _, slot, *_ in group]
+            batch = images[slot_ids[0]:slot_ids[0] + 1] if len(group) == 1 else images[slot_ids]
+            try:
+                start = time.perf_counter()
+                if kind == PREDICT:
+                    outputs = mobilenet_model.predict_arrays(batch)
+                else:
+                    outputs = embeddings.embed_arrays(batch, backbones)
+                elapsed = time.perf_counter() - start
+                results.put(("observed", index, generation, f"worker_{kind}", elapsed))
+                # Which variant served each image, with the adaptive engine; only full-model results are cached.
+                # Each image is charged its share of the pass, once per image the variant served
+                variants = engine.last_variants() if kind == PREDICT and hasattr(engine, "last_variants") else []
+                for name in sorted(set(variants)):
+                    results.put(("observed", index, generation, f"worker_{kind} {name}", elapsed / len(group),
+                                 variants.count(name)))
+                cacheable = [name == FULL.name for name in variants] or [True] * len(group)
+                for (job_id, _, slot, *_), output, cache in zip(group, outputs, cacheable):
+                    if owners[slot] == job_id:  # else the slot was reused while the batch ran
+                        results.put(("done", index, generation, job_id, output, cache))
+            except Exception as e:
+                for job_id, *_ in group:
+                    results.put(("error", index, generation, job_id, str(e)))
+    del images, owners
+    shm.close()
+
+
+class _Job:
+    __slots__ = ("future", "message", "slot", "key", "attempts", "submitted", "worker")
+
+    def __init__(self, future, message, slot, key):
+        self.future = future
+        self.message = message
+        self.slot = slot
+        self.key = key
+        self.attempts = 0
+        self.submitted = time.perf_counter()
+        self.worker = None
+
+
+class _Worker:
+    __slots__ = ("process", "generation", "ready", "failed", "restarts", "jobs", "busy_since")
+
+    def __init__(self, process, generation):
+        self.process = process
+        self.generation = generation
+        self.ready = False
+        self.failed = None
+        self.restarts = 0
+        self.jobs = set()
+        self.busy_since = None
+
+
+class ModelServer:
+    """
+    Pool of model worker processes fed through shared memory.
+
+    Thread-safe: any number of threads (e.g. Streamlit sessions) may
+    submit() concurrently. At most ``slots`` images are in flight; further
+    submissions wait for a free slot.
+    """
+
+    def __init__(self, workers: int = 2, slots: Optional[int] = None, max_batch: int = 8,
+                 job_timeout: float = 30.0, cache_entries: int = 256):
+        """
+        Args:
+            workers: Worker processes, each holding its own copy of the model
+            slots: Images in flight at once (default 4 per worker)
+            max_batch: Most queued jobs a worker serves with one forward pass
+            job_timeout: Seconds a worker may spend on a batch before it is restarted
+            cache_entries: Results kept by image content hash
+        """
+        self.workers = workers
+        self.slots = slots or 4 * workers
+        self.max_batch = max_batch
+        self.job_timeout = job_timeout
+        self.version = None
+        self._cache = ResultCache(max_entries=cache_entries, name="model_server_results")
+        self._ids = itertools.count()
+        self._generations = itertools.count()
+        self._jobs = {}
+        # Reentrant: futures resolved under the lock may run callbacks that submit again
+        self._lock = threading.RLock()
+        self._ready = threading.Condition(self._lock)
+        self._stopping = threading.Event()
+        self._started = False
+
+    def start(self) -> "ModelServer":
+        """Create the shared buffer and start the workers (they load the model in the background)."""
+        context = mp.get_context("spawn")  # TensorFlow is not fork-safe
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * (SLOT_BYTES + 8))
+        self._images, self._owners = _slot_arrays(self._shm.buf, self.slots)
+        self._owners[:] = NO_JOB
+        self._context = context
+        self._requests = context.Queue()
+        # Unbuffered, so a worker's "taken" report is written before it starts on the jobs
+        self._results = context.SimpleQueue()
+        self._free = queue.Queue()
+        for slot in range(self.slots):
+            self._free.put(slot)
+        self._workers = [self._spawn(index) for index in range(self.workers)]
+        self._started = True
+        threading.Thread(target=self._collect, name="model-server-results", daemon=True).start()
+        threading.Thread(target=self._supervise, name="model-server-supervisor", daemon=True).start()
+        return self
+
+    def _spawn(self, index: int) -> _Worker:
+        generation = next(self._generations)
+        process = self._context.Process(
+            target=_worker_main, name=f"model-worker-{index}", daemon=True,
+            args=(index, generation, self._shm.name, self.slots, self._requests, self._results, self.max_batch),
+        )
+        process.start()
+        return _Worker(process, generation)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until a worker has loaded the model.
+
+        Returns:
+            bool: True once one worker is ready, False on timeout
+
+        Raises:
+            RuntimeError: If every worker failed to load the model
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._ready:
+            while not any(worker.ready for worker in self._workers):
+                if all(worker.failed for worker in self._workers):
+                    raise RuntimeError(f"Model workers failed to start: {self._workers[0].failed}")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._ready.wait(remaining)
+        return True
+
+    def submit(self, uploaded_file, kind: str = PREDICT, backbones: Optional[Sequence[str]] = None) -> Future:
+        """
+        Preprocess an image into shared memory and queue it for a worker.
+
+        Args:
+            uploaded_file: Image path or file-like upload
+            kind: PREDICT for a risk assessment, EMBED for a backbone embedding
+            backbones: Backbone names for EMBED jobs
+
+        Returns:
+            Future: Resolves to (risk_level, recommendation, educational_note,
+            confidence) for PREDICT, or a float32 embedding for EMBED. Fails
+            with ValueError if the image cannot be decoded and RuntimeError if
+            the workers could not serve it.
+        """
+        if not self._started or self._stopping.is_set():
+            raise RuntimeError("Model server is not running")
+        future = Future()
+        data = read_upload(uploaded_file)
+        key = content_key(data, self.version) if kind == PREDICT and self.version else None
+        cached = self._cache.get(key) if key else None
+        if cached is not None:
+            future.set_result(cached)
+            return future
+
+        try:
+            slot = self._free.get(timeout=self.job_timeout)
+        except queue.Empty:
+            raise RuntimeError("Model server is busy, retry later")
+        try:
+            preprocess_into(io.BytesIO(data), self._images[slot])
+        except Exception as e:
+            self._free.put(slot)
+            future.set_exception(ValueError(f"Could not decode image: {e}"))
+            return future
+        job_id = next(self._ids)
+        message = (job_id, kind, slot) + ((tuple(backbones),) if kind == EMBED else ())
+        with self._lock:
+            self._jobs[job_id] = _Job(future, message, slot, key)
+            self._owners[slot] = job_id
+        self._requests.put(message)
+        return future
+
+    def predict(self, uploaded_file, timeout: Optional[float] = None):
+        """Blocking risk assessment of one image."""
+        return self.submit(uploaded_file).result(timeout=timeout)
+
+    def embed(self, uploaded_file, backbones: Sequence[str], timeout: Optional[float] = None) -> np.ndarray:
+        """Blocking embedding of one image by the given backbones."""
+        return self.submit(uploaded_file, EMBED, backbones).result(timeout=timeout)
+
+    def _finish(self, job_id: int, result=None, error: Optional[Exception] = None, cacheable: bool = True):
+        """Resolve a job and free its slot (caller holds the lock)."""
+        job = self._jobs.pop(job_id, None)
+        if job is None:
+            return
+        if job.worker is not None:
+            worker = self._workers[job.worker]
+            worker.jobs.discard(job_id)
+            if not worker.jobs:
+                worker.busy_since = None
+        # Workers skip a queued message, and drop a result, whose slot no longer names the job
+        self._owners[job.slot] = NO_JOB
+        self._free.put(job.slot)
+        metrics.observe("server_job", time.perf_counter() - job.submitted)
+        if error is not None:
+            metrics.count_error("server_job", error)
+            job.future.set_exception(error)
+        else:
+            if job.key and cacheable:
+                self._cache.put(job.key, result)
+            job.future.set_result(result)
+
+    def _collect(self):
+        while True:
+            try:
+                message = self._results.get()
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            event, index, generation = message[:3]
+            with self._lock:
+                worker = self._workers[index]
+                if generation != worker.generation:
+                    # Sent by a worker that has since been replaced. Jobs it reported taken only now
+                    # died with it unnoticed; its other jobs were already retried or failed.
+                    if event == "taken":
+                        lost = [job_id for job_id in message[3]
+                                if job_id in self._jobs and self._jobs[job_id].worker is None]
+                        for job_id in lost:
+                            self._jobs[job_id].attempts += 1
+                        self._retry(lost)
+                    continue
+                if event == "ready":
+                    worker.ready, worker.failed = True, None
+                    self.version = self.version or message[4]
+                    self._ready.notify_all()
+                elif event == "failed":
+                    worker.failed = message[4]
+                    self._ready.notify_all()
+                elif event == "taken":
+                    for job_id in message[3]:
+                        job = self._jobs.get(job_id)
+                        if job is not None:
+                            if job.worker is None and not job.attempts:
+                                metrics.observe("server_queue", time.perf_counter() - job.submitted)
+                            job.worker = index
+                            job.attempts += 1
+                            worker.jobs.add(job_id)
+                    worker.busy_since = time.perf_counter() if worker.jobs else None
+                elif event == "observed":
+                    metrics.observe(*message[3:])
+                elif event == "done":
+                    self._finish(message[3], result=message[4], cacheable=message[5])
+                elif event == "error":
+                    self._finish(message[3], error=RuntimeError(message[4]))
+
+    def _supervise(self, interval: float = 0.5):
+        while not self._stopping.wait(interval):
+            now = time.perf_counter()
+            with self._lock:
+                for index, worker in enumerate(self._workers):
+                    if worker.busy_since is not None and now - worker.busy_since > self.job_timeout:
+                        print(f"⚠️ Model worker {index} hung for {now - worker.busy_since:.0f}s, restarting it")
+                        for job_id in list(worker.jobs):
+                            self._jobs[job_id].attempts = MAX_ATTEMPTS
+                        worker.process.kill()
+                        worker.process.join()
+                    if worker.process.is_alive() or worker.failed:
+                        continue
+                    self._replace(index, worker)
+                # Jobs taken by a worker that died before reporting them are never answered
+                for job_id, job in list(self._jobs.items()):
+                    if job.worker is None and now - job.submitted > 2 * self.job_timeout:
+                        self._finish(job_id, error=RuntimeError("Image analysis timed out"))
+
+    def _retry(self, job_ids):
+        """Queue the jobs of a dead worker again, failing those out of attempts (caller holds the lock)."""
+        for job_id in job_ids:
+            job = self._jobs[job_id]
+            if job.attempts >= MAX_ATTEMPTS:
+                self._finish(job_id, error=RuntimeError("Model worker stopped while analyzing this image"))
+            else:
+                job.worker = None
+                self._requests.put(job.message)
+
+    def _replace(self, index: int, worker: _Worker):
+        """Restart a dead worker, retrying its jobs once (caller holds the lock)."""
+        self._retry(list(worker.jobs))
+        if not worker.ready and worker.restarts + 1 >= MAX_START_ATTEMPTS:
+            worker.failed = f"exited with code {worker.process.exitcode} while loading the model"
+            self._ready.notify_all()
+            return
+        print(f"⚠️ Model worker {index} exited with code {worker.process.exitcode}, restarting it")
+        replacement = self._spawn(index)
+        replacement.restarts = worker.restarts + 1
+        self._workers[index] = replacement
+
+    def health(self) -> dict:
+        """Liveness and load of every worker."""
+        now = time.perf_counter()
+        with self._lock:
+            return {
+                "workers": [{
+                    "pid": worker.process.pid,
+                    "alive": worker.process.is_alive(),
+                    "ready": worker.ready,
+                    "error": worker.failed,
+                    "restarts": worker.restarts,
+                    "jobs": len(worker.jobs),
+                    "busy_seconds": round(now - worker.busy_since, 3) if worker.busy_since else 0.0,
+                } for worker in self._workers],
+                "pending": len(self._jobs),
+                "free_slots": self._free.qsize(),
+                "version": self.version,
+            }
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the workers, fail unfinished jobs and release the shared memory."""
+        if not self._started or self._stopping.is_set():
+            return
+        self._stopping.set()
+        for _ in self._workers:
+            self._requests.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+        self._results.put(None)
+        with self._lock:
+            for job_id in list(self._jobs):
+                self._finish(job_id, error=RuntimeError("Model server stopped"))
+        self._images = self._owners = None
+        self._shm.close()
+        self._shm.unlink()
+
+
+def start_server(workers: int, **kwargs) -> ModelServer:
+    """Start a model server that is stopped at interpreter exit."""
+    server = ModelServer(workers, **kwargs).start()
+    atexit.register(server.stop)
+    return server
+
+
+def worker_count() -> int:
+    """Worker processes requested by $MODEL_SERVER_WORKERS (0 if unset or invalid)."""
+    value = os.environ.get(WORKERS_ENV_VAR, "")
+    try:
+        return max(0, int(value or 0))
+    except ValueError:
+        print(f"⚠️ Ignoring invalid {WORKERS_ENV_VAR}={value!r}")
+        return 0
@@ -0,0 +1,206 @@
+"""
+Archive of screened photos for "similar previous cases" lookups
+
+Each analyzed photo is kept as its MobileNetV2 embedding plus the result it
+got (risk, confidence, time); the photo itself is never stored. Until the
+archive is large enough to train clusters on, lookups scan the embeddings
+exactly; after that they go through an on-disk IVF index
+(utils.vector_index), which answers in milliseconds at a million cases and
+accepts new cases without a rebuild.
+
+The archive is off unless $SIMILAR_CASES_DIR names a directory for it:
+
+    cases.jsonl     one line per case, the line number is its id
+    pending.f16     embeddings recorded before the index was trained (pending.json: their dimension)
+    index/          the VectorIndex, once trained
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from model import loader
+from model.embeddings import backbone_version
+from model.preprocessing import read_upload
+from utils.result_cache import content_key
+from utils.vector_index import VectorIndex
+
+CASES_DIR_ENV_VAR = "SIMILAR_CASES_DIR"
+BACKBONE = "mobilenet_v2"
+# Cases recorded before the index is trained on them; exact search is fast enough below this
+TRAIN_AFTER = 4096
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+class CaseArchive:
+    """Embeddings and results of past cases, searchable by cosine similarity."""
+
+    def __init__(self, root: str, train_after: int = TRAIN_AFTER):
+        """
+        Args:
+            root: Directory the archive is kept in
+            train_after: Cases kept in the exact-search buffer before the index is trained
+        """
+        self.root = root
+        self.train_after = train_after
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.cases = []
+        cases_path = os.path.join(root, "cases.jsonl")
+        if os.path.exists(cases_path):
+            with open(cases_path, encoding="utf-8") as f:
+                self.cases = [json.loads(line) for line in f if line.strip()]
+        self._keys = {case["key"]: i for i, case in enumerate(self.cases)}
+
+        self.index = VectorIndex(self._path("index")) if os.path.exists(self._path("index", "meta.json")) else None
+        if self.index is not None:
+            # An interrupted record left an embedding without its case, under the id the next case gets
+            self.index.truncate(len(self.cases))
+        # Unit float32 rows in memory, float16 on disk
+        self.pending = np.empty((0, 0), dtype=np.float32)
+        if self.index is None and os.path.exists(self._path("pending.f16")):
+            with open(self._path("pending.json"), encoding="utf-8") as f:
+                dim = json.load(f)["dim"]
+            pending = np.fromfile(self._path("pending.f16"), dtype=np.float16)
+            rows = len(self.cases)
+            if len(pending) > rows * dim:
+                # An interrupted record left an embedding without its case
+                os.truncate(self._path("pending.f16"), rows * dim * pending.itemsize)
+            self.pending = _unit(pending[:rows * dim].reshape(rows, dim))
+
+    def _path(self, *names: str) -> str:
+        return os.path.join(self.root, *names)
+
+    def __len__(self) -> int:
+        return len(self.cases)
+
+    def record(self, embedding: np.ndarray, key: str, risk: str, confidence: float) -> int:
+        """
+        Add a case, unless the same photo was recorded before.
+
+        Args:
+            embedding: Image embedding
+            key: Content hash of the photo
+            risk: Risk level the photo was given
+            confidence: Confidence of that result
+
+        Returns:
+            int: Id of the (new or existing) case
+        """
+        embedding = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            if key in self._keys:
+                return self._keys[key]
+            case_id = len(self.cases)
+            # The embedding is written before the case, so every recorded case is searchable;
+            # one left without its case by a crash is dropped on the next open
+            if self.index is not None:
+                self.index.add(embedding, [case_id])
+            else:
+                if not len(self.pending):
+                    with open(self._path("pending.json"), "w", encoding="utf-8") as f:
+                        json.dump({"dim": embedding.shape[1]}, f)
+                with open(self._path("pending.f16"), "ab") as f:
+                    embedding.astype(np.float16).tofile(f)
+                self.pending = np.concatenate([self.pending.reshape(-1, embedding.shape[1]),
+                                               _unit(embedding)])
+
+            case = {"key": key, "risk": risk, "confidence": round(float(confidence), 4), "time": int(time.time())}
+            with open(self._path("cases.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(case) + "\n")
+            self.cases.append(case)
+            self._keys[key] = case_id
+            if self.index is None and len(self.pending) >= self.train_after:
+                self._train()
+            return case_id
+
+    def _train(self):
+        vectors = self.pending
+        # Built aside and renamed, so a crash mid-build leaves the pending buffer in charge
+        building = self._path("index.tmp")
+        shutil.rmtree(building, ignore_errors=True)
+        VectorIndex.train(building, vectors).add(vectors, np.arange(len(vectors)))
+        os.replace(building, self._path("index"))
+        self.index = VectorIndex(self._path("index"))
+        for name in ("pending.f16", "pending.json"):
+            os.remove(self._path(name))
+        self.pending = np.empty((0, 0), dtype=np.float32)
+
+    def search(self, embedding: np.ndarray, k: int = 5) -> List[dict]:
+        """
+        Most similar past cases, best first.
+
+        Returns:
+            list: Case dicts (key, risk, confidence, time) with an added similarity
+        """
+        query = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            index, pending = self.index, self.pending
+        if index is not None:
+            scores, ids = index.search(query, k=k)
+            scores, ids = scores[0], ids[0]
+        elif len(pending):
+            similarity = pending @ _unit(query)[0]
+            ids = np.argsort(-similarity)[:k]
+            scores = similarity[ids]
+        else:
+            return []
+        return [dict(self.cases[int(i)], similarity=float(score)) for score, i in zip(scores, ids)
+                if 0 <= i < len(self.cases)]
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    """Whether $SIMILAR_CASES_DIR turns the archive on."""
+    return bool(os.environ.get(CASES_DIR_ENV_VAR))
+
+
+def get_archive() -> Optional[CaseArchive]:
+    """The archive in $SIMILAR_CASES_DIR, or None if the archive is off."""
+    global _archive
+    if not enabled():
+        return None
+    with _archive_lock:
+        if _archive is None:
+            _archive = CaseArchive(os.environ[CASES_DIR_ENV_VAR])
+    return _archive
+
+
+def record_and_find_similar(uploaded_file, risk: str, confidence: float, k: int = 5) -> List[dict]:
+    """
+    Look up the past cases most similar to a photo, then archive the photo's case.
+
+    The photo itself is excluded from the results, so re-analyzing the same
+    upload does not report it as its own match.
+
+    Args:
+        uploaded_file: Image path or file-like upload that was just analyzed
+        risk: Risk level it was given
+        confidence: Confidence of that result
+        k: Cases to return
+
+    Returns:
+        list: Case dicts with a similarity, best first (empty if the archive is
+        off or the image could not be read)
+    """
+    archive = get_archive()
+    if archive is None:
+        return []
+    embedding = loader.embed_image(uploaded_file, (BACKBONE,))
+    if embedding is None:
+        return []
+    key = content_key(read_upload(uploaded_file), backbone_version(BACKBONE))
+    similar = [case for case in archive.search(embedding, k=k + 1) if case["key"] != key][:k]
+    archive.record(embedding, key, risk, confidence)
+    return similar
@@ -0,0 +1,220 @@
+"""
+Quantized TFLite inference backend for CPU-only clinic hardware
+"""
+import glob
+import os
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+from model.mobilenet_model import INPUT_SIGNATURE, get_model, preprocess_image
+from utils.symptom_index import DATA_DIR
+
+# The standalone runtime is much lighter than full TensorFlow when installed
+try:
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:
+    Interpreter = tf.lite.Interpreter
+
+# Quantization modes and where their converted models are kept, resolved from the package
+QUANTIZATION_MODES = ("dynamic", "int8")
+DEFAULT_MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CALIBRATION_DIR = os.path.join(DATA_DIR, "calibration")
+DEFAULT_CALIBRATION_SET_PATH = os.path.join(DATA_DIR, "calibration.npy")
+CALIBRATION_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def tflite_path(quantization, model_dir=DEFAULT_MODEL_DIR):
+    """Path of the converted model for a quantization mode."""
+    return os.path.join(model_dir, f"mobilenet_v2_{quantization}.tflite")
+
+
+def calibration_images(calibration_dir=DEFAULT_CALIBRATION_DIR, limit=200):
+    """
+    Load local images for int8 calibration.
+
+    Args:
+        calibration_dir: Directory of JPG/PNG images taken on site
+        limit: Maximum number of images to use
+
+    Returns:
+        list: Preprocessed (224, 224, 3) arrays
+    """
+    paths = sorted(
+        path for path in glob.glob(os.path.join(calibration_dir, "**", "*"), recursive=True)
+        if path.lower().endswith(CALIBRATION_EXTENSIONS)
+    )
+    arrays = []
+    for path in paths[:limit]:
+        try:
+            arrays.append(preprocess_image(path))
+        except Exception:
+            pass
+    return arrays
+
+
+def write_calibration_set(calibration_dir=DEFAULT_CALIBRATION_DIR, path=DEFAULT_CALIBRATION_SET_PATH):
+    """
+    Preprocess the calibration images once into a stacked float32 .npy file.
+
+    Returns:
+        int: Number of images written
+    """
+    arrays = calibration_images(calibration_dir)
+    if not arrays:
+        raise ValueError(f"No calibration images found in {calibration_dir}")
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, np.stack(arrays))
+    os.replace(tmp_path, path)
+    return len(arrays)
+
+
+def calibration_set(calibration_dir=DEFAULT_CALIBRATION_DIR, path=DEFAULT_CALIBRATION_SET_PATH):
+    """Calibration arrays, from the preprocessed set if present, else from the images."""
+    if os.path.exists(path):
+        return list(np.load(path, mmap_mode="r"))
+    return calibration_images(calibration_dir)
+
+
+def convert_model(quantization="dynamic", model=None, calibration_dir=DEFAULT_CALIBRATION_DIR):
+    """
+    Convert the Keras model to a quantized TFLite flatbuffer.
+
+    Args:
+        quantization: "dynamic" (int8 weights, float activations) or
+            "int8" (full integer, calibrated on local images)
+        model: Keras model to convert (defaults to get_model())
+        calibration_dir: Images used to calibrate activation ranges for "int8"
+
+    Returns:
+        bytes: Serialized TFLite model
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {quantization!r}")
+    model = model if model is not None else get_model()
+    serve = tf.function(lambda images: model(images, training=False), input_signature=[INPUT_SIGNATURE])
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([serve.get_concrete_function()], model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantization == "int8":
+        arrays = calibration_set(calibration_dir)
+        if not arrays:
+            raise ValueError(f"No calibration images found in {calibration_dir}")
+
+        def representative_dataset():
+            for array in arrays:
+                yield [np.expand_dims(array, 0).astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    return converter.convert()
+
+
+def write_tflite(quantization="dynamic", model_dir=DEFAULT_MODEL_DIR, calibration_dir=DEFAULT_CALIBRATION_DIR):
+    """
+    Convert the model and write it atomically to tflite_path().
+
+    Returns:
+        str: Path of the written model
+    """
+    path = tflite_path(quantization, model_dir)
+    flatbuffer = convert_model(quantization, calibration_dir=calibration_dir)
+    os.makedirs(model_dir, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(flatbuffer)
+    os.replace(tmp_path, path)
+    return path
+
+
+class TFLiteEngine:
+    """
+    Serves a quantized TFLite model with the same interface as InferenceEngine.
+
+    The interpreter runs with one thread per CPU core. It is resized only when
+    the batch size changes, and int8 models have their inputs quantized and
+    outputs dequantized here so callers keep passing float images.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        """
+        Args:
+            model_path: Converted .tflite file
+            num_threads: Interpreter threads (defaults to the CPU count)
+        """
+        self.model_path = model_path
+        self.version = f"tflite-{os.path.splitext(os.path.basename(model_path))[0]}"
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self._interpreter = Interpreter(model_path=model_path, num_threads=self.num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        self._lock = threading.Lock()
+        self.warm = False
+
+    @classmethod
+    def build(cls, quantization="dynamic", model_dir=DEFAULT_MODEL_DIR,
+              calibration_dir=DEFAULT_CALIBRATION_DIR, num_threads=None):
+        """
+        Load the converted model, converting and saving it on first use.
+
+        Args:
+            quantization: "dynamic" or "int8"
+            model_dir: Directory converted models are cached in
+            calibration_dir: Calibration images for "int8"
+            num_threads: Interpreter threads
+
+        Returns:
+            TFLiteEngine: Engine serving the quantized model
+        """
+        path = tflite_path(quantization, model_dir)
+        if not os.path.exists(path):
+            print(f"🔧 Converting MobileNetV2 to TFLite ({quantization})...")
+            write_tflite(quantization, model_dir, calibration_dir)
+        return cls(path, num_threads=num_threads)
+
+    def warmup(self, batch_sizes=(1,)):
+        """Run synthetic batches so tensor allocation happens up front."""
+        for batch_size in batch_sizes:
+            self.predict(np.zeros((batch_size, 224, 224, 3), dtype=np.float32))
+        self.warm = True
+        return self
+
+    def predict(self, batch):
+        """
+        Run the quantized network on a batch of preprocessed images.
+
+        Args:
+            batch: Array of shape (N, 224, 224, 3)
+
+        Returns:
+            np.ndarray: Class probabilities of shape (N, 1000)
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self._interpreter.set_tensor(self._input["index"], self._quantize(batch))
+            self._interpreter.invoke()
+            return self._dequantize(self._interpreter.get_tensor(self._output["index"]))
+
+    def _quantize(self, batch):
+        dtype = self._input["dtype"]
+        if dtype == np.float32:
+            return batch
+        scale, zero_point = self._input["quantization"]
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+    def _dequantize(self, output):
+        if output.dtype == np.float32:
+            return output
+        scale, zero_point = self._output["quantization"]
+        return (output.astype(np.float32) - zero_point) * scale
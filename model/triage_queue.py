@@ -0,0 +1,237 @@
+"""
+Patient queue triaged in the background
+
+A clinic morning is dozens of patients, each with a note and/or several
+photos. Patients are added to a session's TriageQueue and scored by one
+process-wide worker thread, so the page never blocks on analysis:
+
+    queue = TriageQueue()
+    queue.add("Bed 4", "fever and cough", [image_ref])
+    queue.by_risk()        # triaged patients first, highest risk first
+
+The worker takes up to `batch_size` waiting patients at a time, across all
+sessions. It scores their notes first, so text results show up at once,
+then runs all of their photos through loader.predict_images(), one forward
+pass per `batch_size` photos. Results land on the Patient objects as each
+batch finishes, and the page refreshes to pick them up. A photo the image
+store evicted while its patient waited gets EXPIRED_RESULT instead.
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Sequence
+
+from model.image_store import ImageRef, ImageStore
+
+QUEUED = "queued"
+ANALYZING = "analyzing"
+DONE = "done"
+
+# Result for a stored photo that was evicted before the worker reached it
+EXPIRED_RESULT = (
+    "Unknown",
+    "Please upload the photo again to analyze it.",
+    "The photo was removed from the image store before it could be analyzed.",
+    0.0,
+)
+
+# Highest first; anything not listed (e.g. "Unknown") sorts with not-yet-triaged patients
+RISK_ORDER = {"High": 4, "Medium": 3, "Low-Medium": 2, "Low": 1}
+
+
+class Patient:
+    """One queued patient and the results that arrive for them."""
+
+    def __init__(self, number: int, label: str, note: str = "", images: Sequence = ()):
+        """
+        Args:
+            number: Position in the session's queue, from 1
+            label: Name, bed or card number the health worker recognizes
+            note: Symptom description (may be empty)
+            images: ImageRefs from the image store, or image paths
+        """
+        self.number = number
+        self.label = label
+        self.note = note
+        self.images = list(images)
+        self.added = time.time()
+        self.finished = None
+        self.state = QUEUED
+        self.symptom_result = None
+        self.image_results: List[Optional[tuple]] = [None] * len(self.images)
+        self.error = None
+
+    @property
+    def risk(self) -> str:
+        """Highest risk among the results so far ("Pending" before the first one)."""
+        risks = [result[0] for result in [self.symptom_result, *self.image_results] if result is not None]
+        if not risks:
+            return "Pending"
+        return max(risks, key=lambda risk: RISK_ORDER.get(risk, 0))
+
+    @property
+    def rank(self) -> int:
+        return RISK_ORDER.get(self.risk, 0)
+
+
+class TriageWorker:
+    """Background thread scoring queued patients in batches."""
+
+    def __init__(self, batch_size: int = 16, gather_wait: float = 0.05,
+                 analyze: Optional[Callable] = None, predict_images: Optional[Callable] = None,
+                 store: Optional[ImageStore] = None):
+        """
+        Args:
+            batch_size: Patients taken per round, and photos per forward pass
+            gather_wait: Seconds to wait for more patients before a round that is not full
+            analyze: Note scorer (defaults to analyze_symptoms_enhanced)
+            predict_images: Batch image scorer (defaults to loader.predict_images)
+            store: Image store the patients' ImageRefs are in (defaults to image_store.get_store())
+        """
+        self.batch_size = batch_size
+        self.gather_wait = gather_wait
+        self._analyze = analyze
+        self._predict_images = predict_images
+        self._store = store
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def submit(self, patient: Patient):
+        with self._condition:
+            self._pending.append(patient)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="triage-queue", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._pending)
+
+    def _take(self) -> List[Patient]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            if len(self._pending) < self.batch_size:
+                # Patients are usually added one after another; let a few more join this round
+                self._condition.wait(self.gather_wait)
+            return [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+
+    def _run(self):
+        if self._analyze is None:
+            from utils.enhanced_symptom_analyzer import analyze_symptoms_enhanced
+            self._analyze = analyze_symptoms_enhanced
+        if self._predict_images is None:
+            from model import loader
+            self._predict_images = loader.predict_images
+        if self._store is None:
+            from model.image_store import get_store
+            self._store = get_store()
+        while True:
+            batch = self._take()
+            try:
+                self._process(batch)
+            except Exception as e:
+                print(f"⚠️ Triage queue batch failed: {e}")
+                for patient in batch:
+                    patient.error = patient.error or f"Analysis failed: {e}"
+                    patient.finished = patient.finished or time.time()
+                    patient.state = DONE
+
+    def _process(self, batch: List[Patient]):
+        for patient in batch:
+            patient.state = ANALYZING
+        for patient in batch:
+            if patient.note.strip():
+                try:
+                    patient.symptom_result = self._analyze(patient.note)
+                except Exception as e:
+                    patient.error = f"Symptom analysis failed: {e}"
+        photos = []
+        for patient in batch:
+            for i, image in enumerate(patient.images):
+                # The store evicts photos nobody looked at for a while, and this patient may have waited longer
+                if isinstance(image, ImageRef) and self._store.get(image.key) is None:
+                    patient.image_results[i] = EXPIRED_RESULT
+                else:
+                    photos.append((patient, i))
+        for start in range(0, len(photos), self.batch_size):
+            chunk = photos[start:start + self.batch_size]
+            try:
+                results = self._predict_images([_model_input(patient.images[i]) for patient, i in chunk])
+            except Exception as e:
+                for patient, _ in chunk:
+                    patient.error = f"Image analysis failed: {e}"
+                continue
+            for (patient, i), result in zip(chunk, results):
+                patient.image_results[i] = result
+        for patient in batch:
+            patient.finished = time.time()
+            patient.state = DONE
+            try:
+                _journal(patient)
+            except Exception as e:
+                print(f"⚠️ Could not journal {patient.label}: {e}")
+
+
+def _model_input(image):
+    return image.model_input if isinstance(image, ImageRef) else image
+
+
+def _journal(patient: Patient):
+    from utils import triage_journal
+    journal = triage_journal.get_journal()
+    if journal is None:
+        return
+    if patient.symptom_result is not None:
+        journal.record_symptoms(patient.note, patient.symptom_result[0])
+    for image, result in zip(patient.images, patient.image_results):
+        if result is not None and result is not EXPIRED_RESULT and isinstance(image, ImageRef):
+            journal.record_image(image.digest, result[0], result[3])
+
+
+class TriageQueue:
+    """One session's patients, scored by a shared TriageWorker."""
+
+    def __init__(self, worker: Optional[TriageWorker] = None):
+        self.patients: List[Patient] = []
+        self._worker = worker or get_worker()
+
+    def add(self, label: str, note: str = "", images: Sequence = ()) -> Patient:
+        """Queue a patient for triage; returns at once."""
+        patient = Patient(len(self.patients) + 1, label or f"Patient {len(self.patients) + 1}", note, images)
+        self.patients.append(patient)
+        self._worker.submit(patient)
+        return patient
+
+    def by_risk(self) -> List[Patient]:
+        """Patients with the highest risk first, in arrival order within a risk level."""
+        return sorted(self.patients, key=lambda patient: (-patient.rank, patient.number))
+
+    @property
+    def pending(self) -> int:
+        """Patients whose results are not complete yet."""
+        return sum(1 for patient in self.patients if patient.state != DONE)
+
+    def wait(self, timeout: Optional[float] = None, poll: float = 0.01) -> bool:
+        """Block until every patient is triaged; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> TriageWorker:
+    """The process-wide worker shared by every session's queue."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = TriageWorker()
+    return _worker
@@ -0,0 +1,242 @@
+"""
+Warm start for the image model
+
+On a fresh process the first image used to pay for building MobileNetV2
+and fetching its ImageNet weights (a download when they are not cached,
+which fails offline), tracing the serving graph and first-run kernel
+setup. Each of these is moved out of the first request:
+
+    bundle     model/weights/ holds the weights and the ImageNet class
+               index, so loading and label decoding never touch the network
+    snapshot   model/snapshot/ is a SavedModel of the traced serving
+               function. It is written after a cold load (or by
+               scripts/build_artifacts.py) and reused while the weights and
+               the TensorFlow version it was made from are unchanged
+    warm-up    synthetic images run through the whole scoring path at the
+               batch sizes that are served, before the model reports ready
+
+    python scripts/bundle_model_weights.py    # once, with network access
+
+Set WARM_START_SNAPSHOT=0 to always build the model from its weights.
+TensorFlow is only imported by the functions that need it.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import urllib.request
+from typing import Optional
+
+import numpy as np
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+WEIGHTS_DIR = os.path.join(MODEL_DIR, "weights")
+SNAPSHOT_DIR = os.path.join(MODEL_DIR, "snapshot")
+SNAPSHOT_ENV_VAR = "WARM_START_SNAPSHOT"
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_MANIFEST = "warm_start.json"
+
+# Same file names and sources as tf.keras.applications, so its cache can be bundled as is
+WEIGHTS_URL = "https://storage.googleapis.com/tensorflow/keras-applications/mobilenet_v2/"
+CLASS_INDEX_FILE = "imagenet_class_index.json"
+CLASS_INDEX_URL = "https://storage.googleapis.com/download.tensorflow.org/data/" + CLASS_INDEX_FILE
+KERAS_CACHE_DIR = os.path.join(os.environ.get("KERAS_HOME", os.path.expanduser("~/.keras")), "models")
+
+# Single requests, and the full batches of the micro-batcher and model server workers
+WARMUP_BATCH_SIZES = (1, 8)
+
+
+def weights_file(alpha: float = 1.0, rows: int = 224) -> str:
+    """File name of the ImageNet weights of one MobileNetV2 width and input size."""
+    return f"mobilenet_v2_weights_tf_dim_ordering_tf_kernels_{float(alpha)}_{rows}.h5"
+
+
+WEIGHTS_FILE = weights_file()
+
+_class_index = None
+
+
+def bundled_path(name: str, weights_dir: str = WEIGHTS_DIR) -> Optional[str]:
+    """Path of a bundled file, or None if it has not been bundled."""
+    path = os.path.join(weights_dir, name)
+    return path if os.path.exists(path) else None
+
+
+def weights_path(alpha: float = 1.0, rows: int = 224) -> str:
+    """Weights argument for MobileNetV2: the bundled file, else "imagenet" (Keras cache or download)."""
+    return bundled_path(weights_file(alpha, rows)) or "imagenet"
+
+
+def bundle(weights_dir: str = WEIGHTS_DIR, variants=()) -> dict:
+    """
+    Copy the weights and class index into `weights_dir`.
+
+    Files already in the Keras cache are copied from there, the rest are
+    downloaded. Each file is written under a temporary name and renamed.
+
+    Args:
+        weights_dir: Directory to bundle into
+        variants: (alpha, rows) of further MobileNetV2 variants to bundle
+
+    Returns:
+        dict: file name -> where it came from ("bundled", "keras cache" or its URL)
+    """
+    os.makedirs(weights_dir, exist_ok=True)
+    files = {weights_file(alpha, rows): WEIGHTS_URL + weights_file(alpha, rows)
+             for alpha, rows in [(1.0, 224), *variants]}
+    files[CLASS_INDEX_FILE] = CLASS_INDEX_URL
+    sources = {}
+    for name, url in files.items():
+        path = os.path.join(weights_dir, name)
+        if os.path.exists(path):
+            sources[name] = "bundled"
+            continue
+        cached = os.path.join(KERAS_CACHE_DIR, name)
+        temporary = path + ".tmp"
+        try:
+            if os.path.exists(cached):
+                shutil.copyfile(cached, temporary)
+                sources[name] = "keras cache"
+            else:
+                with urllib.request.urlopen(url, timeout=60) as response, open(temporary, "wb") as f:
+                    shutil.copyfileobj(response, f)
+                sources[name] = url
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+    return sources
+
+
+def decode_predictions(preds: np.ndarray, top: int = 3) -> list:
+    """
+    Top ImageNet labels per image, as tf.keras.applications decode_predictions.
+
+    Uses the bundled class index, and Keras (which downloads it) otherwise.
+
+    Returns:
+        list: Per image, (class id, class name, score) tuples, best first
+    """
+    global _class_index
+    if _class_index is None:
+        path = bundled_path(CLASS_INDEX_FILE)
+        if path is None:
+            import tensorflow as tf
+            return tf.keras.applications.mobilenet_v2.decode_predictions(preds, top=top)
+        with open(path, encoding="utf-8") as f:
+            _class_index = {int(i): tuple(label) for i, label in json.load(f).items()}
+    results = []
+    for pred in preds:
+        best = np.argsort(pred)[-top:][::-1]
+        results.append([_class_index[int(i)] + (pred[i],) for i in best])
+    return results
+
+
+def _weights_file() -> Optional[str]:
+    """The local weights file the model is built from, if there is one."""
+    path = bundled_path(WEIGHTS_FILE)
+    if path is None and os.path.exists(os.path.join(KERAS_CACHE_DIR, WEIGHTS_FILE)):
+        path = os.path.join(KERAS_CACHE_DIR, WEIGHTS_FILE)
+    return path
+
+
+def fingerprint() -> Optional[str]:
+    """Identity of the weights and TensorFlow a snapshot is made from, None without local weights."""
+    path = _weights_file()
+    if path is None:
+        return None
+    import tensorflow as tf
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return f"{SNAPSHOT_FORMAT_VERSION}-tensorflow-{tf.__version__}-{digest.hexdigest()}"
+
+
+def snapshot_enabled() -> bool:
+    return os.environ.get(SNAPSHOT_ENV_VAR, "1") != "0"
+
+
+def fresh_snapshot(snapshot_dir: str = SNAPSHOT_DIR) -> Optional[str]:
+    """The snapshot directory if it was made from the current weights and TensorFlow, else None."""
+    if not snapshot_enabled():
+        return None
+    try:
+        with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    current = fingerprint()
+    return snapshot_dir if current is not None and manifest.get("fingerprint") == current else None
+
+
+def write_snapshot(engine, snapshot_dir: str = SNAPSHOT_DIR) -> Optional[str]:
+    """
+    Export an InferenceEngine as the warm-start snapshot.
+
+    The SavedModel is written next to `snapshot_dir` and renamed into
+    place; a loader looking in between finds no snapshot and builds the
+    model. A fresh snapshot written meanwhile by another process (e.g. a
+    model server worker) is kept.
+
+    Returns:
+        str: The snapshot directory, or None without local weights to fingerprint
+    """
+    current = fingerprint()
+    if current is None:
+        return None
+    parent = os.path.dirname(os.path.abspath(snapshot_dir))
+    temporary = tempfile.mkdtemp(dir=parent, prefix=".snapshot-")
+    try:
+        engine.export_saved_model(temporary)
+        with open(os.path.join(temporary, SNAPSHOT_MANIFEST), "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": current, "created": time.time()}, f)
+        if fresh_snapshot(snapshot_dir) is not None:
+            return snapshot_dir
+        if os.path.exists(snapshot_dir):
+            stale = tempfile.mkdtemp(dir=parent, prefix=".snapshot-stale-")
+            os.replace(snapshot_dir, os.path.join(stale, "snapshot"))
+            shutil.rmtree(stale, ignore_errors=True)
+        os.replace(temporary, snapshot_dir)
+    except OSError:
+        if fresh_snapshot(snapshot_dir) is None:
+            raise
+    finally:
+        shutil.rmtree(temporary, ignore_errors=True)
+    return snapshot_dir
+
+
+def build_snapshot(snapshot_dir: str = SNAPSHOT_DIR) -> Optional[str]:
+    """Build the model from its weights and write the snapshot."""
+    from model.mobilenet_model import InferenceEngine, get_model
+    return write_snapshot(InferenceEngine(get_model()), snapshot_dir)
+
+
+def synthetic_batch(batch_size: int, seed: int = 0) -> np.ndarray:
+    """Photo-like preprocessed images (smooth shading plus noise, in [-1, 1])."""
+    rng = np.random.default_rng(seed)
+    shade = np.linspace(-0.6, 0.6, 224, dtype=np.float32)
+    batch = shade[None, None, :, None] + rng.normal(0, 0.1, (batch_size, 224, 224, 3)).astype(np.float32)
+    return np.clip(batch, -1.0, 1.0)
+
+
+def warm_up(module, batch_sizes=WARMUP_BATCH_SIZES) -> float:
+    """
+    Run synthetic batches through the full scoring path of model.mobilenet_model.
+
+    Covers what engine.warmup() does not: the trained head and its
+    backbones, label decoding and the risk assessment.
+
+    Returns:
+        float: Seconds taken
+    """
+    start = time.perf_counter()
+    for batch_size in batch_sizes:
+        module.predict_arrays(synthetic_batch(batch_size))
+    # An engine that adapts to load (model/adaptive.py) must not count the warm-up as load
+    reset = getattr(module.get_engine(), "reset", None)
+    if reset is not None:
+        reset()
+    return time.perf_counter() - start
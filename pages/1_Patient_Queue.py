@@ -0,0 +1,109 @@
+# pages/1_Patient_Queue.py
+import time
+
+import streamlit as st
+from model import image_store
+from model import loader as image_model
+from model.triage_queue import ANALYZING, DONE, TriageQueue
+
+st.set_page_config(
+    page_title="Patient Queue · AI Clinic Buddy",
+    page_icon="📋",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+RISK_STYLES = {
+    "High": "🔴",
+    "Medium": "🟠",
+    "Low-Medium": "🟡",
+    "Low": "🟢",
+    "Unknown": "⚪",
+    "Pending": "⏳",
+}
+
+st.markdown("## 📋 Patient Queue")
+st.caption("Add every waiting patient with a note and/or photos. Analysis runs in the background, "
+           "and the queue is sorted by risk as results come in.")
+
+if "triage_queue" not in st.session_state:
+    st.session_state.triage_queue = TriageQueue()
+queue = st.session_state.triage_queue
+
+add_col, queue_col = st.columns([1, 2])
+
+with add_col:
+    st.subheader("➕ Add Patient")
+    # Cleared on submit, so the photos leave the session once they are in the image store
+    with st.form("add_patient", clear_on_submit=True):
+        label = st.text_input("Patient", placeholder="Name, bed or card number")
+        note = st.text_area("Symptoms", height=120, placeholder="e.g. fever, cough and rash for two days")
+        photos = st.file_uploader("Photos", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
+        submitted = st.form_submit_button("Add to queue", type="primary", use_container_width=True)
+    if submitted:
+        refs, unreadable = [], []
+        for photo in photos or []:
+            try:
+                refs.append(image_store.get_store().put(photo))
+            except ValueError:
+                unreadable.append(photo.name)
+        if unreadable:
+            st.warning("⚠️ Could not read: " + ", ".join(unreadable))
+        if note.strip() or refs:
+            patient = queue.add(label, note, refs)
+            st.success(f"{patient.label} added to the queue.")
+        else:
+            st.warning("⚠️ Add a symptom note or at least one photo.")
+
+with queue_col:
+    total, pending = len(queue.patients), queue.pending
+    st.subheader(f"🩺 Queue ({total} patients)")
+    if total:
+        st.progress((total - pending) / total, text=f"Triaged {total - pending} of {total}")
+    else:
+        st.info("No patients yet. Results appear here as soon as they are ready.")
+
+    for patient in queue.by_risk():
+        risk = patient.risk
+        status = {DONE: "", ANALYZING: " · analyzing…"}.get(patient.state, " · waiting…")
+        with st.expander(f"{RISK_STYLES.get(risk, '⚪')} **{patient.label}** — {risk}{status}",
+                         expanded=risk == "High"):
+            if patient.symptom_result is not None:
+                symptom_risk, recommendation, educational_note = patient.symptom_result
+                st.markdown(f"**📝 Symptoms:** {RISK_STYLES.get(symptom_risk, '⚪')} {symptom_risk}")
+                st.caption(patient.note)
+                st.markdown(recommendation)
+            if patient.images:
+                columns = st.columns(min(len(patient.images), 4))
+                for i, (ref, result) in enumerate(zip(patient.images, patient.image_results)):
+                    with columns[i % len(columns)]:
+                        # Also keeps the photo from being evicted while the page shows it
+                        if image_store.get_store().get(ref.key) is not None:
+                            st.image(ref.thumbnail, use_container_width=True)
+                        else:
+                            st.caption("🗑️ Photo expired. Upload it again to analyze it.")
+                        if result is None:
+                            st.caption("⏳ Analyzing…")
+                        else:
+                            image_risk, _, _, confidence = result
+                            confidence_text = f" ({confidence:.0%})" if confidence > 0 else ""
+                            st.caption(f"{RISK_STYLES.get(image_risk, '⚪')} {image_risk}{confidence_text}")
+                image_recommendations = {result[1] for result in patient.image_results if result is not None}
+                for recommendation in image_recommendations:
+                    st.markdown(f"**📷 Photos:** {recommendation}")
+            if patient.error:
+                st.error(patient.error)
+
+    if total and not pending and st.button("🗑️ Start a new queue"):
+        st.session_state.triage_queue = TriageQueue()
+        st.rerun()
+
+st.markdown("---")
+st.caption("⚠️ This tool does NOT provide medical diagnoses. It helps prioritize care; always consult "
+           "qualified healthcare professionals. In emergencies, call emergency services immediately.")
+
+# Load the image model in the background, then keep refreshing while results are still coming in
+image_model.start_loading()
+if pending:
+    time.sleep(1.0)
+    st.rerun()
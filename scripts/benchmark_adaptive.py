@@ -0,0 +1,145 @@
+"""
+Benchmark the adaptive inference backend: per-variant accuracy and latency, then under load
+
+Per variant (model/adaptive.py), on the same photos:
+
+    latency      p50/p99 of single-image passes and images/s at batch 8
+    agreement    top-1 ImageNet class and risk level equal to the full model's
+                 (no labelled clinic photos ship with the repo, so the full
+                 model's answers are the reference)
+    escalated    share of photos below --escalate-below, which the adaptive
+                 engine would run again on the full model
+
+Then concurrent clients send single photos to the full model alone and to
+the adaptive engine; reported are throughput, p95 latency and which
+variant served the images. Photos come from data/calibration when there
+are any, else synthetic ones are generated.
+"""
+import argparse
+import glob
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from benchmark_suite import write_photos
+
+CALIBRATION_DIR = os.path.join(ROOT, "data", "calibration")
+
+
+def load_photos(directory, count):
+    """Preprocessed (N, 224, 224, 3) batch of calibration or synthetic photos."""
+    import numpy as np
+    from model.preprocessing import preprocess_image
+    paths = sorted(path for path in glob.glob(os.path.join(CALIBRATION_DIR, "**", "*"), recursive=True)
+                   if path.lower().endswith((".jpg", ".jpeg", ".png")))[:count]
+    source = "data/calibration"
+    if not paths:
+        write_photos(directory, [(1600, 1200)], count, seed=0)
+        folder = os.path.join(directory, "1600x1200")
+        paths = sorted(os.path.join(folder, name) for name in os.listdir(folder))
+        source = "synthetic"
+    return np.stack([preprocess_image(path) for path in paths]), source
+
+
+def measure_variant(engine, photos, repeats):
+    """(p50 ms, p99 ms) of single-image passes and images/s at batch 8."""
+    latencies = []
+    for _ in range(repeats):
+        for i in range(len(photos)):
+            start = time.perf_counter()
+            engine.predict(photos[i:i + 1])
+            latencies.append((time.perf_counter() - start) * 1e3)
+    latencies.sort()
+    start = time.perf_counter()
+    batches = 0
+    for _ in range(repeats):
+        for i in range(0, len(photos) - 7, 8):
+            engine.predict(photos[i:i + 8])
+            batches += 1
+    throughput = batches * 8 / (time.perf_counter() - start) if batches else 0.0
+    return statistics.median(latencies), latencies[int(0.99 * (len(latencies) - 1))], throughput
+
+
+def run_load(engine, photos, clients, per_client):
+    """Concurrent single-photo clients: (images/s, p95 ms, variants served)."""
+    latencies, served = [], Counter()
+    lock = threading.Lock()
+
+    def client(number):
+        for i in range(per_client):
+            index = (number * per_client + i) % len(photos)
+            start = time.perf_counter()
+            engine.predict(photos[index:index + 1])
+            elapsed = (time.perf_counter() - start) * 1e3
+            variants = engine.last_variants() if hasattr(engine, "last_variants") else ["mobilenet_v2_1.0_224"]
+            with lock:
+                latencies.append(elapsed)
+                served.update(variants)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[int(0.95 * (len(latencies) - 1))], served
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--escalate-below", type=float, default=0.4)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients in the load test")
+    parser.add_argument("--per-client", type=int, default=20, help="Photos each client sends")
+    args = parser.parse_args()
+
+    if importlib.util.find_spec("tensorflow") is None:
+        sys.exit("❌ TensorFlow is not installed; there are no variants to benchmark")
+    from model import warm_start
+    from model.adaptive import FULL, AdaptiveEngine, build_variant_engine, configured_variants
+    from model.mobilenet_model import assess_predictions, get_engine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        photos, source = load_photos(tmp, args.photos)
+    print(f"📷 {len(photos)} {source} photos")
+
+    full = get_engine(backend="keras")
+    variants = [(variant, build_variant_engine(variant).warmup(warm_start.WARMUP_BATCH_SIZES))
+                for variant in configured_variants()]
+    reference = full.predict(photos)
+    reference_classes = reference.argmax(axis=1)
+    reference_risks = [assess_predictions(d)[0] for d in warm_start.decode_predictions(reference)]
+
+    print(f"\n{'variant':>22} {'p50 ms':>7} {'p99 ms':>7} {'img/s @8':>9} {'top-1 agree':>12} "
+          f"{'risk agree':>11} {'escalated':>10}")
+    for variant, engine in [(FULL, full), *variants]:
+        p50, p99, throughput = measure_variant(engine, photos, args.repeats)
+        probabilities = engine.predict(photos)
+        risks = [assess_predictions(d)[0] for d in warm_start.decode_predictions(probabilities)]
+        top1 = (probabilities.argmax(axis=1) == reference_classes).mean()
+        risk = sum(a == b for a, b in zip(risks, reference_risks)) / len(risks)
+        escalated = (probabilities.max(axis=1) < args.escalate_below).mean() if variant != FULL else 0.0
+        print(f"{variant.name:>22} {p50:>7.1f} {p99:>7.1f} {throughput:>9.1f} {top1:>12.1%} "
+              f"{risk:>11.1%} {escalated:>10.1%}")
+
+    print(f"\n⚖️  {args.clients} concurrent clients, {args.per_client} photos each")
+    adaptive = AdaptiveEngine(full, variants, escalate_below=args.escalate_below)
+    for name, engine in (("full only", full), ("adaptive", adaptive)):
+        throughput, p95, served = run_load(engine, photos, args.clients, args.per_client)
+        shares = ", ".join(f"{variant} {count / sum(served.values()):.0%}" for variant, count in served.most_common())
+        print(f"{name:>10}: {throughput:6.1f} img/s, p95 {p95:7.1f} ms  ({shares})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Cold-start benchmark: time to first text triage result in a fresh interpreter
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Runs in a fresh interpreter: the imports app.py needs for text triage, then one analysis
+PROBE = """
+import sys, time
+start = time.perf_counter()
+from model import loader
+from utils.helpers import analyze_symptoms
+analyze_symptoms("Fever with cough and shortness of breath")
+elapsed = time.perf_counter() - start
+print(elapsed, "tensorflow" in sys.modules)
+"""
+
+
+def cold_start():
+    """Return (seconds to first result, whether TensorFlow got imported)."""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout.split()
+    return float(output[0]), output[1] == "True"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=1.0, help="Maximum allowed seconds")
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        seconds, imported_tf = cold_start()
+        if imported_tf:
+            print("❌ TensorFlow was imported on the text triage path")
+            sys.exit(1)
+        samples.append(seconds)
+
+    worst = max(samples)
+    print(f"⏱️  Text triage cold start over {args.runs} runs: "
+          f"median {statistics.median(samples) * 1000:.1f} ms, worst {worst * 1000:.1f} ms")
+    if worst >= args.budget:
+        print(f"❌ Over the {args.budget:.1f}s budget")
+        sys.exit(1)
+    print(f"✅ Within the {args.budget:.1f}s budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark image inference throughput and latency at different batch sizes
+"""
+import argparse
+import io
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from model.batching import MicroBatcher
+from model.mobilenet_model import get_model, predict_image
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32, 64]
+
+
+def synthetic_upload(seed, size=(640, 480)):
+    """Return an in-memory JPEG that behaves like a Streamlit upload."""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG")
+    buffer.seek(0)
+    return buffer
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q)) * 1000 if samples else 0.0
+
+
+def run_sequential(uploads):
+    """One predict_image call per upload, as app.py does today."""
+    latencies = []
+    start = time.perf_counter()
+    for upload in uploads:
+        upload.seek(0)
+        t0 = time.perf_counter()
+        predict_image(upload)
+        latencies.append(time.perf_counter() - t0)
+    return time.perf_counter() - start, latencies
+
+
+def run_micro_batched(uploads, batch_size, max_wait_ms):
+    """batch_size concurrent clients sharing one MicroBatcher."""
+    batcher = MicroBatcher(max_batch_size=batch_size, max_wait_ms=max_wait_ms)
+    latencies = []
+    lock = threading.Lock()
+
+    def client(items):
+        for upload in items:
+            upload.seek(0)
+            t0 = time.perf_counter()
+            batcher.predict(upload)
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+
+    shards = [uploads[i::batch_size] for i in range(batch_size)]
+    threads = [threading.Thread(target=client, args=(shard,)) for shard in shards]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - start
+    batcher.stop()
+    return total, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    args = parser.parse_args()
+
+    print("🔄 Loading model and warming up...")
+    get_model()
+    predict_image(synthetic_upload(0))
+
+    uploads = [synthetic_upload(i) for i in range(args.images)]
+    print(f"\n⏱️  {args.images} images, max wait {args.max_wait_ms} ms\n")
+    print(f"{'mode':>14} {'img/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+
+    total, latencies = run_sequential(uploads)
+    print(f"{'sequential':>14} {len(uploads) / total:>9.1f} "
+          f"{percentile(latencies, 50):>9.1f} {percentile(latencies, 99):>9.1f}")
+
+    for batch_size in args.batch_sizes:
+        total, latencies = run_micro_batched(uploads, batch_size, args.max_wait_ms)
+        print(f"{'batch ' + str(batch_size):>14} {len(uploads) / total:>9.1f} "
+              f"{percentile(latencies, 50):>9.1f} {percentile(latencies, 99):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
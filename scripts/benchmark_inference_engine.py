@@ -0,0 +1,54 @@
+"""
+Compare per-image latency of Model.predict against the traced inference engine
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from model.mobilenet_model import InferenceEngine, get_model
+
+
+def measure(func, batch, repeats):
+    """Return per-call latencies in milliseconds."""
+    func(batch)
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(batch)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def report(name, latencies):
+    print(f"{name:>22} {latencies.mean():>9.2f} {np.percentile(latencies, 50):>9.2f} "
+          f"{np.percentile(latencies, 99):>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--saved-model", help="Also benchmark an exported SavedModel")
+    args = parser.parse_args()
+
+    model = get_model()
+    batch = np.random.default_rng(0).random((1, 224, 224, 3), dtype=np.float32)
+
+    start = time.perf_counter()
+    engine = InferenceEngine(model).warmup()
+    print(f"🔥 Engine traced and warmed in {(time.perf_counter() - start) * 1000:.0f} ms\n")
+
+    print(f"{'path':>22} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    report("Model.predict", measure(lambda b: model.predict(b, verbose=0), batch, args.repeats))
+    report("tf.function engine", measure(engine.predict, batch, args.repeats))
+    if args.saved_model:
+        saved = InferenceEngine.from_saved_model(args.saved_model).warmup()
+        report("SavedModel engine", measure(saved.predict, batch, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark dataset ingestion: rows/s and peak memory as the input CSV grows
+
+Synthetic inputs are built by resampling rows of data/dataset.csv. Each size
+is ingested by scripts/download_datasets.py in its own process, so the peak
+RSS reported is that run's alone; it should stay flat as the row count grows.
+"""
+import argparse
+import csv
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from utils.symptom_index import DEFAULT_DATASET_PATH
+
+
+def write_synthetic(path, rows, seed=42):
+    """Write a wide CSV of the given size by resampling dataset rows."""
+    with open(DEFAULT_DATASET_PATH, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        body = list(reader)
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for _ in range(rows):
+            writer.writerow(rng.choice(body))
+
+
+def peak_children_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    script = os.path.join(ROOT, "scripts", "download_datasets.py")
+    print(f"{'rows':>12} {'MB on disk':>11} {'seconds':>8} {'rows/s':>11} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sorted(args.sizes):
+            input_path = os.path.join(tmp, f"dataset_{rows}.csv")
+            write_synthetic(input_path, rows)
+            start = time.perf_counter()
+            # Peak RSS of waited-for children is a running max, so sizes run in ascending order
+            subprocess.run([sys.executable, script, input_path, "--no-index", "--workers", "1",
+                            "--chunk-rows", str(args.chunk_rows), "--output", os.path.join(tmp, "out.json")],
+                           cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - start
+            print(f"{rows:>12,} {os.path.getsize(input_path) / 1e6:>11.1f} {elapsed:>8.2f} "
+                  f"{rows / elapsed:>11,.0f} {peak_children_rss_mb():>12.1f}")
+            os.remove(input_path)
+
+    print("\n💡 Peak RSS should stay flat as the row count grows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark the offline triage journal: append throughput by fsync batch size,
+record size against JSON lines, and delta sync to the stand-in server
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from journal_sync_server import start_server
+from utils.symptom_index import get_symptom_index
+from utils.triage_journal import IMAGE, RISKS, SYMPTOMS, TriageJournal
+
+
+def synthetic_results(count, n_symptoms, seed=42):
+    """(kind, risk, confidence, symptom ids, image hash) tuples, a quarter of them photos."""
+    rng = random.Random(seed)
+    results = []
+    for _ in range(count):
+        if rng.random() < 0.25:
+            results.append((IMAGE, rng.choice(RISKS[1:]), rng.random(), (), rng.randbytes(16)))
+        else:
+            symptoms = tuple(rng.sample(range(n_symptoms), rng.randint(1, 6)))
+            results.append((SYMPTOMS, rng.choice(RISKS[1:]), 0.0, symptoms, None))
+    return results
+
+
+def fill(journal, results, vocabulary):
+    for kind, risk, confidence, symptoms, image_hash in results:
+        journal.append(kind, risk, confidence, symptoms, image_hash, vocabulary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--new-records", type=int, default=1_000, help="Records appended between the two syncs")
+    args = parser.parse_args()
+
+    index = get_symptom_index(build=True)
+    vocabulary = index.source_hash
+    results = synthetic_results(args.records, index.n_symptoms)
+    json_bytes = sum(len(json.dumps({
+        "time": int(time.time()), "kind": "image" if kind == IMAGE else "symptoms", "risk": risk,
+        "confidence": round(confidence, 4), "symptoms": [index.symptoms[s] for s in symptoms],
+        "image_hash": image_hash.hex() if image_hash else None,
+    })) + 1 for kind, risk, confidence, symptoms, image_hash in results)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        print(f"{'fsync every':>12} {'records/s':>11} {'µs/record':>10}")
+        for batch in args.batches:
+            folder = os.path.join(tmp, f"batch_{batch}")
+            journal = TriageJournal(folder, sync_every=batch)
+            # fsync per record is slow, so small batches append a slice of the records
+            sample = results[:max(1000, args.records * batch // max(args.batches))]
+            start = time.perf_counter()
+            fill(journal, sample, vocabulary)
+            journal.flush()
+            elapsed = time.perf_counter() - start
+            journal.close()
+            print(f"{batch:>12} {len(sample) / elapsed:>11,.0f} {elapsed / len(sample) * 1e6:>10.1f}")
+
+        journal = TriageJournal(os.path.join(tmp, "device"), sync_every=max(args.batches))
+        fill(journal, results, vocabulary)
+        journal.flush()
+        on_disk = sum(s.size for s in journal.segments)
+        print(f"\n📦 {args.records:,} records: {on_disk / args.records:.1f} bytes each on disk, "
+              f"{json_bytes / args.records:.1f} as JSON lines")
+
+        server, url = start_server(os.path.join(tmp, "server"))
+        try:
+            for label in ("full sync", "delta sync"):
+                report = journal.sync(url, "bench")
+                print(f"📡 {label}: {report.records:,} records in {report.segments} segments, "
+                      f"{report.raw_bytes / 1e6:.2f} MB -> {report.sent_bytes / 1e6:.2f} MB deflated, "
+                      f"{report.seconds * 1000:.0f} ms ({report.records / report.seconds:,.0f} records/s, "
+                      f"{report.raw_bytes / 1e6 / report.seconds:.1f} MB/s)")
+                fill(journal, synthetic_results(args.new_records, index.n_symptoms, seed=7), vocabulary)
+            assert sum(1 for _ in journal.records(after=report.acked)) == args.new_records
+        finally:
+            server.shutdown()
+            journal.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
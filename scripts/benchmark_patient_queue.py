@@ -0,0 +1,123 @@
+"""
+Benchmark triaging a queue of patients against one patient at a time
+
+Synthetic clinic morning: N patients, each with a symptom note drawn from
+the dataset and 0-3 photos. Two flows over the same patients:
+
+    sequential   the single-patient page: for each patient, store the photos,
+                 analyze each one (loader.submit_image) and the note
+                 (analyze_symptoms_enhanced), then move on to the next
+    queue        the Patient Queue page: store the photos and add the
+                 patient (model/triage_queue.py); the background worker
+                 scores notes and batches photos across patients
+
+Reported: total time until every patient has a result, the part of it the
+health worker spends waiting on analysis rather than entering patients, and
+the time until the first high-risk patient's result is in. Typing and
+clicking are not simulated; they only widen the gap, since the queue
+analyzes while the next patient is entered. Without
+TensorFlow installed, photos get the "unavailable" result at once and only
+storing them is measured.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from benchmark_suite import write_dataset_notes, write_photos
+
+DATASET_PATH = os.path.join(ROOT, "data", "dataset.csv")
+
+
+def make_patients(directory, count, max_photos, seed):
+    """(label, note, photo paths) per patient."""
+    import random
+    notes_path = os.path.join(directory, "notes.txt")
+    write_dataset_notes(notes_path, DATASET_PATH, count, seed)
+    with open(notes_path, encoding="utf-8") as f:
+        notes = [line.strip() for line in f]
+    rng = random.Random(seed)
+    photo_counts = [rng.randint(0, max_photos) for _ in range(count)]
+    write_photos(directory, [(1600, 1200)], max(1, sum(photo_counts)), seed)
+    folder = os.path.join(directory, "1600x1200")
+    photos = iter(sorted(os.path.join(folder, name) for name in os.listdir(folder)))
+    return [(f"Patient {i + 1}", note, [next(photos) for _ in range(n)])
+            for i, (note, n) in enumerate(zip(notes, photo_counts))]
+
+
+def run_sequential(patients, store):
+    from model import loader
+    from utils.enhanced_symptom_analyzer import analyze_symptoms_enhanced
+    start = time.time()
+    waiting, first_high = 0.0, None
+    for label, note, photos in patients:
+        refs = [store.put(photo) for photo in photos]
+        analysis_start = time.time()
+        risks = [loader.submit_image(ref.model_input).result()[0] for ref in refs]
+        risks.append(analyze_symptoms_enhanced(note)[0])
+        waiting += time.time() - analysis_start
+        if first_high is None and "High" in risks:
+            first_high = time.time() - start
+    return time.time() - start, waiting, first_high
+
+
+def run_queue(patients, store, batch_size):
+    from model.triage_queue import TriageQueue, TriageWorker
+    queue = TriageQueue(TriageWorker(batch_size=batch_size, store=store))
+    start = time.time()
+    for label, note, photos in patients:
+        queue.add(label, note, [store.put(photo) for photo in photos])
+    entered = time.time()
+    queue.wait()
+    total = time.time() - start
+    high = [patient.finished for patient in queue.patients if patient.risk == "High"]
+    return total, total - (entered - start), min(high) - start if high else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--max-photos", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from model import loader
+    from model.image_store import ImageStore
+    from utils.enhanced_symptom_analyzer import analyze_symptoms_enhanced
+
+    with tempfile.TemporaryDirectory() as tmp:
+        patients = make_patients(tmp, args.patients, args.max_photos, args.seed)
+        photo_count = sum(len(photos) for _, _, photos in patients)
+        print(f"🩺 {len(patients)} patients, {photo_count} photos (1600x1200)")
+
+        # Model loading and the first analysis are paid once by the server, not per flow
+        loader.start_loading()
+        try:
+            loader.get_module()
+            print("📷 Image model loaded")
+        except RuntimeError as e:
+            print(f"⚠️ Image model unavailable ({e}); photos are only stored, not analyzed")
+        analyze_symptoms_enhanced(patients[0][1])
+
+        print(f"\n{'flow':>11} {'total s':>8} {'per patient ms':>15} {'waiting s':>10} {'first High s':>13}")
+        results = {}
+        for name in ("sequential", "queue"):
+            # A fresh store per flow, so neither gets the other's derivatives for free
+            store = ImageStore(os.path.join(tmp, f"store_{name}"))
+            if name == "sequential":
+                total, waiting, first_high = run_sequential(patients, store)
+            else:
+                total, waiting, first_high = run_queue(patients, store, args.batch_size)
+            results[name] = total
+            first = f"{first_high:>13.2f}" if first_high is not None else f"{'-':>13}"
+            print(f"{name:>11} {total:>8.2f} {total / len(patients) * 1e3:>15.1f} {waiting:>10.2f} {first}")
+        print(f"\nQueue speedup: {results['sequential'] / results['queue']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
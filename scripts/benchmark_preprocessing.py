@@ -0,0 +1,93 @@
+"""
+Benchmark image preprocessing: time and peak memory per phone-sized photo
+"""
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+METHODS = ("legacy", "fast")
+
+
+def synthetic_photo(size, fmt):
+    """Return an in-memory photo with smooth content, like a real camera image."""
+    width, height = size
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                       np.full((height, width), 128, np.float32)], axis=-1).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=fmt, quality=90)
+    return buffer.getvalue()
+
+
+def legacy_preprocess(uploaded_file):
+    """The original pipeline: full decode and resize, float64 scaling, expand_dims copy."""
+    img = Image.open(uploaded_file)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = img.resize((224, 224))
+    return np.expand_dims(np.array(img) / 255.0, axis=0)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def worker(method, data, images):
+    """Preprocess the same photo repeatedly in this process and print ms/img and peak RSS."""
+    if method == "fast":
+        from model.mobilenet_model import preprocess_into
+        batch = np.empty((1, 224, 224, 3), dtype=np.float32)
+        run = lambda f: preprocess_into(f, batch[0])
+    else:
+        run = legacy_preprocess
+    # Measured after imports so only preprocessing counts towards the peak
+    baseline = peak_rss_mb()
+    run(io.BytesIO(data))
+    start = time.perf_counter()
+    for _ in range(images):
+        run(io.BytesIO(data))
+    elapsed = (time.perf_counter() - start) / images
+    print(elapsed * 1000, peak_rss_mb() - baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--worker", choices=METHODS, help=argparse.SUPPRESS)
+    parser.add_argument("--photo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with open(args.photo, "rb") as f:
+            worker(args.worker, f.read(), args.images)
+        return
+
+    print(f"{'photo':>14} {'method':>8} {'ms/img':>9} {'peak ΔRSS MB':>13}")
+    for size, fmt in [((4000, 3000), "JPEG"), ((1920, 1080), "JPEG"), ((4000, 3000), "PNG")]:
+        path = os.path.join(tempfile.mkdtemp(), f"photo.{fmt.lower()}")
+        with open(path, "wb") as f:
+            f.write(synthetic_photo(size, fmt))
+        for method in METHODS:
+            # A fresh process per method so peak RSS is not shared
+            output = subprocess.run(
+                [sys.executable, __file__, "--worker", method, "--photo", path, "--images", str(args.images)],
+                check=True, capture_output=True, text=True,
+            ).stdout.split()
+            label = f"{size[0]}x{size[1]} {fmt}"
+            print(f"{label:>14} {method:>8} {float(output[-2]):>9.1f} {float(output[-1]):>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
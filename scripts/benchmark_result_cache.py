@@ -0,0 +1,48 @@
+"""
+Benchmark cold vs cached (unchanged rerun) latency of symptom triage
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils import helpers
+from utils.helpers import analyze_symptoms
+
+SAMPLE_NOTES = [
+    "Persistent headache and fatigue with body aches",
+    "Fever with cough and shortness of breath",
+    "Mild headache and runny nose",
+    "itching, skin rash and nodal skin eruptions",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reruns", type=int, default=100_000)
+    args = parser.parse_args()
+
+    cache = helpers._result_cache
+    cache.clear()
+    start = time.perf_counter()
+    for note in SAMPLE_NOTES:
+        analyze_symptoms(note)
+    cold = (time.perf_counter() - start) / len(SAMPLE_NOTES)
+
+    start = time.perf_counter()
+    for i in range(args.reruns):
+        # Streamlit reruns resubmit the same note, sometimes re-typed with different spacing
+        analyze_symptoms(SAMPLE_NOTES[i % len(SAMPLE_NOTES)] + " " * (i % 2))
+    cached = (time.perf_counter() - start) / args.reruns
+
+    stats = cache.stats()
+    print(f"{'cold':>8} {cold * 1e6:>9.2f} µs/call")
+    print(f"{'cached':>8} {cached * 1e6:>9.2f} µs/call")
+    print(f"\n📊 hits {stats.hits:,}, misses {stats.misses:,}, "
+          f"{stats.entries} entries, {stats.bytes:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
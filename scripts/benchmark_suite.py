@@ -0,0 +1,367 @@
+"""
+Benchmark suite for the triage and inference hot paths
+
+    python scripts/benchmark_suite.py                    # run, save, compare with the baseline
+    python scripts/benchmark_suite.py --save-baseline    # accept the current numbers as the baseline
+    python scripts/benchmark_suite.py --paths analyze_symptoms ingest_dataset --threshold 0.25
+
+Corpora are generated from fixed seeds: synthetic symptom notes built from
+the risk keywords, notes derived from data/dataset.csv rows, JPEG photos at
+several resolutions and a resampled copy of data/dataset.csv. Every path
+runs in a fresh interpreter so it pays its own imports and model loading
+(cold start: import plus first call) and its peak RSS is its own. The first
+call is excluded from throughput and the p50/p99 latencies. Each path is
+repeated and the median of every metric is kept.
+
+Results are written as JSON together with the corpus fingerprint and the
+settings that change the numbers (Python, CPU count, inference backend).
+When a baseline exists, every metric that got worse by more than the
+threshold is reported and the script exits with status 1. Paths whose
+dependencies are missing (predict_image without TensorFlow) are recorded as
+skipped.
+"""
+import argparse
+import csv
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+DEFAULT_OUTPUT_PATH = os.path.join(ROOT, "data", "benchmark_results.json")
+DEFAULT_BASELINE_PATH = os.path.join(ROOT, "data", "benchmark_baseline.json")
+RESOLUTIONS = ((640, 480), (1280, 960), (1920, 1080), (4000, 3000))
+
+# Path name -> (corpus, unit of throughput, modules it needs)
+PATHS = {
+    "analyze_symptoms": ("notes_synthetic", "notes", ()),
+    "analyze_symptoms_dataset": ("notes_dataset", "notes", ()),
+    "analyze_symptoms_enhanced": ("notes_dataset", "notes", ()),
+    "preprocess_image": ("images", "images", ()),
+    "predict_image": ("images", "images", ("tensorflow",)),
+    "ingest_dataset": ("dataset_rows", "rows", ()),
+    "build_symptom_index": ("dataset_rows", "rows", ()),
+}
+
+# Metrics compared with the baseline, and whether a higher value is better
+METRICS = {
+    "throughput": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+    "cold_start_ms": False,
+}
+
+# Settings recorded with the results; a baseline taken with other values is not comparable
+SETTINGS_ENV_VARS = ("INFERENCE_BACKEND", "MODEL_SERVER_WORKERS", "IMAGE_BACKBONES", "METRICS_ENABLED")
+
+FILLER = [
+    "since yesterday", "for three days", "on and off", "mostly at night", "after meals",
+    "getting worse", "a little better today", "tired", "not sleeping well", "back from a trip",
+]
+PLAIN_SYMPTOMS = ["runny nose", "sneezing", "mild itch", "dry skin", "tired eyes", "slight cough"]
+
+
+def write_synthetic_notes(path, count, seed):
+    """Notes mixing risk keywords, harmless symptoms and filler, one per line."""
+    from utils.helpers import HIGH_RISK_KEYWORDS, MEDIUM_RISK_KEYWORDS
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            terms = (rng.sample(HIGH_RISK_KEYWORDS, rng.randint(0, 2))
+                     + rng.sample(MEDIUM_RISK_KEYWORDS, rng.randint(0, 3))
+                     + rng.sample(PLAIN_SYMPTOMS, rng.randint(1, 2)))
+            rng.shuffle(terms)
+            # The visit number keeps every note distinct, so result caches never hit
+            f.write(f"Visit {i}: {', '.join(terms)} {rng.choice(FILLER)}\n")
+
+
+def read_dataset_rows(dataset_path):
+    with open(dataset_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        return header, [row for row in reader if row and row[0].strip()]
+
+
+def write_dataset_notes(path, dataset_path, count, seed):
+    """Notes naming a random subset of one dataset row's symptoms, one per line."""
+    from utils.symptom_index import normalize_symptom, symptom_label
+    _, rows = read_dataset_rows(dataset_path)
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            symptoms = [symptom_label(normalize_symptom(cell)) for cell in rng.choice(rows)[1:] if cell.strip()]
+            chosen = rng.sample(symptoms, rng.randint(1, len(symptoms))) if symptoms else ["fatigue"]
+            f.write(f"Visit {i}: I have {', '.join(chosen[:-1])}{' and ' if len(chosen) > 1 else ''}"
+                    f"{chosen[-1]} {rng.choice(FILLER)}\n")
+
+
+def write_resampled_dataset(path, dataset_path, rows, seed):
+    """The dataset CSV resampled to a fixed number of rows."""
+    header, body = read_dataset_rows(dataset_path)
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for _ in range(rows):
+            writer.writerow(rng.choice(body))
+
+
+def write_photos(directory, resolutions, per_resolution, seed):
+    """Distinct camera-like JPEGs (smooth shading, a blotch and sensor noise) per resolution."""
+    import numpy as np
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    for width, height in resolutions:
+        folder = os.path.join(directory, f"{width}x{height}")
+        os.makedirs(folder, exist_ok=True)
+        y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+        for i in range(per_resolution):
+            cx, cy, radius = rng.uniform(0.2, 0.8) * width, rng.uniform(0.2, 0.8) * height, rng.uniform(0.05, 0.3) * height
+            skin = rng.uniform(120, 220, 3).astype(np.float32)
+            shade = 0.75 + 0.25 * (x / width)
+            blotch = np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * radius ** 2))
+            pixels = skin * shade[..., None] - blotch[..., None] * np.array([10, 70, 60], np.float32)
+            pixels += rng.normal(0, 4, pixels.shape).astype(np.float32)
+            Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(
+                os.path.join(folder, f"photo_{i:03d}.jpg"), "JPEG", quality=90)
+
+
+def build_corpora(directory, args):
+    """Write every corpus into directory and return its fingerprint."""
+    from utils.symptom_index import DEFAULT_DATASET_PATH
+    write_synthetic_notes(os.path.join(directory, "notes_synthetic.txt"), args.notes, args.seed)
+    write_dataset_notes(os.path.join(directory, "notes_dataset.txt"), DEFAULT_DATASET_PATH, args.notes, args.seed)
+    write_resampled_dataset(os.path.join(directory, "dataset_rows.csv"), DEFAULT_DATASET_PATH,
+                            args.dataset_rows, args.seed)
+    write_photos(os.path.join(directory, "images"), RESOLUTIONS, args.images, args.seed)
+    digest = hashlib.blake2b(digest_size=16)
+    for folder, _, files in sorted(os.walk(directory)):
+        for name in sorted(files):
+            digest.update(os.path.relpath(os.path.join(folder, name), directory).encode())
+            with open(os.path.join(folder, name), "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def peak_rss_mb():
+    # ru_maxrss starts from the parent's peak after fork, VmHWM is reset by exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1e3
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def load_items(corpus, directory, resolution, iterations):
+    """Inputs of one run: note strings, photo bytes or the CSV path repeated."""
+    if corpus.startswith("notes"):
+        with open(os.path.join(directory, f"{corpus}.txt"), encoding="utf-8") as f:
+            return f.read().splitlines()
+    if corpus == "images":
+        folder = os.path.join(directory, "images", resolution)
+        items = []
+        for name in sorted(os.listdir(folder)):
+            with open(os.path.join(folder, name), "rb") as f:
+                items.append(f.read())
+        return items
+    return [os.path.join(directory, "dataset_rows.csv")] * (iterations + 1)
+
+
+def import_path(name, directory):
+    """Import the code under test and return (call(item), units(item))."""
+    one = lambda item: 1
+    if name in ("analyze_symptoms", "analyze_symptoms_dataset"):
+        from utils.helpers import analyze_symptoms
+        return analyze_symptoms, one
+    if name == "analyze_symptoms_enhanced":
+        from utils.enhanced_symptom_analyzer import analyze_symptoms_enhanced
+        return analyze_symptoms_enhanced, one
+    if name == "preprocess_image":
+        import numpy as np
+        from model.preprocessing import IMAGE_SIZE, preprocess_into
+        buffer = np.empty((IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.float32)
+        return lambda data: preprocess_into(io.BytesIO(data), buffer), one
+    if name == "predict_image":
+        from model import loader
+        return lambda data: loader.predict_image(io.BytesIO(data)), one
+
+    def rows(path):
+        with open(path, "rb") as f:
+            return sum(1 for _ in f) - 1
+    if name == "ingest_dataset":
+        sys.path.insert(0, os.path.join(ROOT, "scripts"))
+        from download_datasets import ingest_file
+        return ingest_file, rows
+    if name == "build_symptom_index":
+        from utils.symptom_index import build_index
+        index_path = os.path.join(directory, "symptom_index.bin")
+        return lambda path: build_index(path, index_path=index_path), rows
+    raise ValueError(f"Unknown benchmark path {name!r}")
+
+
+def worker(name, directory, resolution, iterations):
+    """Run one path in this (fresh) process and print its metrics as JSON."""
+    corpus = PATHS[name][0]
+    items = load_items(corpus, directory, resolution, iterations)
+    # Cold start: importing the code under test plus the first call
+    start = time.perf_counter()
+    call, units = import_path(name, directory)
+    call(items[0])
+    cold_start = time.perf_counter() - start
+
+    latencies, done = [], 0
+    for item in items[1:]:
+        begin = time.perf_counter()
+        call(item)
+        latencies.append(time.perf_counter() - begin)
+        done += units(item)
+    latencies.sort()
+    print(json.dumps({
+        "calls": len(latencies),
+        "throughput": done / sum(latencies),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+        "cold_start_ms": cold_start * 1000,
+    }))
+
+
+def run_path(name, directory, resolution, args):
+    """Median metrics of a path over args.repeats fresh processes."""
+    env = dict(os.environ, PYTHONHASHSEED="0")
+    # Results must come from the code under test, not an on-disk cache or case archive
+    for var in ("RESULT_CACHE_DIR", "SIMILAR_CASES_DIR"):
+        env.pop(var, None)
+    runs = []
+    for _ in range(args.repeats):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", name, "--corpus-dir", directory,
+             "--resolution", resolution or "", "--iterations", str(args.iterations)],
+            cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    result = {metric: statistics.median(run[metric] for run in runs) for metric in METRICS}
+    result["calls"] = runs[0]["calls"]
+    result["unit"] = PATHS[name][1]
+    return result
+
+
+def compare(results, baseline, threshold):
+    """
+    Metrics that got worse than the baseline by more than threshold.
+
+    Returns:
+        list: (path, metric, baseline value, current value, relative change)
+    """
+    regressions = []
+    for path, current in results.items():
+        previous = baseline.get(path)
+        if not previous or "skipped" in current or "skipped" in previous:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append((path, metric, old, new, change))
+    return regressions
+
+
+def environment(fingerprint, args):
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "corpus": fingerprint,
+        "seed": args.seed,
+        "settings": {var: os.environ.get(var) for var in SETTINGS_ENV_VARS},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", nargs="+", choices=list(PATHS), default=list(PATHS))
+    parser.add_argument("--notes", type=int, default=2000, help="Notes per symptom corpus")
+    parser.add_argument("--images", type=int, default=8, help="Photos per resolution")
+    parser.add_argument("--dataset-rows", type=int, default=20_000)
+    parser.add_argument("--iterations", type=int, default=5, help="Runs of the dataset paths")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh processes per path")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Also store the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative change that counts as a regression")
+    parser.add_argument("--worker", choices=list(PATHS), help=argparse.SUPPRESS)
+    parser.add_argument("--corpus-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--resolution", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.corpus_dir, args.resolution, args.iterations)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        fingerprint = build_corpora(directory, args)
+        results = {}
+        print(f"{'path':>36} {'throughput':>16} {'p50 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12} {'cold ms':>9}")
+        for name in args.paths:
+            corpus, unit, requires = PATHS[name]
+            missing = [module for module in requires if importlib.util.find_spec(module) is None]
+            resolutions = [f"{w}x{h}" for w, h in RESOLUTIONS] if corpus == "images" else [None]
+            for resolution in resolutions:
+                key = f"{name}@{resolution}" if resolution else name
+                if missing:
+                    results[key] = {"skipped": f"{', '.join(missing)} not installed"}
+                    print(f"{key:>36}   skipped: {results[key]['skipped']}")
+                    continue
+                result = results[key] = run_path(name, directory, resolution, args)
+                print(f"{key:>36} {result['throughput']:>10.1f} {unit + '/s':<6}{result['p50_ms']:>9.2f} "
+                      f"{result['p99_ms']:>9.2f} {result['peak_rss_mb']:>12.1f} {result['cold_start_ms']:>9.0f}")
+
+    report = {"environment": environment(fingerprint, args), "results": results}
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\n💾 Results saved to {os.path.relpath(args.output)}")
+    if args.save_baseline:
+        print(f"📌 Baseline updated: {os.path.relpath(args.baseline)}")
+        return
+    if not os.path.exists(args.baseline):
+        print("💡 No baseline yet; store one with --save-baseline")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    for field, value in report["environment"].items():
+        if baseline["environment"].get(field) != value:
+            print(f"⚠️ Baseline {field} differs ({baseline['environment'].get(field)!r} vs {value!r}), "
+                  f"numbers may not be comparable")
+    regressions = compare(results, baseline["results"], args.threshold)
+    for path, metric, old, new, change in regressions:
+        print(f"❌ {path} {metric}: {old:.2f} -> {new:.2f} ({change:+.1%})")
+    if regressions:
+        sys.exit(1)
+    print(f"✅ No metric regressed by more than {args.threshold:.0%} against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark symptom phrase normalization: recall/precision on labelled field notes and speed
+
+Also checks the risk level both symptom analyzers give notes that are only
+understood through normalization, and exits non-zero if one changed.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.enhanced_symptom_analyzer import analyze_symptoms_enhanced
+from utils.helpers import _MATCHER, analyze_symptoms
+from utils.symptom_index import get_symptom_index
+from utils.symptom_normalizer import SymptomNormalizer, count_tiers
+
+# Field-style notes with the dataset symptom IDs they should normalize to
+LABELLED_NOTES = [
+    ("tummy ache and vomitting since yesterday", {"stomach_pain", "vomiting"}),
+    ("feverish with a bad headache", {"mild_fever", "headache"}),
+    ("diarhoea and dehidration", {"diarrhoea", "dehydration"}),
+    ("skin rsh and itchy", {"skin_rash", "itching"}),
+    ("high fevr, chills and joint pian", {"high_fever", "chills", "joint_pain"}),
+    ("yelow eyes and dark urine", {"yellowing_of_eyes", "dark_urine"}),
+    ("coughing, short of breath, chest tightness", {"cough", "breathlessness", "chest_pain"}),
+    ("throwing up and feeling sick", {"vomiting", "nausea"}),
+    ("burning when urinating", {"burning_micturition"}),
+    ("blocked nose and sneezing", {"congestion", "continuous_sneezing"}),
+    ("tired, no appetite and losing weight", {"fatigue", "loss_of_appetite", "weight_loss"}),
+    ("dizzy with blurry vision", {"dizziness", "blurred_and_distorted_vision"}),
+    ("swollen glands and sore throat", {"swelled_lymph_nodes", "throat_irritation"}),
+    ("musle weakness and back pain", {"muscle_weakness", "back_pain"}),
+    ("constipaton and abdominal pain", {"constipation", "abdominal_pain"}),
+    ("night sweats and shivers", {"sweating", "shivering"}),
+    ("heart racing and anxious", {"fast_heart_rate", "anxiety"}),
+    ("red spots on skin", {"red_spots_over_body"}),
+    ("patient is well, routine check", set()),
+    ("came in for a prescription refill", set()),
+]
+
+# Notes with the risk level they must get: a mentioned symptom counts once, in the
+# highest tier of the keywords typed in the mention and of its label's keyword
+RISK_CASES = [
+    ("feverr", "High"),                   # high_fever: "high fever", not "fever" as well
+    ("temperature", "Low-Medium"),        # mild_fever: "mild fever", not the high-risk "fever"
+    ("tummy pain", "Low-Medium"),         # stomach_pain
+    ("high fevr and vomitting", "High"),
+    ("feverish", "High"),                 # a form of "fever", although it normalizes to mild_fever
+    ("feverish and tired", "High"),
+    ("vomitting and diarrhoea", "Medium"),  # diarrhoea has no keyword, so it counts as medium risk
+    ("skin rash", "Low-Medium"),          # one symptom, not "skin rash" and "rash"
+    ("patient is well, routine check", "Low"),
+]
+
+
+def check_risk_levels(normalizer) -> bool:
+    """Print the risk level of each RISK_CASES note; True if both analyzers give the expected ones."""
+    ok = True
+    for note, expected in RISK_CASES:
+        for name, analyze in (("analyze_symptoms", analyze_symptoms), ("enhanced", analyze_symptoms_enhanced)):
+            risk = analyze(note)[0]
+            if risk != expected:
+                ok = False
+                counts = count_tiers(_MATCHER, note.lower(), normalizer)
+                print(f"   ❌ {name} {note!r}: {risk}, expected {expected} (built-in tiers {counts})")
+    print(f"   risk levels: {'all as expected' if ok else 'mismatches above'} ({len(RISK_CASES)} notes)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the notes for timing")
+    args = parser.parse_args()
+
+    index = get_symptom_index(build=True)
+    start = time.perf_counter()
+    normalizer = SymptomNormalizer(index.symptoms)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"🔤 {len(normalizer._exact)} labels and synonyms indexed in {build_ms:.1f} ms")
+
+    true_positives = predicted = expected = 0
+    for note, labels in LABELLED_NOTES:
+        found = set(normalizer.normalize(note))
+        true_positives += len(found & labels)
+        predicted += len(found)
+        expected += len(labels)
+        if found != labels:
+            print(f"   ⚠️ {note!r}: missed {sorted(labels - found)}, extra {sorted(found - labels)}")
+    print(f"   recall {true_positives / expected:.1%}, precision {true_positives / max(predicted, 1):.1%}")
+
+    # Cold pass: every phrase goes through the trigram index
+    cold = SymptomNormalizer(index.symptoms, cache_size=0)
+    notes = [note for note, _ in LABELLED_NOTES]
+    for name, instance in (("uncached", cold), ("LRU cached", normalizer)):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for note in notes:
+                instance.find(note)
+        elapsed = time.perf_counter() - start
+        print(f"⏱️  {name:>10}: {elapsed / (args.repeat * len(notes)) * 1e6:,.1f} µs/note")
+    info = normalizer.lookup.cache_info()
+    print(f"   cache: {info.hits:,} hits, {info.misses:,} misses, {info.currsize:,}/{info.maxsize:,} entries")
+
+    print("🩺 Risk levels of normalized notes")
+    if not check_risk_levels(normalizer):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
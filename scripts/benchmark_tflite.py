@@ -0,0 +1,101 @@
+"""
+Compare the float Keras model with its quantized TFLite conversions:
+model size, RSS, per-image latency and top-3 agreement
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from model.mobilenet_model import InferenceEngine, get_model
+from model.tflite_backend import DEFAULT_CALIBRATION_DIR, QUANTIZATION_MODES, TFLiteEngine, calibration_images
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux /proc, else peak RSS)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def keras_size_mb(model):
+    """Size of the float model's weights as saved to disk."""
+    path = os.path.join(tempfile.mkdtemp(), "mobilenet_v2.weights.h5")
+    model.save_weights(path)
+    return os.path.getsize(path) / 1e6
+
+
+def latencies_ms(engine, images):
+    """Per-image latency in milliseconds, one image per call."""
+    samples = []
+    for image in images:
+        start = time.perf_counter()
+        engine.predict(image[None])
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.array(samples)
+
+
+def top3_agreement(reference, candidate):
+    """Share of images whose top-1 class is in the other model's top-3, and exact top-3 set match."""
+    ref_top = np.argsort(-reference, axis=1)[:, :3]
+    cand_top = np.argsort(-candidate, axis=1)[:, :3]
+    top1_in_top3 = np.mean([r[0] in c for r, c in zip(ref_top, cand_top)])
+    same_set = np.mean([set(r) == set(c) for r, c in zip(ref_top, cand_top)])
+    return top1_in_top3, same_set
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calibration-dir", default=DEFAULT_CALIBRATION_DIR)
+    parser.add_argument("--images", type=int, default=50,
+                        help="Evaluation images (calibration images, padded with random ones)")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--model-dir", default=tempfile.mkdtemp())
+    args = parser.parse_args()
+
+    images = calibration_images(args.calibration_dir, limit=args.images)
+    rng = np.random.default_rng(0)
+    while len(images) < args.images:
+        images.append(rng.uniform(-1, 1, (224, 224, 3)).astype(np.float32))
+    images = np.stack(images).astype(np.float32)
+
+    model = get_model()
+    keras_engine = InferenceEngine(model).warmup()
+    reference = keras_engine.predict(images)
+
+    print(f"{'backend':>10} {'size MB':>9} {'RSS MB':>8} {'mean ms':>9} {'p99 ms':>9} "
+          f"{'top1∈top3':>10} {'top3 set':>9}")
+    samples = latencies_ms(keras_engine, images)
+    print(f"{'keras':>10} {keras_size_mb(model):>9.1f} {current_rss_mb():>8.1f} "
+          f"{samples.mean():>9.2f} {np.percentile(samples, 99):>9.2f} {1:>10.1%} {1:>9.1%}")
+
+    for quantization in QUANTIZATION_MODES:
+        try:
+            engine = TFLiteEngine.build(quantization, model_dir=args.model_dir,
+                                        calibration_dir=args.calibration_dir,
+                                        num_threads=args.threads).warmup()
+        except Exception as e:
+            print(f"{quantization:>10} ⚠️ skipped: {e}")
+            continue
+        samples = latencies_ms(engine, images)
+        top1_in_top3, same_set = top3_agreement(reference, engine.predict(images))
+        size = os.path.getsize(engine.model_path) / 1e6
+        print(f"{quantization:>10} {size:>9.1f} {current_rss_mb():>8.1f} "
+              f"{samples.mean():>9.2f} {np.percentile(samples, 99):>9.2f} "
+              f"{top1_in_top3:>10.1%} {same_set:>9.1%}")
+
+    print("\n💡 RSS is cumulative: every backend stays loaded for the comparison.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark the IVF vector index: build time, size, query latency and recall@k against exact search
+
+Synthetic 1280-d embeddings are drawn from a clustered low-rank model (like
+CNN features: most variance in a few directions) and generated chunk by
+chunk from fixed seeds, so a million vectors never have to fit in memory
+and the exact ground truth can be recomputed by streaming them again.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.vector_index import VectorIndex
+
+INPUT_DIM = 1280
+LATENT_DIM = 64
+CLUSTERS = 2000
+CHUNK = 50_000
+
+
+class SyntheticEmbeddings:
+    """Deterministic clustered unit vectors, generated in chunks."""
+
+    def __init__(self, seed=42):
+        rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.centers = rng.normal(size=(CLUSTERS, LATENT_DIM)).astype(np.float32)
+        self.mixing = rng.normal(size=(LATENT_DIM, INPUT_DIM)).astype(np.float32) / np.sqrt(LATENT_DIM)
+        # Within-cluster variation decays across latent directions, as in CNN features
+        self.spread = (0.6 * np.arange(1, LATENT_DIM + 1) ** -0.25).astype(np.float32)
+
+    def chunk(self, index, size=CHUNK):
+        rng = np.random.default_rng((self.seed, index))
+        latent = self.centers[rng.integers(0, CLUSTERS, size)] + self.spread * rng.normal(size=(size, LATENT_DIM))
+        vectors = latent.astype(np.float32) @ self.mixing + 0.1 * rng.normal(size=(size, INPUT_DIM)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def chunks(self, total):
+        for index, start in enumerate(range(0, total, CHUNK)):
+            yield start, self.chunk(index, min(CHUNK, total - start))
+
+
+def exact_top_k(data, total, queries, k):
+    """Brute-force cosine top-k ids over all vectors, streaming the chunks."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.full((len(queries), k), -1, dtype=np.int64)
+    for start, vectors in data.chunks(total):
+        scores = np.concatenate([best_scores, queries @ vectors.T], axis=1)
+        ids = np.concatenate([best_ids, np.broadcast_to(np.arange(start, start + len(vectors)),
+                                                        (len(queries), len(vectors)))], axis=1)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_ids = np.take_along_axis(ids, top, axis=1)
+    return best_ids
+
+
+def directory_mb(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path)) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--train", type=int, default=100_000, help="Sample used to train PCA and clusters")
+    parser.add_argument("--nlist", type=int, default=2048)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--inserts", type=int, default=1000, help="Single-vector inserts timed after the build")
+    parser.add_argument("--dir", help="Index directory (default: a temporary one, removed afterwards)")
+    args = parser.parse_args()
+
+    data = SyntheticEmbeddings()
+    path = args.dir or tempfile.mkdtemp(prefix="vector_index_")
+    try:
+        start = time.perf_counter()
+        sample = np.concatenate([vectors for _, vectors in data.chunks(args.train)])
+        index = VectorIndex.train(path, sample, dim=args.dim, nlist=args.nlist)
+        del sample
+        trained = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for first, vectors in data.chunks(args.vectors):
+            index.add(vectors, np.arange(first, first + len(vectors)), compact=False)
+        index.compact()
+        built = time.perf_counter() - start
+        print(f"🏗️  {len(index):,} x {INPUT_DIM}-d vectors -> {args.dim}-d, {index.nlist} clusters")
+        print(f"   train {trained:.1f}s, add + compact {built:.1f}s ({len(index) / built:,.0f} vectors/s), "
+              f"{directory_mb(path):,.0f} MB on disk")
+
+        start = time.perf_counter()
+        index = VectorIndex(path)
+        print(f"   memory-mapped open in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        # Held-out draws from the same distribution (chunk indices past the indexed ones)
+        queries = data.chunk(10**6, args.queries)
+        start = time.perf_counter()
+        truth = exact_top_k(data, args.vectors, queries, args.k)
+        print(f"   exact ground truth for {args.queries} queries in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'nprobe':>7} {'p50 ms':>8} {'p99 ms':>8} {'recall@' + str(args.k):>10}")
+        for nprobe in args.nprobe:
+            latencies, hits = [], 0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                _, ids = index.search(query, k=args.k, nprobe=nprobe)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += len(np.intersect1d(ids[0], expected))
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+            print(f"{nprobe:>7} {latencies[len(latencies) // 2]:>8.2f} {p99:>8.2f} "
+                  f"{hits / (len(queries) * args.k):>10.1%}")
+
+        extra = data.chunk(10**6 + 1, args.inserts)
+        start = time.perf_counter()
+        for i, vector in enumerate(extra):
+            index.add(vector, [args.vectors + i], compact=False)
+        inserted = time.perf_counter() - start
+        _, ids = index.search(extra[:1], k=1)
+        print(f"\n➕ {args.inserts} incremental inserts: {inserted / args.inserts * 1000:.2f} ms each, "
+              f"immediately searchable: {ids[0, 0] == args.vectors}")
+    finally:
+        if not args.dir:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark first-request latency of the image model: cold versus warm start
+
+Every configuration runs in a fresh interpreter and analyzes three distinct
+photos (so no result cache hits) through loader.submit_image, as the app
+does:
+
+    on-demand    nothing loaded ahead; the first request loads the model
+    cold         preloaded at startup, model built from its weights
+    snapshot     preloaded at startup from the warm-start snapshot
+
+Reported per configuration: seconds from start until the model reports
+ready (loaded and warmed up), then the latency of the first request and of
+the following ones. Needs TensorFlow, and local weights for the snapshot
+configuration (python scripts/bundle_model_weights.py).
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from benchmark_suite import write_photos
+
+# name -> (preload, use the snapshot)
+CONFIGURATIONS = {
+    "on-demand": (False, False),
+    "cold": (True, False),
+    "snapshot": (True, True),
+}
+
+# Runs in a fresh interpreter: optionally preload, then analyze the photos one by one
+PROBE = """
+import sys, time
+start = time.perf_counter()
+from model import loader
+ready = 0.0
+if sys.argv[1] == "1":
+    loader.start_loading()
+    loader.get_module()
+    ready = time.perf_counter() - start
+latencies = []
+for path in sys.argv[2:]:
+    request = time.perf_counter()
+    loader.submit_image(path).result()
+    latencies.append(time.perf_counter() - request)
+print(ready, *latencies)
+"""
+
+
+def run(preload, snapshot, photos):
+    """(seconds to ready, [request latencies]) in a fresh interpreter."""
+    env = dict(os.environ, WARM_START_SNAPSHOT="1" if snapshot else "0")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, "1" if preload else "0", *photos],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stdout.split()
+    values = [float(value) for value in output[-(len(photos) + 1):]]
+    return values[0], values[1:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh processes per configuration")
+    args = parser.parse_args()
+
+    if importlib.util.find_spec("tensorflow") is None:
+        sys.exit("❌ TensorFlow is not installed; there is no image model to warm up")
+    from model import warm_start
+    configurations = dict(CONFIGURATIONS)
+    if warm_start.fresh_snapshot() is None:
+        print("📸 Writing the warm-start snapshot...")
+        if warm_start.build_snapshot() is None:
+            print("⚠️ No local weights to snapshot, skipping the snapshot configuration")
+            del configurations["snapshot"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"\n{'start':>10} {'ready s':>8} {'first request ms':>17} {'later requests ms':>18}")
+        for index, (name, (preload, snapshot)) in enumerate(configurations.items()):
+            readies, firsts, laters = [], [], []
+            for repeat in range(args.repeats):
+                # New photos for every process, so the persistent result cache never answers
+                directory = os.path.join(tmp, f"{name}_{repeat}")
+                write_photos(directory, [(1600, 1200)], 3, seed=1000 * index + repeat)
+                folder = os.path.join(directory, "1600x1200")
+                photos = sorted(os.path.join(folder, photo) for photo in os.listdir(folder))
+                ready, latencies = run(preload, snapshot, photos)
+                readies.append(ready)
+                firsts.append(latencies[0] * 1e3)
+                laters.extend(latency * 1e3 for latency in latencies[1:])
+            ready_text = f"{statistics.median(readies):>8.2f}" if preload else f"{'-':>8}"
+            print(f"{name:>10} {ready_text} {statistics.median(firsts):>17.1f} {statistics.median(laters):>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Rebuild stale derived artifacts: symptom index, vocabulary, calibration set, TFLite models
+and the warm-start snapshot
+
+Every artifact records the content hashes of its inputs and its builder
+version in data/artifacts.json; only artifacts whose inputs or builder
+changed (or whose outputs are missing) are rebuilt, independent ones in
+parallel.
+
+    python scripts/build_artifacts.py                 # everything that is stale
+    python scripts/build_artifacts.py vocabulary      # one artifact and its dependencies
+    python scripts/build_artifacts.py --dry-run       # only report what is stale
+"""
+import argparse
+import glob
+import importlib.metadata
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from download_datasets import DEFAULT_OUTPUT_PATH, VOCABULARY_FORMAT_VERSION, default_inputs, ingest
+from model import warm_start
+from utils.artifacts import BUILT, FAILED, FRESH, MANIFEST_PATH, SKIPPED, STALE, Artifact, build_artifacts
+from utils.symptom_index import (DATA_DIR, DEFAULT_DATASET_PATH, DEFAULT_INDEX_PATH, DEFAULT_SEVERITY_PATH,
+                                 FORMAT_VERSION, build_index)
+
+# Same places as model/tflite_backend.py, which imports TensorFlow
+MODEL_DIR = warm_start.MODEL_DIR
+CALIBRATION_DIR = os.path.join(DATA_DIR, "calibration")
+CALIBRATION_SET_PATH = os.path.join(DATA_DIR, "calibration.npy")
+CALIBRATION_EXTENSIONS = (".jpg", ".jpeg", ".png")
+KERAS_WEIGHTS = os.path.join(warm_start.KERAS_CACHE_DIR, warm_start.WEIGHTS_FILE)
+BUNDLED_WEIGHTS = os.path.join(warm_start.WEIGHTS_DIR, warm_start.WEIGHTS_FILE)
+SNAPSHOT_MANIFEST_PATH = os.path.join(warm_start.SNAPSHOT_DIR, warm_start.SNAPSHOT_MANIFEST)
+
+OUTCOME_ICONS = {FRESH: "✅", BUILT: "🔧", STALE: "🕒", FAILED: "❌", SKIPPED: "⏭️"}
+
+
+def tensorflow_version():
+    try:
+        return importlib.metadata.version("tensorflow")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def calibration_paths():
+    return sorted(path for path in glob.glob(os.path.join(CALIBRATION_DIR, "**", "*"), recursive=True)
+                  if path.lower().endswith(CALIBRATION_EXTENSIONS))
+
+
+# Builders run in worker processes, so TensorFlow is only imported by the ones that need it
+def build_symptom_index():
+    build_index(DEFAULT_DATASET_PATH, DEFAULT_SEVERITY_PATH, DEFAULT_INDEX_PATH)
+
+
+def build_vocabulary():
+    ingest(default_inputs(), DEFAULT_OUTPUT_PATH, build=False)
+
+
+def build_calibration_set():
+    from model.tflite_backend import write_calibration_set
+    write_calibration_set(CALIBRATION_DIR, CALIBRATION_SET_PATH)
+
+
+def build_tflite_dynamic():
+    from model.tflite_backend import write_tflite
+    write_tflite("dynamic", MODEL_DIR)
+
+
+def build_tflite_int8():
+    from model.tflite_backend import write_tflite
+    write_tflite("int8", MODEL_DIR, CALIBRATION_DIR)
+
+
+def build_warm_start_snapshot():
+    if warm_start.build_snapshot() is None:
+        raise RuntimeError("No local MobileNetV2 weights to snapshot; run scripts/bundle_model_weights.py")
+
+
+def artifact_graph():
+    """
+    The derived artifacts that can be built here, dependencies first.
+
+    TensorFlow artifacts are only listed when TensorFlow is installed, the
+    int8 model only when there are calibration images, and the warm-start
+    snapshot only when there are local weights to build it from.
+    """
+    graph = [
+        Artifact("symptom_index", (DEFAULT_INDEX_PATH,), (DEFAULT_DATASET_PATH, DEFAULT_SEVERITY_PATH),
+                 f"symptom-index/{FORMAT_VERSION}", build_symptom_index),
+        # Free-text corpora are normalized against the index vocabulary
+        Artifact("vocabulary", (DEFAULT_OUTPUT_PATH,), tuple(default_inputs()),
+                 f"vocabulary/{VOCABULARY_FORMAT_VERSION}", build_vocabulary, deps=("symptom_index",)),
+    ]
+    tf_version = tensorflow_version()
+    if tf_version is None:
+        return graph
+    weights = next(((path,) for path in (BUNDLED_WEIGHTS, KERAS_WEIGHTS) if os.path.exists(path)), ())
+    graph.append(Artifact("tflite_dynamic", (os.path.join(MODEL_DIR, "mobilenet_v2_dynamic.tflite"),), weights,
+                          f"tflite-dynamic/tensorflow-{tf_version}", build_tflite_dynamic))
+    if weights:
+        graph.append(Artifact("warm_start", (SNAPSHOT_MANIFEST_PATH,), weights,
+                              f"warm-start-snapshot/{warm_start.SNAPSHOT_FORMAT_VERSION}/tensorflow-{tf_version}",
+                              build_warm_start_snapshot))
+    images = tuple(calibration_paths())
+    if images:
+        graph.append(Artifact("calibration_set", (CALIBRATION_SET_PATH,), images,
+                              "calibration/224/minus1-1", build_calibration_set))
+        graph.append(Artifact("tflite_int8", (os.path.join(MODEL_DIR, "mobilenet_v2_int8.tflite"),), weights,
+                              f"tflite-int8/tensorflow-{tf_version}", build_tflite_int8,
+                              deps=("calibration_set",)))
+    return graph
+
+
+def report(name, outcome, detail):
+    print(f"{OUTCOME_ICONS[outcome]} {name:<16} {outcome}" + (f" ({detail})" if detail else ""), flush=True)
+
+
+def run(targets=None, force=False, dry_run=False, workers=None, manifest_path=MANIFEST_PATH):
+    """Build the given artifacts (default: all) and return their outcomes."""
+    graph = artifact_graph()
+    if tensorflow_version() is None:
+        print("⚠️ TensorFlow is not installed, skipping the TFLite and warm-start artifacts")
+    return build_artifacts(graph, targets, force=force, dry_run=dry_run, workers=workers,
+                           manifest_path=manifest_path, on_result=report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", help="Artifacts to build (default: all)")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if fresh")
+    parser.add_argument("--dry-run", action="store_true", help="Only report stale artifacts")
+    parser.add_argument("--workers", type=int, help="Artifacts built in parallel")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        results = run(args.targets, args.force, args.dry_run, args.workers, args.manifest)
+    except KeyError as e:
+        sys.exit(f"❌ {e.args[0]}")
+    print(f"\n⏱️  {time.perf_counter() - start:.2f}s")
+    if any(outcome in (FAILED, SKIPPED) for outcome in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Compile data/dataset.csv and Symptom-severity.csv into the binary symptom index
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.symptom_index import (DEFAULT_DATASET_PATH, DEFAULT_INDEX_PATH, DEFAULT_SEVERITY_PATH,
+                                 SymptomIndex, build_index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_PATH)
+    parser.add_argument("--severity", default=DEFAULT_SEVERITY_PATH)
+    parser.add_argument("--output", default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build_index(args.dataset, args.severity, args.output)
+    built = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = SymptomIndex(args.output)
+    opened = time.perf_counter() - start
+
+    print(f"✅ Built {args.output} in {built * 1000:.0f} ms ({os.path.getsize(args.output):,} bytes)")
+    print(f"   - {index.n_symptoms} symptoms, {index.n_diseases} diseases, {index.nnz} disease-symptom pairs")
+    print(f"   - memory-mapped and ready in {opened * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Bulk offline triage of CSV/JSONL backlogs of intake notes and photos
+
+Each input row may have an "id", a "symptoms" note and an "image" path
+(relative to --image-root). Rows are streamed, scored in chunks across a
+process pool (images in a chunk share one forward pass) and appended to the
+output in input order. A row whose fields are not strings is written with
+an "error" instead of results, as is a JSONL line that is not valid JSON. Progress is checkpointed after every chunk,
+so an interrupted run continues where it stopped when started again.
+
+    python scripts/bulk_triage.py intake.csv results.jsonl --workers 4
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import NamedTuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.enhanced_symptom_analyzer import analyze_symptoms_enhanced
+
+OUTPUT_FIELDS = [
+    "row", "id",
+    "symptom_risk", "symptom_recommendation", "symptom_educational_note",
+    "image_risk", "image_confidence", "image_recommendation", "image_educational_note",
+    "error",
+]
+
+
+class UnreadableLine(NamedTuple):
+    """Stands in for a JSONL line that is not valid JSON, so it keeps its row number."""
+    error: str
+
+
+def read_rows(path):
+    """Stream input rows as dicts from a .csv or .jsonl file (UnreadableLine for invalid JSON)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield UnreadableLine(f"Invalid JSON: {e}")
+
+
+def count_rows(path):
+    """Count input rows with a streaming pass (for the ETA)."""
+    return sum(1 for _ in read_rows(path))
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ignore_interrupts():
+    """Pool initializer: Ctrl-C is handled by the parent, which drains the pool and exits."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def triage_chunk(start, rows, image_root):
+    """
+    Score one chunk of rows in a worker process.
+
+    Args:
+        start: Input row number of the first row
+        rows: Row dicts
+        image_root: Directory image paths are relative to
+
+    Returns:
+        list: Output dicts in input order
+    """
+    results, images = [], []
+    for offset, row in enumerate(rows):
+        result = dict.fromkeys(OUTPUT_FIELDS, "")
+        result["row"] = start + offset
+        results.append(result)
+        if isinstance(row, UnreadableLine):
+            result["error"] = row.error
+            continue
+        # JSONL rows can hold any JSON value
+        if not isinstance(row, dict):
+            result["error"] = f"Expected an object, got {type(row).__name__}"
+            continue
+        result["id"] = row.get("id", "")
+        symptoms, image = row.get("symptoms") or "", row.get("image") or ""
+        if not isinstance(symptoms, str) or not isinstance(image, str):
+            result["error"] = '"symptoms" and "image" must be strings'
+            continue
+        if symptoms.strip():
+            risk, recommendation, educational_note = analyze_symptoms_enhanced(symptoms)
+            result.update(symptom_risk=risk, symptom_recommendation=recommendation,
+                          symptom_educational_note=educational_note)
+        if image:
+            images.append((offset, os.path.join(image_root, image)))
+
+    if images:
+        # Imported here so symptom-only backlogs never load TensorFlow
+        from model.mobilenet_model import predict_images
+        for (i, _), (risk, recommendation, educational_note, confidence) in zip(
+                images, predict_images([path for _, path in images])):
+            results[i].update(image_risk=risk, image_confidence=round(confidence, 4),
+                              image_recommendation=recommendation, image_educational_note=educational_note)
+    return results
+
+
+class Checkpoint:
+    """Rows completed, rows with errors and output bytes written, saved atomically next to the output."""
+
+    def __init__(self, output_path):
+        self.path = f"{output_path}.checkpoint"
+        self.rows = 0
+        self.errors = 0
+        self.output_bytes = 0
+
+    def load(self, input_path):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        if state.get("input") != os.path.abspath(input_path):
+            raise SystemExit(f"❌ {self.path} belongs to another input: {state.get('input')}")
+        self.rows = state["rows"]
+        self.errors = state.get("errors", 0)
+        self.output_bytes = state["output_bytes"]
+        return True
+
+    def save(self, input_path):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"input": os.path.abspath(input_path), "rows": self.rows, "errors": self.errors,
+                       "output_bytes": self.output_bytes}, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def format_results(results, as_csv, header):
+    if not as_csv:
+        return "".join(json.dumps(result) + "\n" for result in results)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=OUTPUT_FIELDS)
+    if header:
+        writer.writeheader()
+    writer.writerows(results)
+    return buffer.getvalue()
+
+
+def format_eta(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Input .csv or .jsonl")
+    parser.add_argument("output", help="Output .jsonl, or .csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=64, help="Rows per task (and image batch)")
+    parser.add_argument("--image-root", help="Directory image paths are relative to (default: input's directory)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start over")
+    parser.add_argument("--no-count", action="store_true", help="Skip the counting pass (no ETA)")
+    args = parser.parse_args()
+
+    image_root = args.image_root or os.path.dirname(os.path.abspath(args.input))
+    as_csv = args.output.lower().endswith(".csv")
+    checkpoint = Checkpoint(args.output)
+    resumed = not args.restart and checkpoint.load(args.input)
+    if resumed and not os.path.exists(args.output):
+        print("⚠️ Output file is missing, starting over")
+        resumed = False
+        checkpoint = Checkpoint(args.output)
+    total = None if args.no_count else count_rows(args.input)
+
+    with open(args.output, "r+b" if resumed else "wb") as out:
+        # Drop anything written after the last checkpoint
+        out.truncate(checkpoint.output_bytes)
+        out.seek(checkpoint.output_bytes)
+        if resumed:
+            print(f"↩️  Resuming after row {checkpoint.rows:,}")
+
+        rows = read_rows(args.input)
+        for _ in range(checkpoint.rows):
+            next(rows, None)
+
+        start_rows, start_time = checkpoint.rows, time.monotonic()
+        next_report = start_time
+
+        # Ctrl-C only raises a flag, so it never lands between writing a chunk and checkpointing it
+        stop = []
+
+        def request_stop(signum, frame):
+            signal.signal(signal.SIGINT, signal.default_int_handler)  # a second Ctrl-C aborts at once
+            stop.append(signum)
+            print("\n⏸️  Finishing the chunks in progress...", flush=True)
+        previous_handler = signal.signal(signal.SIGINT, request_stop)
+
+        # Bounded window of in-flight chunks keeps memory constant
+        max_in_flight = args.workers * 2
+        try:
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=ignore_interrupts) as pool:
+                in_flight = deque()
+                next_row = checkpoint.rows
+                chunks = chunked(rows, args.chunk_size)
+                while True:
+                    if stop:
+                        # Chunks not started yet are dropped; running ones finish and are written in order
+                        for future in in_flight:
+                            future.cancel()
+                        in_flight = deque(future for future in in_flight if not future.cancelled())
+                    while not stop and len(in_flight) < max_in_flight:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            break
+                        in_flight.append(pool.submit(triage_chunk, next_row, chunk, image_root))
+                        next_row += len(chunk)
+                    if not in_flight:
+                        break
+                    if not in_flight[0].done():
+                        wait((in_flight[0],), timeout=0.5)
+                        continue
+
+                    results = in_flight.popleft().result()
+                    out.write(format_results(results, as_csv, header=checkpoint.output_bytes == 0).encode("utf-8"))
+                    out.flush()
+                    checkpoint.rows += len(results)
+                    checkpoint.errors += sum(1 for result in results if result["error"])
+                    checkpoint.output_bytes = out.tell()
+                    checkpoint.save(args.input)
+
+                    now = time.monotonic()
+                    if now < next_report and in_flight:
+                        continue
+                    next_report = now + 0.5
+                    elapsed = now - start_time
+                    rate = (checkpoint.rows - start_rows) / elapsed if elapsed else 0.0
+                    progress = f"{checkpoint.rows:,}" + (f"/{total:,}" if total is not None else "")
+                    eta = f", ETA {format_eta((total - checkpoint.rows) / rate)}" if total and rate else ""
+                    print(f"\r⏱️  {progress} rows, {rate:,.0f} rows/s{eta}   ", end="", flush=True)
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
+        if stop:
+            raise KeyboardInterrupt
+
+    error_note = f" ({checkpoint.errors:,} with errors)" if checkpoint.errors else ""
+    print(f"\n✅ Wrote {checkpoint.rows:,} rows to {args.output}{error_note}")
+    checkpoint.remove()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrupted. Run the same command again to resume from the checkpoint.")
@@ -0,0 +1,42 @@
+"""
+Bundle the MobileNetV2 weights and ImageNet class index into model/weights/
+
+Run once with network access (or with the files already in the Keras
+cache). Afterwards the image model loads and decodes labels offline, and
+the warm-start snapshot can be built:
+
+    python scripts/bundle_model_weights.py
+    python scripts/build_artifacts.py warm_start
+
+With --adaptive, the weights of the variants INFERENCE_BACKEND=adaptive
+serves ($ADAPTIVE_VARIANTS, or the default ladder) are bundled too.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from model.adaptive import configured_variants
+from model.warm_start import WEIGHTS_DIR, bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights-dir", default=WEIGHTS_DIR)
+    parser.add_argument("--adaptive", action="store_true", help="Also bundle the adaptive backend's variants")
+    args = parser.parse_args()
+
+    variants = configured_variants() if args.adaptive else ()
+    try:
+        sources = bundle(args.weights_dir, variants)
+    except OSError as e:
+        sys.exit(f"❌ Could not bundle the model weights: {e}")
+    for name, source in sources.items():
+        size = os.path.getsize(os.path.join(args.weights_dir, name)) / 1e6
+        print(f"📦 {name} ({size:.1f} MB) from {source}")
+    print(f"✅ Bundled into {args.weights_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,29 @@
 """
 Script to download and prepare Kaggle datasets for AI Clinic Buddy
+
+Ingestion is non-interactive, so it can run in a pipeline:
+
+    python scripts/download_datasets.py --download disease-symptom
+    python scripts/download_datasets.py        # re-ingest only if data/ changed
+    python scripts/download_datasets.py data/dataset.csv data/Symptom2Disease.csv --workers 2
+
+Each CSV is read in fixed-size chunks with string dtypes, and symptom and
+disease frequencies are counted incrementally, so peak memory depends on
+the chunk size and vocabulary, not on the input size. Files are ingested in
+parallel and the vocabulary is written atomically to
+data/enhanced_symptoms.json.
 """
+import argparse
+import json
 import os
 import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
-import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
 # Fix Windows encoding for emoji output
 try:
@@ -49,190 +68,231 @@ def download_kaggle_dataset(dataset_name, download_path="data"):
         print(f"2. Click 'Download'")
         print(f"3. Extract to {download_path}/")
 
-def process_disease_symptom_dataset(csv_path="data/dataset.csv"):
+# Kaggle datasets and the CSVs they provide
+DATASETS = {
+    "disease-symptom": {
+        "name": "itachi9604/disease-symptom-description-dataset",
+        "description": "Disease Symptom Dataset (Recommended for symptom analysis)",
+        "files": ["dataset.csv"],
+    },
+    "symptom2disease": {
+        "name": "niyar56/symptom2disease-dataset",
+        "description": "Symptom2Disease Dataset (Free-text notes, normalized to dataset symptoms)",
+        "files": ["Symptom2Disease.csv"],
+    },
+}
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_OUTPUT_PATH = os.path.join(DATA_DIR, "enhanced_symptoms.json")
+# Bump when the layout of the output JSON changes
+VOCABULARY_FORMAT_VERSION = 2
+CHUNK_ROWS = 50_000
+SYMPTOM_LIMIT = 100
+DISEASE_LIMIT = 30
+
+# Header names, checked in order
+DISEASE_COLUMNS = ("disease", "disease_name", "prognosis", "condition", "illness", "label")
+TEXT_COLUMNS = ("symptoms", "symptom_text", "text", "description")
+
+
+def detect_columns(csv_path):
     """
-    Process disease symptom dataset and create enhanced symptom keywords.
-    
+    Find the columns to ingest from the CSV header alone.
+
+    A "wide" file has one symptom per cell (Symptom_1..Symptom_17); a "text"
+    file has a free-text note per row.
+
     Args:
-        csv_path: Path to the disease symptom CSV file
+        csv_path: Path to the CSV file
+
+    Returns:
+        tuple: (disease column or None, symptom columns, text column or None)
     """
-    try:
-        # Load dataset
-        print(f"📖 Reading CSV file: {csv_path}")
-        df = pd.read_csv(csv_path)
-        
-        # Display dataset info
-        print(f"\n📊 Dataset loaded: {len(df)} rows, {len(df.columns)} columns")
-        print(f"Columns: {list(df.columns)}")
-        print("\nFirst few rows:")
-        print(df.head())
-        
-        # Extract symptoms and diseases
-        symptoms_list = []
-        diseases_list = []
-        
-        # Try to find symptom and disease columns (case-insensitive)
-        df_columns_lower = [col.lower() for col in df.columns]
-        
-        # Look for symptom column
-        symptom_col = None
-        for col in df.columns:
-            if 'symptom' in col.lower() or 'symptom' in str(df[col].iloc[0] if len(df) > 0 else '').lower():
-                symptom_col = col
-                break
-        
-        # Look for disease column
-        disease_col = None
-        for col in df.columns:
-            if 'disease' in col.lower() or 'disease' in str(df[col].iloc[0] if len(df) > 0 else '').lower():
-                disease_col = col
-                break
-        
-        # If not found, try common alternative names
-        if not symptom_col:
-            for alt in ['symptoms', 'symptom_text', 'description', 'text', 'label']:
-                if alt in df_columns_lower:
-                    symptom_col = df.columns[df_columns_lower.index(alt)]
-                    break
-        
-        if not disease_col:
-            for alt in ['disease', 'disease_name', 'condition', 'illness']:
-                if alt in df_columns_lower:
-                    disease_col = df.columns[df_columns_lower.index(alt)]
-                    break
-        
-        # Extract data
-        if symptom_col:
-            print(f"\n✅ Found symptom column: '{symptom_col}'")
-            symptoms_list = df[symptom_col].dropna().astype(str).tolist()
-            # Clean and extract individual symptoms from text
-            all_symptoms = []
-            for symptom_text in symptoms_list:
-                # Split by common delimiters
-                if ',' in symptom_text:
-                    all_symptoms.extend([s.strip().lower() for s in symptom_text.split(',')])
-                elif ';' in symptom_text:
-                    all_symptoms.extend([s.strip().lower() for s in symptom_text.split(';')])
-                else:
-                    all_symptoms.append(symptom_text.strip().lower())
-            symptoms_list = list(set(all_symptoms))  # Remove duplicates
-        
-        if disease_col:
-            print(f"✅ Found disease column: '{disease_col}'")
-            diseases_list = df[disease_col].dropna().unique().tolist()
-        
-        # Create enhanced keywords file
-        enhanced_keywords = {
-            'high_risk_diseases': diseases_list[:30] if diseases_list else [],
-            'symptoms': symptoms_list[:100] if symptoms_list else [],
-            'total_rows': len(df),
-            'source_file': csv_path
-        }
-        
-        # Save to JSON
-        output_path = "data/enhanced_symptoms.json"
-        os.makedirs("data", exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(enhanced_keywords, f, indent=2, ensure_ascii=False)
-        
-        print(f"\n✅ Enhanced symptoms saved to {output_path}")
-        print(f"   - {len(enhanced_keywords['symptoms'])} unique symptoms extracted")
-        print(f"   - {len(enhanced_keywords['high_risk_diseases'])} diseases found")
-        print("\n💡 You can now use this enhanced data in your symptom analyzer!")
-        return enhanced_keywords
-        
-    except FileNotFoundError:
-        print(f"❌ File not found: {csv_path}")
-        print("Please download the dataset first.")
-        print("\nManual download:")
-        print("1. Go to https://www.kaggle.com/datasets/itachi9604/disease-symptom-description-dataset")
-        print("2. Click 'Download'")
-        print("3. Extract CSV to 'data/' folder")
-    except Exception as e:
-        print(f"❌ Error processing dataset: {e}")
-        import traceback
-        traceback.print_exc()
+    columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    lowered = {str(col).strip().lower(): col for col in columns}
+    disease_col = next((lowered[name] for name in DISEASE_COLUMNS if name in lowered), None)
+    symptom_cols = [col for name, col in lowered.items() if "symptom" in name and name not in TEXT_COLUMNS]
+    text_col = None
+    if not symptom_cols:
+        text_col = next((lowered[name] for name in TEXT_COLUMNS if name in lowered), None)
+    return disease_col, symptom_cols, text_col
 
-if __name__ == "__main__":
-    print("🔽 Kaggle Dataset Downloader for AI Clinic Buddy\n")
-    
-    # Dataset options
-    datasets = {
-        "1": {
-            "name": "itachi9604/disease-symptom-description-dataset",
-            "description": "Disease Symptom Dataset (Recommended for symptom analysis)"
-        },
-        "2": {
-            "name": "niyar56/symptom2disease-dataset",
-            "description": "Symptom2Disease Dataset (Alternative for symptom analysis)"
-        }
-    }
-    
-    print("Available datasets:")
-    for key, value in datasets.items():
-        print(f"{key}. {value['description']}")
-        print(f"   Kaggle: {value['name']}\n")
-    
-    choice = input("Enter dataset number to download (or 'skip' to process existing data): ")
-    
-    if choice in datasets:
-        dataset_name = datasets[choice]["name"]
-        download_kaggle_dataset(dataset_name)
-        print("\nProcessing dataset...")
-        # Create data directory if it doesn't exist
-        data_dir = "data"
-        os.makedirs(data_dir, exist_ok=True)
-        
-        # Try to find the CSV file
-        if os.path.exists(data_dir):
-            csv_files = [f for f in os.listdir(data_dir) if f.endswith('.csv')]
-            if csv_files:
-                process_disease_symptom_dataset(os.path.join(data_dir, csv_files[0]))
-            else:
-                print("⚠️ CSV file not found in data/ directory.")
-                print("\n💡 Manual download option:")
-                print("1. Go to https://www.kaggle.com/datasets/" + dataset_name)
-                print("2. Click 'Download' (you need to be logged in)")
-                print("3. Extract the CSV file to the 'data/' folder")
-                print("4. Run this script again and choose 'skip' to process the file")
-        else:
-            print(f"⚠️ Could not create {data_dir} directory.")
-    elif choice.lower() == 'skip':
-        # Process existing data
-        print("\n📂 Looking for CSV files in 'data/' directory...")
-        data_dir = "data"
-        os.makedirs(data_dir, exist_ok=True)
-        
-        if os.path.exists(data_dir):
-            csv_files = [f for f in os.listdir(data_dir) if f.endswith('.csv')]
-            if csv_files:
-                print(f"Found {len(csv_files)} CSV file(s):")
-                for i, csv_file in enumerate(csv_files, 1):
-                    print(f"  {i}. {csv_file}")
-                
-                if len(csv_files) == 1:
-                    csv_path = os.path.join(data_dir, csv_files[0])
-                    print(f"\nProcessing: {csv_path}")
-                    process_disease_symptom_dataset(csv_path)
-                else:
-                    file_choice = input(f"\nEnter file number (1-{len(csv_files)}): ")
-                    try:
-                        csv_path = os.path.join(data_dir, csv_files[int(file_choice) - 1])
-                        process_disease_symptom_dataset(csv_path)
-                    except (ValueError, IndexError):
-                        print("❌ Invalid file number")
-            else:
-                csv_path = input("Enter full path to CSV file: ")
-                if os.path.exists(csv_path):
-                    process_disease_symptom_dataset(csv_path)
-                else:
-                    print(f"❌ File not found: {csv_path}")
+
+def ingest_file(csv_path, chunk_rows=CHUNK_ROWS):
+    """
+    Count symptom and disease frequencies in one CSV, one chunk at a time.
+
+    Wide files are counted per cell (each distinct cell value is normalized
+    once per chunk). Free-text notes are mapped to dataset symptom IDs with
+    the symptom normalizer, which needs the compiled symptom index.
+
+    Args:
+        csv_path: Path to the CSV file
+        chunk_rows: Rows parsed per chunk
+
+    Returns:
+        dict: path, format, rows and the symptom/disease frequency tables
+    """
+    from utils.symptom_index import normalize_symptom
+
+    disease_col, symptom_cols, text_col = detect_columns(csv_path)
+    if not symptom_cols and text_col is None:
+        raise ValueError(f"{csv_path}: no symptom or text column found")
+    usecols = [col for col in [disease_col, text_col, *symptom_cols] if col is not None]
+
+    normalizer = None
+    if text_col is not None:
+        from utils.symptom_normalizer import get_normalizer
+        normalizer = get_normalizer()
+
+    symptoms, diseases, rows = Counter(), Counter(), 0
+    reader = pd.read_csv(csv_path, usecols=usecols, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+    for chunk in reader:
+        rows += len(chunk)
+        if symptom_cols:
+            for value, count in chunk[symptom_cols].stack().value_counts().items():
+                symptom = normalize_symptom(value)
+                if symptom:
+                    symptoms[symptom] += count
         else:
-            csv_path = input("Enter full path to CSV file: ")
-            if os.path.exists(csv_path):
-                process_disease_symptom_dataset(csv_path)
-            else:
-                print(f"❌ File not found: {csv_path}")
+            for note in chunk[text_col]:
+                symptoms.update(normalizer.normalize(note))
+        if disease_col is not None:
+            for value, count in chunk[disease_col].str.strip().value_counts().items():
+                if value:
+                    diseases[value] += count
+
+    return {
+        "path": csv_path,
+        "format": "wide" if symptom_cols else "text",
+        "rows": rows,
+        "symptoms": dict(symptoms),
+        "diseases": dict(diseases),
+    }
+
+
+def _most_common(counts, limit=None):
+    """Keys by descending count, ties broken by name so the output is reproducible."""
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return [key for key, _ in ranked[:limit]]
+
+
+def write_vocabulary(results, output_path=DEFAULT_OUTPUT_PATH):
+    """
+    Merge per-file counts and atomically write the enhanced symptoms JSON.
+
+    Args:
+        results: ingest_file() results
+        output_path: Where to write the vocabulary
+
+    Returns:
+        dict: The written vocabulary
+    """
+    from utils.symptom_index import source_hash, symptom_label
+
+    symptoms, diseases = Counter(), Counter()
+    for result in results:
+        symptoms.update(result["symptoms"])
+        diseases.update(result["diseases"])
+    paths = [result["path"] for result in results]
+
+    vocabulary = {
+        "format_version": VOCABULARY_FORMAT_VERSION,
+        "version": source_hash(paths).hex(),
+        "source_file": paths[0] if len(paths) == 1 else paths,
+        "sources": [{key: result[key] for key in ("path", "format", "rows")} for result in results],
+        "total_rows": sum(result["rows"] for result in results),
+        "high_risk_diseases": _most_common(diseases, DISEASE_LIMIT),
+        "symptoms": [symptom_label(symptom) for symptom in _most_common(symptoms, SYMPTOM_LIMIT)],
+        "symptom_counts": {symptom_label(symptom): symptoms[symptom] for symptom in _most_common(symptoms)},
+        "disease_counts": {disease: diseases[disease] for disease in _most_common(diseases)},
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(vocabulary, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, output_path)
+    return vocabulary
+
+
+def ingest(csv_paths, output_path=DEFAULT_OUTPUT_PATH, workers=None, chunk_rows=CHUNK_ROWS, build=True):
+    """
+    Ingest dataset CSVs into the vocabulary JSON and the compiled symptom index.
+
+    Args:
+        csv_paths: Input CSV files
+        output_path: Where to write the vocabulary
+        workers: Files ingested in parallel (defaults to one per file, up to the CPU count)
+        chunk_rows: Rows parsed per chunk
+        build: Compile the symptom index from the first wide file
+
+    Returns:
+        dict: The written vocabulary
+    """
+    from utils.symptom_index import DEFAULT_INDEX_PATH, DEFAULT_SEVERITY_PATH, build_index
+
+    # Built first: free-text files are normalized against the index vocabulary
+    wide = [path for path in csv_paths if detect_columns(path)[1]]
+    if build and wide:
+        build_index(wide[0], DEFAULT_SEVERITY_PATH, DEFAULT_INDEX_PATH)
+        print(f"✅ Symptom index compiled to {DEFAULT_INDEX_PATH} from {wide[0]}")
+
+    workers = min(workers or os.cpu_count() or 1, len(csv_paths))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(ingest_file, csv_paths, [chunk_rows] * len(csv_paths)))
     else:
-        print("❌ Invalid choice")
+        results = [ingest_file(path, chunk_rows) for path in csv_paths]
+    return write_vocabulary(results, output_path)
+
+
+def default_inputs(data_dir=DATA_DIR):
+    """Known dataset CSVs already present in the data directory."""
+    paths = [os.path.join(data_dir, name) for dataset in DATASETS.values() for name in dataset["files"]]
+    return [path for path in paths if os.path.exists(path)]
 
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", help="CSV files to ingest (default: known datasets in data/)")
+    parser.add_argument("--download", choices=sorted(DATASETS), action="append", default=[],
+                        help="Download a Kaggle dataset first (repeatable)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument("--workers", type=int, help="Files ingested in parallel")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows parsed per chunk")
+    parser.add_argument("--no-index", action="store_true", help="Skip compiling the symptom index")
+    parser.add_argument("--force", action="store_true", help="Re-ingest the known datasets even if unchanged")
+    args = parser.parse_args()
+
+    for key in args.download:
+        download_kaggle_dataset(DATASETS[key]["name"], DATA_DIR)
+
+    if not args.inputs and args.output == DEFAULT_OUTPUT_PATH and not args.no_index and default_inputs():
+        # Known datasets go through the artifact build, which skips unchanged sources
+        from build_artifacts import run
+        from utils.artifacts import FAILED, SKIPPED
+        results = run(["vocabulary"], force=args.force)
+        sys.exit(1 if any(outcome in (FAILED, SKIPPED) for outcome in results.values()) else 0)
+
+    inputs = args.inputs or default_inputs()
+    missing = [path for path in inputs if not os.path.exists(path)]
+    if missing or not inputs:
+        print(f"❌ File not found: {', '.join(missing)}" if missing else "❌ No dataset CSVs found in data/")
+        print("\nManual download:")
+        for dataset in DATASETS.values():
+            print(f"- https://www.kaggle.com/datasets/{dataset['name']} -> {DATA_DIR}/{', '.join(dataset['files'])}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    vocabulary = ingest(inputs, args.output, args.workers, args.chunk_rows, build=not args.no_index)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n✅ Enhanced symptoms saved to {args.output} in {elapsed:.2f}s")
+    for source in vocabulary["sources"]:
+        print(f"   - {source['path']}: {source['rows']:,} rows ({source['format']})")
+    print(f"   - {len(vocabulary['symptom_counts'])} unique symptoms, {len(vocabulary['disease_counts'])} diseases")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Export the traced MobileNetV2 serving function as a SavedModel
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from model.mobilenet_model import InferenceEngine, get_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("export_dir", nargs="?", default="model/saved_model")
+    args = parser.parse_args()
+
+    print(f"📦 Exporting SavedModel to {args.export_dir}...")
+    InferenceEngine(get_model()).export_saved_model(args.export_dir)
+    print("✅ Export complete. Serve it with get_engine(saved_model_dir=...)")
+
+
+if __name__ == "__main__":
+    main()
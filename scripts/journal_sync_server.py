@@ -0,0 +1,151 @@
+"""
+Stand-in sync server for offline triage journals (utils/triage_journal.py)
+
+    python scripts/journal_sync_server.py --port 8090 --data-dir data/sync_server
+
+Keeps each device's records as the segments it received, trimmed to the
+records after what was already acknowledged, and answers:
+
+    GET  /journal/<device>            {"acked": seq}
+    POST /journal/<device>/segments   deflate-compressed segment -> {"acked": seq}
+
+A segment that starts after the next expected sequence number is refused
+with 409, since records in between would be missing.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import zlib
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.triage_journal import parse_segment, segment_header
+
+DEVICE_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+# Largest segment accepted once decompressed
+MAX_SEGMENT_BYTES = 64 * 1024 * 1024
+
+
+class JournalStore:
+    """Received segments per device on disk, with the acknowledged sequence number in memory."""
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._acked = {}
+        os.makedirs(root, exist_ok=True)
+        for device in os.listdir(root):
+            for name in os.listdir(os.path.join(root, device)):
+                with open(os.path.join(root, device, name), "rb") as f:
+                    first_seq, _, frames = parse_segment(f.read())
+                self._acked[device] = max(self._acked.get(device, 0), first_seq + len(frames) - 1)
+
+    def acked(self, device):
+        with self._lock:
+            return self._acked.get(device, 0)
+
+    def receive(self, device, segment):
+        """
+        Store the records of a segment after what the device already sent.
+
+        Returns:
+            tuple: (acknowledged sequence number, whether the segment was accepted)
+        """
+        first_seq, vocabulary, frames = parse_segment(segment)
+        with self._lock:
+            acked = self._acked.get(device, 0)
+            if first_seq > acked + 1:
+                return acked, False
+            new = frames[acked + 1 - first_seq:]
+            if new:
+                folder = os.path.join(self.root, device)
+                os.makedirs(folder, exist_ok=True)
+                with open(os.path.join(folder, f"{acked + 1:016d}.seg"), "wb") as f:
+                    f.write(segment_header(acked + 1, vocabulary))
+                    f.write(b"".join(new))
+                acked = self._acked[device] = acked + len(new)
+            return acked, True
+
+
+def make_handler(store):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, body):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _device(self, suffix=""):
+            parts = self.path.strip("/").split("/")
+            if len(parts) == 2 + bool(suffix) and parts[0] == "journal" and DEVICE_RE.match(parts[1]) \
+                    and (not suffix or parts[2] == suffix):
+                return parts[1]
+            return None
+
+        def do_GET(self):
+            device = self._device()
+            if device is None:
+                return self._reply(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+            self._reply(HTTPStatus.OK, {"acked": store.acked(device)})
+
+        def do_POST(self):
+            device = self._device("segments")
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            if device is None:
+                return self._reply(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+            try:
+                if self.headers.get("Content-Encoding") == "deflate":
+                    inflater = zlib.decompressobj()
+                    body = inflater.decompress(body, MAX_SEGMENT_BYTES)
+                    if inflater.unconsumed_tail:
+                        return self._reply(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Segment too large"})
+                acked, accepted = store.receive(device, body)
+            except (ValueError, zlib.error) as e:
+                return self._reply(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            self._reply(HTTPStatus.OK if accepted else HTTPStatus.CONFLICT, {"acked": acked})
+
+    return Handler
+
+
+def start_server(root, host="127.0.0.1", port=0):
+    """
+    Serve a store from a background thread.
+
+    Returns:
+        tuple: (server, base URL); call server.shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(JournalStore(root)))
+    threading.Thread(target=server.serve_forever, name="journal-sync-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--data-dir", default=os.path.join("data", "sync_server"))
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(JournalStore(args.data_dir)))
+    print(f"📡 Journal sync server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
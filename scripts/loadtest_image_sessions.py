@@ -0,0 +1,146 @@
+"""
+Load test: memory per session when many sessions upload 12MP photos
+
+Simulates concurrent app sessions at the level of app.py, one thread each.
+Every session uploads several photos one after another, shows each and
+analyzes it (decode and preprocessing, which is what predict_image does
+before the forward pass), then stays open holding what the app keeps:
+
+    upload   the upload bytes (held by the file uploader) plus the copy
+             handed to st.image, decoded again for analysis
+    store    an ImageRef; st.image gets the thumbnail, analysis the 224x224
+             input from the image store (model/image_store.py)
+
+Streamlit's own per-upload overhead is left out, so the "upload" figures are
+a lower bound. Each mode runs in a fresh process; resident memory growth
+(after trimming the allocator) and the Python objects still alive are
+divided by the number of sessions.
+"""
+import argparse
+import ctypes
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+MODES = ("upload", "store")
+
+
+def write_photos(directory, count, size=(4000, 3000), seed=0):
+    """Distinct camera-like 12MP JPEGs."""
+    import numpy as np
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    paths = []
+    for i in range(count):
+        tint = rng.uniform(100, 220, 3).astype(np.float32)
+        pixels = tint * (0.7 + 0.3 * (x / width))[..., None] + rng.normal(0, 6, (height, width, 3))
+        path = os.path.join(directory, f"photo_{i}.jpg")
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path, "JPEG", quality=92)
+        paths.append(path)
+    return paths
+
+
+def memory_mb():
+    """(resident, peak resident) of this process in MB."""
+    # Freed upload buffers stay in the malloc arenas until trimmed, which is not memory in use
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                values[line.split(":")[0]] = int(line.split()[1]) / 1e3
+    return values["VmRSS"], values["VmHWM"]
+
+
+def worker(mode, photos, sessions, per_session, store_dir):
+    """Run the sessions in this process and print per-session memory."""
+    from model.preprocessing import preprocess_image
+    from model.image_store import ImageStore
+    store = ImageStore(store_dir)
+    preprocess_image(photos[0])  # imports and first-call allocations are not per session
+    baseline, _ = memory_mb()
+    tracemalloc.start()
+    held = [None] * sessions
+    barrier = threading.Barrier(sessions)
+
+    def session(number):
+        barrier.wait()
+        for i in range(per_session):
+            with open(photos[(number + i) % len(photos)], "rb") as f:
+                upload = f.read()  # what the uploader receives
+            if mode == "upload":
+                shown = bytes(upload)  # st.image keeps its own copy to serve
+                preprocess_image(io.BytesIO(upload))
+                held[number] = (upload, shown)
+            else:
+                ref = store.put(io.BytesIO(upload))
+                del upload  # the uploader is reset once the photo is stored
+                with open(ref.thumbnail, "rb") as f:
+                    shown = f.read()
+                preprocess_image(ref.model_input)
+                held[number] = (ref, shown)
+
+    threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    live = tracemalloc.get_traced_memory()[0] / 1e6
+    resident, peak = memory_mb()
+    print(live / sessions, (resident - baseline) / sessions, (peak - baseline) / sessions, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--photos-per-session", type=int, default=3)
+    parser.add_argument("--distinct-photos", type=int, default=6,
+                        help="Photos shared by all sessions; fewer means more duplicates")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--photo-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--store-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        photos = sorted(os.path.join(args.photo_dir, name) for name in os.listdir(args.photo_dir))
+        worker(args.worker, photos, args.sessions[0], args.photos_per_session, args.store_dir)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        photo_dir = os.path.join(tmp, "photos")
+        os.makedirs(photo_dir)
+        photos = write_photos(photo_dir, args.distinct_photos)
+        average = sum(os.path.getsize(p) for p in photos) / len(photos) / 1e6
+        print(f"📷 {len(photos)} distinct 12MP photos, {average:.1f} MB each, "
+              f"{args.photos_per_session} uploads per session\n")
+        print(f"{'sessions':>9} {'mode':>7} {'live MB/session':>16} {'RSS MB/session':>15} "
+              f"{'peak MB/session':>16} {'seconds':>8}")
+        for sessions in args.sessions:
+            for mode in MODES:
+                store_dir = os.path.join(tmp, f"store_{sessions}")
+                output = subprocess.run(
+                    [sys.executable, __file__, "--worker", mode, "--photo-dir", photo_dir, "--store-dir", store_dir,
+                     "--sessions", str(sessions), "--photos-per-session", str(args.photos_per_session)],
+                    cwd=ROOT, check=True, capture_output=True, text=True,
+                ).stdout.split()
+                live, resident, peak, seconds = (float(value) for value in output[-4:])
+                print(f"{sessions:>9} {mode:>7} {live:>16.3f} {resident:>15.2f} {peak:>16.2f} {seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Load test for triage_server.py: requests/sec and tail latency per endpoint
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import triage_server
+
+SAMPLE_NOTES = [
+    "Persistent headache and fatigue with body aches",
+    "Fever with cough and shortness of breath",
+    "Mild headache and runny nose",
+    "itching, skin rash and nodal skin eruptions",
+]
+
+
+async def read_response(reader):
+    """Read one response (Content-Length or chunked) and return its status code."""
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status
+
+
+def build_request(path, body, content_type):
+    return (f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body
+
+
+async def client(host, port, requests, latencies, statuses):
+    """One keep-alive connection sending its share of the requests back to back."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for request in requests:
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            statuses[await read_response(reader)] += 1
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def run(args):
+    server_task = None
+    if not args.url_host:
+        host, port = "127.0.0.1", args.port
+        server_task = asyncio.ensure_future(triage_server.serve(
+            host, port, workers=args.workers, max_pending=args.max_pending, preload=args.image is not None,
+        ))
+        await asyncio.sleep(0.2)
+    else:
+        host, port = args.url_host, args.port
+
+    if args.image:
+        with open(args.image, "rb") as f:
+            body = f.read()
+        make = lambda i: build_request("/triage/image", body, "image/jpeg")
+    elif args.batch > 1:
+        make = lambda i: build_request("/triage/symptoms", json.dumps(
+            {"notes": [SAMPLE_NOTES[(i + j) % len(SAMPLE_NOTES)] for j in range(args.batch)]}
+        ).encode("utf-8"), "application/json")
+    else:
+        make = lambda i: build_request("/triage/symptoms", json.dumps(
+            {"symptoms": SAMPLE_NOTES[i % len(SAMPLE_NOTES)]}).encode("utf-8"), "application/json")
+
+    requests = [make(i) for i in range(args.requests)]
+    latencies, statuses = [], Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, requests[c::args.concurrency], latencies, statuses)
+        for c in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"📈 {len(latencies):,} requests, {args.concurrency} connections, {elapsed:.2f}s")
+    print(f"   {len(latencies) / elapsed:,.0f} req/s")
+    print(f"   p50 {pick(0.50):.2f} ms, p95 {pick(0.95):.2f} ms, "
+          f"p99 {pick(0.99):.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    print(f"   status codes: {dict(sorted(statuses.items()))}")
+
+    if server_task:
+        server_task.cancel()
+        try:
+            await server_task
+        except asyncio.CancelledError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=1, help="Symptom notes per request (streamed)")
+    parser.add_argument("--image", help="Load test /triage/image with this file instead of symptoms")
+    parser.add_argument("--host", dest="url_host", help="Target a running server instead of an in-process one")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-pending", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Soak test: memory and latency of analyze_symptoms_enhanced over many calls
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils import enhanced_symptom_analyzer
+from utils.enhanced_symptom_analyzer import analyze_symptoms_enhanced, get_vocabulary
+
+SAMPLE_NOTES = [
+    "Persistent headache and fatigue with body aches",
+    "Fever with cough and shortness of breath",
+    "Mild headache and runny nose",
+    "itching, skin rash and nodal skin eruptions",
+]
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (Linux /proc, else peak RSS)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--windows", type=int, default=10)
+    args = parser.parse_args()
+
+    # Point the analyzer at a throwaway dataset file so the test is self-contained
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs("data")
+    with open(os.path.join("data", "enhanced_symptoms.json"), "w", encoding="utf-8") as f:
+        json.dump({"symptoms": [f"synthetic symptom {i}" for i in range(100)]}, f)
+    enhanced_symptom_analyzer._stores.clear()
+
+    print(f"🧪 Soak test: {args.calls:,} calls in {args.windows} windows\n")
+    print(f"{'window':>7} {'calls':>10} {'µs/call':>9} {'RSS MB':>8} {'medium kw':>10}")
+
+    per_window = args.calls // args.windows
+    call = 0
+    for window in range(1, args.windows + 1):
+        start = time.perf_counter()
+        for _ in range(per_window):
+            analyze_symptoms_enhanced(SAMPLE_NOTES[call % len(SAMPLE_NOTES)], use_dataset=True)
+            call += 1
+        elapsed = time.perf_counter() - start
+        vocabulary_size = len(get_vocabulary().medium_risk)
+        print(f"{window:>7} {call:>10,} {elapsed / per_window * 1e6:>9.2f} "
+              f"{current_rss_mb():>8.1f} {vocabulary_size:>10}")
+
+    print("\n💡 Latency, RSS and vocabulary size should stay constant across windows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Train and evaluate the image risk head on locally labelled photos
+
+Photos are read from <root>/<risk tier>/ (high, medium, low). Each photo is
+embedded once per backbone and cached by content hash in data/embeddings/,
+so later runs (new head type, different k, more folds) only embed photos
+that were added since. Both heads are cross-validated and the chosen one is
+fitted on every photo and saved for the app.
+
+    python scripts/train_image_head.py data/labelled_images --head logistic
+    IMAGE_BACKBONES=mobilenet_v2,efficientnet_b0 python scripts/train_image_head.py data/labelled_images
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from model.embeddings import backbone_names, embed_uploads, get_store
+from model.image_head import DEFAULT_HEAD_PATH, HEADS, KNNHead, LogisticHead, evaluate, risk_label, save_head
+from utils.symptom_index import DATA_DIR
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+DEFAULT_IMAGE_ROOT = os.path.join(DATA_DIR, "labelled_images")
+
+
+def labelled_images(root):
+    """(path, risk tier) for every image under root/<tier>/."""
+    images = []
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if not entry.is_dir():
+            continue
+        label = risk_label(entry.name)
+        for path in sorted(glob.glob(os.path.join(entry.path, "**", "*"), recursive=True)):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((path, label))
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", nargs="?", default=DEFAULT_IMAGE_ROOT, help="Directory of <risk tier>/ folders")
+    parser.add_argument("--head", choices=sorted(HEADS), default="logistic", help="Head to save")
+    parser.add_argument("--k", type=int, default=5, help="Neighbours for the knn head")
+    parser.add_argument("--l2", type=float, default=1e-3, help="Weight decay for the logistic head")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32, help="Images embedded per forward pass")
+    parser.add_argument("--output", default=DEFAULT_HEAD_PATH)
+    args = parser.parse_args()
+
+    images = labelled_images(args.root)
+    if not images:
+        sys.exit(f"❌ No images found under {args.root}/<high|medium|low>/")
+    backbones = backbone_names()
+    print(f"🖼️  {len(images)} labelled images, backbones: {', '.join(backbones)}")
+
+    store = get_store()
+    start = time.perf_counter()
+    features, labels = [], []
+    for offset in range(0, len(images), args.batch_size):
+        chunk = images[offset:offset + args.batch_size]
+        chunk_features, positions = embed_uploads([path for path, _ in chunk], backbones, store)
+        features.extend(chunk_features)
+        labels.extend(chunk[i][1] for i in positions)
+    skipped = len(images) - len(labels)
+    print(f"⏱️  Embedded in {time.perf_counter() - start:.1f}s "
+          f"({store.hits} cached, {store.misses} computed" + (f", {skipped} unreadable" if skipped else "") + ")")
+
+    import numpy as np
+    features = np.stack(features)
+    makers = {"logistic": lambda: LogisticHead(l2=args.l2), "knn": lambda: KNNHead(k=args.k)}
+    for kind, make_head in makers.items():
+        start = time.perf_counter()
+        result = evaluate(make_head, features, labels, folds=args.folds)
+        recall = ", ".join(f"{label} {value:.0%}" for label, value in result["recall"].items())
+        print(f"📊 {kind:>8}: accuracy {result['accuracy']:.1%}, macro recall {result['macro_recall']:.1%} "
+              f"({recall}; {result['folds']}-fold, {time.perf_counter() - start:.1f}s)")
+
+    head = makers[args.head]().fit(features, labels)
+    save_head(head, backbones, args.output)
+    print(f"✅ Saved {args.head} head to {args.output}; restart the app to use it")
+
+
+if __name__ == "__main__":
+    main()
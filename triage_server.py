@@ -0,0 +1,380 @@
+"""
+Headless asyncio HTTP service for symptom and image triage
+
+Runs alongside the Streamlit UI so SMS gateways and partner clinic systems
+can send triage requests directly:
+
+    python triage_server.py --port 8080
+
+Endpoints:
+    POST /triage/symptoms  {"symptoms": "..."} or {"notes": ["...", ...]}
+    POST /triage/image     raw image bytes, or {"images": ["<base64>", ...]}
+    GET  /healthz          image model status, queue depth and model server workers
+    GET  /readyz           200 once the image model is loaded and warmed up, else 503
+    GET  /metrics          stage latencies, errors and cache hit rates (Prometheus text)
+    GET  /metrics.json     the same metrics (plus profiler samples) as JSON
+
+Single requests get one JSON object. Batches are streamed back as
+newline-delimited JSON, one line per item as soon as it is scored.
+
+Image requests are only admitted once the image model is warm. Until then
+they get 503 with Retry-After (and start the load if it has not started),
+so no patient waits behind the model load; symptom triage is always served.
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from model import loader as image_model
+from utils import metrics
+from utils.helpers import analyze_symptoms
+
+# Largest accepted request body (a few phone photos, base64 encoded)
+MAX_BODY_BYTES = 32 * 1024 * 1024
+MAX_HEADER_LINES = 100
+# Seconds clients are asked to wait while the image model warms up
+WARMING_RETRY_AFTER = 5
+ROUTES = ("/healthz", "/readyz", "/metrics", "/metrics.json", "/triage/symptoms", "/triage/image")
+
+
+class HTTPError(Exception):
+    """An error answered with a JSON body and the given status."""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def symptom_payload(result):
+    risk, recommendation, educational_note = result
+    return {"risk": risk, "recommendation": recommendation, "educational_note": educational_note}
+
+
+def image_payload(result):
+    risk, recommendation, educational_note, confidence = result
+    return {"risk": risk, "recommendation": recommendation,
+            "educational_note": educational_note, "confidence": confidence}
+
+
+class TriageService:
+    """
+    Triage request handling with a bounded executor and backpressure.
+
+    Symptom scoring and image inference run on a fixed pool of worker
+    threads. At most ``max_pending`` jobs (one per note or image) may be
+    queued or running; beyond that new requests are rejected with 429
+    instead of piling up. Every job is bounded by ``timeout`` seconds and
+    answered with 504 when it takes longer.
+    """
+
+    def __init__(self, workers=2, max_pending=32, timeout=30.0):
+        """
+        Args:
+            workers: Threads running symptom scoring and image inference
+            max_pending: Queued plus running jobs before returning 429
+            timeout: Seconds before a job is answered with 504
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="triage")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _reserve(self, jobs):
+        if self.pending + jobs > self.max_pending:
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, "Triage queue is full, retry later")
+        self.pending += jobs
+
+    async def _run(self, func, *args):
+        """Run one reserved job on the executor, releasing its slot when it finishes."""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, func, *args)
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(HTTPStatus.GATEWAY_TIMEOUT, "Triage timed out")
+
+    def _release(self):
+        self.pending -= 1
+
+    async def symptoms(self, body):
+        """
+        Score one symptom note or a batch of notes.
+
+        Returns:
+            tuple: (single payload or None, async iterator of batch payloads or None)
+        """
+        request = parse_json(body)
+        # Scoring runs on the executor, so a long note or a cold normalizer never stalls the event loop,
+        # and shares the image jobs' queue limit and timeout
+        if isinstance(request.get("symptoms"), str):
+            self._reserve(1)
+            return symptom_payload(await self._run(analyze_symptoms, request["symptoms"])), None
+        notes = request.get("notes")
+        if not isinstance(notes, list) or not all(isinstance(note, str) for note in notes):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Expected {"symptoms": str} or {"notes": [str, ...]}')
+        self._reserve(len(notes))
+        jobs = [asyncio.ensure_future(self._run(analyze_symptoms, note)) for note in notes]
+
+        async def stream():
+            try:
+                for index, job in enumerate(jobs):
+                    try:
+                        yield {"index": index, **symptom_payload(await job)}
+                    except HTTPError as e:
+                        yield {"index": index, "error": e.message}
+            finally:
+                for job in jobs:
+                    job.cancel()
+        return None, stream()
+
+    async def image(self, body, content_type):
+        """
+        Score one raw image or a batch of base64 encoded images.
+
+        Returns:
+            tuple: (single payload or None, async iterator of batch payloads or None)
+        """
+        self._admit_image()
+        if not content_type.startswith("application/json"):
+            if not body:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Empty image body")
+            self._reserve(1)
+            return image_payload(await self._run(image_model.predict_image, io.BytesIO(body))), None
+
+        images = parse_json(body).get("images")
+        if not isinstance(images, list) or not images:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Expected {"images": [base64, ...]}')
+        try:
+            uploads = [io.BytesIO(base64.b64decode(image, validate=True)) for image in images]
+        except (binascii.Error, TypeError, ValueError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Images must be base64 encoded strings")
+        self._reserve(len(uploads))
+        jobs = [asyncio.ensure_future(self._run(image_model.predict_image, upload)) for upload in uploads]
+
+        async def stream():
+            try:
+                for index, job in enumerate(jobs):
+                    try:
+                        yield {"index": index, **image_payload(await job)}
+                    except HTTPError as e:
+                        yield {"index": index, "error": e.message}
+            finally:
+                for job in jobs:
+                    job.cancel()
+        return None, stream()
+
+    def _admit_image(self):
+        # A model that failed to load answers with the "unavailable" result instead
+        state, _ = image_model.status()
+        if state in (image_model.IDLE, image_model.LOADING):
+            image_model.start_loading()
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Image model is warming up, retry shortly",
+                            {"Retry-After": str(WARMING_RETRY_AFTER)})
+
+    def ready(self):
+        state, detail = image_model.status()
+        if state != image_model.READY:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, f"Image model not ready ({state})",
+                            {"Retry-After": str(WARMING_RETRY_AFTER)} if state != image_model.FAILED else None)
+        return {"status": "ready", "image_model_detail": detail}
+
+    def health(self):
+        state, detail = image_model.status()
+        health = {"status": "ok", "image_model": state, "image_model_detail": detail,
+                  "pending": self.pending, "max_pending": self.max_pending}
+        workers = image_model.server_health()
+        if workers is not None:
+            health["model_server"] = workers
+        return health
+
+
+def parse_json(body):
+    try:
+        request = json.loads(body or b"{}")
+    except (UnicodeDecodeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+    if not isinstance(request, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+    return request
+
+
+async def read_request(reader):
+    """Parse one HTTP/1.1 request into (method, path, headers, body)."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+
+async def write_json(writer, status, payload, headers=None):
+    body = json.dumps(payload).encode("utf-8")
+    extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n{extra}"
+        f"Connection: keep-alive\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+
+async def write_text(writer, status, text, content_type="text/plain; version=0.0.4; charset=utf-8"):
+    body = text.encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+        f"Connection: keep-alive\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+
+async def write_stream(writer, items):
+    """Stream payloads as chunked newline-delimited JSON, flushing after each line."""
+    writer.write(
+        b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+        b"Transfer-Encoding: chunked\r\nConnection: keep-alive\r\n\r\n"
+    )
+    async for item in items:
+        line = json.dumps(item).encode("utf-8") + b"\n"
+        writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+class TriageServer:
+    """Routes HTTP requests on keep-alive connections to a TriageService."""
+
+    def __init__(self, service):
+        self.service = service
+
+    async def dispatch(self, method, path, headers, body):
+        if path == "/healthz" and method == "GET":
+            return self.service.health(), None
+        if path == "/readyz" and method == "GET":
+            return self.service.ready(), None
+        if path == "/metrics" and method == "GET":
+            return metrics.prometheus_text(), None
+        if path == "/metrics.json" and method == "GET":
+            return metrics.snapshot(), None
+        if path == "/triage/symptoms" and method == "POST":
+            return await self.service.symptoms(body)
+        if path == "/triage/image" and method == "POST":
+            return await self.service.image(body, headers.get("content-type", ""))
+        if path in ROUTES:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed on {path}")
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    # Stage per known route, so unknown paths cannot grow the metrics without bound
+                    with metrics.timed(f"http {request[1] if request[1] in ROUTES else 'other'}"):
+                        payload, stream = await self.dispatch(*request)
+                except HTTPError as e:
+                    await write_json(writer, e.status, {"error": e.message}, e.headers)
+                    if e.status in (HTTPStatus.BAD_REQUEST, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                    HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE):
+                        break
+                    continue
+                if stream is not None:
+                    await write_stream(writer, stream)
+                elif isinstance(payload, str):
+                    await write_text(writer, HTTPStatus.OK, payload)
+                else:
+                    await write_json(writer, HTTPStatus.OK, payload)
+                if request[2].get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            print(f"⚠️ Triage request failed: {e}")
+            try:
+                await write_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal error"})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+
+async def serve(host="127.0.0.1", port=8080, workers=2, max_pending=32, timeout=30.0, preload=True):
+    """
+    Run the triage service until cancelled.
+
+    Args:
+        host: Interface to bind
+        port: TCP port
+        workers: Threads running image inference
+        max_pending: Inference jobs queued or running before returning 429
+        timeout: Seconds before an inference job is answered with 504
+        preload: Start loading the image model in the background right away
+    """
+    service = TriageService(workers=workers, max_pending=max_pending, timeout=timeout)
+    server = await asyncio.start_server(TriageServer(service).handle, host, port)
+    if preload:
+        image_model.start_loading()
+    metrics.start_profiler()
+    print(f"🩺 Triage service listening on http://{host}:{port}")
+    start = time.monotonic()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.shutdown()
+        print(f"👋 Triage service stopped after {time.monotonic() - start:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless triage HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2, help="Symptom scoring and image inference threads")
+    parser.add_argument("--max-pending", type=int, default=32, help="Queued triage jobs before 429")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds per triage job")
+    parser.add_argument("--no-preload", action="store_true", help="Load the image model on first use")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending,
+                          args.timeout, preload=not args.no_preload))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Incremental, hash-aware builds of derived data artifacts
+
+Each Artifact lists its input files, the artifacts it depends on, a builder
+version and the function that writes its outputs. After a build the
+manifest records the content hash of every input and output, together with
+its size and mtime so unchanged files are never hashed twice. An artifact is
+rebuilt only when its build key (builder version, input hashes and the
+output hashes of its dependencies) changes, or when one of its outputs is
+missing or was modified. Independent artifacts build in parallel.
+
+At startup the app calls check_freshness(), which only stats the files the
+manifest recorded and never reads them. Files newly added to an input
+directory are picked up by the next build, not by this check.
+
+Files are recorded relative to the repository root, so the build and the
+check agree whatever directory they run from.
+"""
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFEST_PATH = os.path.join(ROOT_DIR, "data", "artifacts.json")
+MANIFEST_FORMAT_VERSION = 1
+
+# Build outcomes
+FRESH = "fresh"
+BUILT = "built"
+STALE = "stale"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class Artifact(NamedTuple):
+    """A derived file set and how to build it."""
+    name: str
+    outputs: Tuple[str, ...]
+    inputs: Tuple[str, ...]
+    version: str
+    build: Callable[[], None]
+    deps: Tuple[str, ...] = ()
+
+
+def file_hash(path: str) -> str:
+    """Hex BLAKE2 digest of a file's contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_name(path: str, root: str = ROOT_DIR) -> str:
+    """How the manifest names a file: relative to `root`, or absolute when it cannot be."""
+    path = os.path.abspath(path)
+    try:
+        return os.path.relpath(path, root).replace(os.sep, "/")
+    except ValueError:  # another drive on Windows
+        return path
+
+
+def _same_stat(stat: os.stat_result, state: Optional[dict]) -> bool:
+    return bool(state) and state.get("size") == stat.st_size and state.get("mtime_ns") == stat.st_mtime_ns
+
+
+def file_state(path: str, previous: Optional[dict] = None) -> Optional[dict]:
+    """
+    Size, mtime and content hash of a file, reusing the previous hash if the stat is unchanged.
+
+    Returns:
+        dict: {"size", "mtime_ns", "hash"}, or None if the file does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if _same_stat(stat, previous):
+        return previous
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": file_hash(path)}
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    """Read the manifest, or return an empty one if it is missing or from another format."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get("format_version") != MANIFEST_FORMAT_VERSION:
+        manifest = {"format_version": MANIFEST_FORMAT_VERSION, "artifacts": {}}
+    return manifest
+
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH):
+    """Write the manifest atomically."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _input_states(artifact: Artifact, entry: Optional[dict], root: str) -> Dict[str, Optional[dict]]:
+    previous = (entry or {}).get("inputs", {})
+    names = {manifest_name(path, root): path for path in artifact.inputs}
+    return {name: file_state(path, previous.get(name)) for name, path in names.items()}
+
+
+def _build_key(artifact: Artifact, inputs: Dict[str, Optional[dict]], entries: Dict[str, dict]) -> str:
+    hashes = lambda states: {path: state and state["hash"] for path, state in sorted(states.items())}
+    material = {
+        "version": artifact.version,
+        "inputs": hashes(inputs),
+        "deps": {dep: hashes(entries.get(dep, {}).get("outputs", {})) for dep in artifact.deps},
+    }
+    return hashlib.blake2b(json.dumps(material, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _intact_outputs(artifact: Artifact, entry: dict, root: str) -> Optional[Dict[str, dict]]:
+    """Current output states if every output still has its recorded content, else None."""
+    recorded = entry.get("outputs", {})
+    outputs = {}
+    for path in artifact.outputs:
+        name = manifest_name(path, root)
+        state = recorded.get(name)
+        current = file_state(path, state)
+        if current is None or state is None or current["hash"] != state["hash"]:
+            return None
+        outputs[name] = current
+    return outputs
+
+
+def _closure(graph: Dict[str, Artifact], targets: Sequence[str]) -> List[str]:
+    """Targets and everything they depend on, in graph order."""
+    needed = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in graph:
+            raise KeyError(f"Unknown artifact: {name}")
+        if name not in needed:
+            needed.add(name)
+            stack.extend(graph[name].deps)
+    return [name for name in graph if name in needed]
+
+
+def build_artifacts(artifacts: Sequence[Artifact], targets: Optional[Sequence[str]] = None,
+                    force: bool = False, dry_run: bool = False, workers: Optional[int] = None,
+                    manifest_path: str = MANIFEST_PATH, root: str = ROOT_DIR,
+                    on_result: Optional[Callable[[str, str, str], None]] = None) -> Dict[str, str]:
+    """
+    Bring artifacts up to date, rebuilding only the stale ones.
+
+    Args:
+        artifacts: The build graph, dependencies listed before dependents
+        targets: Artifact names to bring up to date with their dependencies (default: all)
+        force: Rebuild even if fresh
+        dry_run: Only report which artifacts are stale
+        workers: Builder processes (default: CPU count)
+        manifest_path: Manifest location
+        root: Directory the manifest names files relative to
+        on_result: Called with (name, outcome, detail) as each artifact finishes
+
+    Returns:
+        dict: Artifact name to FRESH, BUILT, STALE, FAILED or SKIPPED
+    """
+    graph = {artifact.name: artifact for artifact in artifacts}
+    pending = _closure(graph, targets or list(graph))
+    manifest = load_manifest(manifest_path)
+    entries = manifest["artifacts"]
+    results: Dict[str, str] = {}
+    report = on_result or (lambda name, outcome, detail: None)
+
+    def finish(name, outcome, detail=""):
+        results[name] = outcome
+        report(name, outcome, detail)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        running = {}
+        while pending or running:
+            for name in [name for name in pending if all(dep in results for dep in graph[name].deps)]:
+                pending.remove(name)
+                artifact = graph[name]
+                if any(results[dep] in (FAILED, SKIPPED) for dep in artifact.deps):
+                    finish(name, SKIPPED, "a dependency failed")
+                    continue
+                if any(results[dep] == STALE for dep in artifact.deps):
+                    finish(name, STALE, "a dependency is stale")
+                    continue
+                entry = entries.get(name)
+                inputs = _input_states(artifact, entry, root)
+                key = _build_key(artifact, inputs, entries)
+                outputs = None if force or not entry or entry.get("key") != key else _intact_outputs(artifact, entry, root)
+                if outputs is not None:
+                    # Touched but unchanged files: record the new stats so check_freshness() agrees
+                    if inputs != entry["inputs"] or outputs != entry["outputs"]:
+                        entry.update(inputs=inputs, outputs=outputs)
+                        save_manifest(manifest, manifest_path)
+                    finish(name, FRESH)
+                elif dry_run:
+                    finish(name, STALE)
+                else:
+                    running[pool.submit(artifact.build)] = (name, key, inputs, time.monotonic())
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, key, inputs, started = running.pop(future)
+                artifact = graph[name]
+                error = future.exception()
+                if error is not None:
+                    finish(name, FAILED, f"{type(error).__name__}: {error}")
+                    continue
+                outputs = {manifest_name(path, root): file_state(path) for path in artifact.outputs}
+                missing = [name for name, state in outputs.items() if state is None]
+                if missing:
+                    finish(name, FAILED, f"builder did not write {', '.join(missing)}")
+                    continue
+                entries[name] = {"key": key, "version": artifact.version, "deps": list(artifact.deps),
+                                 "inputs": inputs, "outputs": outputs, "built_at": time.time()}
+                # Saved after every artifact so an interrupted build keeps its progress
+                save_manifest(manifest, manifest_path)
+                finish(name, BUILT, f"{time.monotonic() - started:.1f}s")
+    return results
+
+
+def check_freshness(manifest_path: str = MANIFEST_PATH, root: str = ROOT_DIR) -> Optional[Dict[str, str]]:
+    """
+    Stat-only freshness check of the artifacts in the manifest.
+
+    Args:
+        manifest_path: Manifest location
+        root: Directory the manifest names files relative to
+
+    Returns:
+        dict: Stale artifact name to reason (empty if all are fresh), or None
+        if there is no manifest yet
+    """
+    if not os.path.exists(manifest_path):
+        return None
+    stale = {}
+    for name, entry in load_manifest(manifest_path)["artifacts"].items():
+        for kind, files in (("input", entry.get("inputs", {})), ("output", entry.get("outputs", {}))):
+            for path, state in files.items():
+                try:
+                    stat = os.stat(os.path.join(root, path))
+                except OSError:
+                    if state is not None:
+                        stale[name] = f"{kind} {path} is missing"
+                    continue
+                if not _same_stat(stat, state):
+                    stale[name] = f"{kind} {path} changed"
+            if name in stale:
+                break
+    return stale
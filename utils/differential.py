@@ -0,0 +1,199 @@
+"""
+Severity-weighted differential scoring of symptom notes against dataset diseases
+"""
+import csv
+import difflib
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.symptom_index import DATA_DIR, SymptomIndex, get_symptom_index, symptom_label
+from utils.symptom_normalizer import SymptomNormalizer, get_normalizer
+
+DEFAULT_DESCRIPTION_PATH = os.path.join(DATA_DIR, "symptom_Description.csv")
+DEFAULT_PRECAUTION_PATH = os.path.join(DATA_DIR, "symptom_precaution.csv")
+
+
+class Differential(NamedTuple):
+    """One ranked candidate disease for a note."""
+    disease: str
+    score: float
+    matched_symptoms: Tuple[str, ...]
+    description: str
+    precautions: Tuple[str, ...]
+
+
+def _read_disease_table(path: str) -> Dict[str, List[str]]:
+    """Disease name -> remaining non-empty cells of its row."""
+    table = {}
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                if row and row[0].strip():
+                    table[row[0].strip()] = [cell.strip() for cell in row[1:] if cell.strip()]
+    return table
+
+
+def _lookup(table: Dict[str, List[str]], disease: str) -> List[str]:
+    """Row for a disease, tolerating the spelling drift between the Kaggle CSVs."""
+    if disease in table:
+        return table[disease]
+    lowered = {name.lower(): name for name in table}
+    match = difflib.get_close_matches(disease.lower(), list(lowered), n=1, cutoff=0.9)
+    return table[lowered[match[0]]] if match else []
+
+
+class DifferentialEngine:
+    """
+    Ranks every dataset disease for a note with one matrix product.
+
+    A note is normalized to dataset symptom IDs and becomes a symptom
+    vector x weighted by severity. With D the binary disease x symptom
+    matrix, the weighted overlap is D @ x, and each disease is scored by
+    weighted Jaccard similarity:
+
+        matched / (note_weight + disease_weight - matched)
+
+    so diseases explaining more of the note's severe symptoms, with fewer
+    unexplained ones of their own, rank first. Batches of notes are scored
+    as one (notes x symptoms) @ (symptoms x diseases) product.
+    """
+
+    def __init__(self, index: Optional[SymptomIndex] = None,
+                 description_path: str = DEFAULT_DESCRIPTION_PATH,
+                 precaution_path: str = DEFAULT_PRECAUTION_PATH,
+                 normalizer: Optional[SymptomNormalizer] = None):
+        """
+        Args:
+            index: Compiled symptom index (defaults to get_symptom_index())
+            description_path: CSV of Disease, Description
+            precaution_path: CSV of Disease, Precaution_1..4
+            normalizer: Phrase normalizer (defaults to one over the index vocabulary)
+        """
+        self.index = index if index is not None else get_symptom_index()
+        n_diseases, n_symptoms = self.index.n_diseases, self.index.n_symptoms
+
+        # Dense matrices are tiny (41 x 133); built straight from the mmapped CSR arrays
+        indptr = np.frombuffer(self.index.indptr, dtype=np.uint32)
+        indices = np.frombuffer(self.index.indices, dtype=np.uint32)
+        self.weights = np.frombuffer(self.index.weights, dtype=np.uint8).astype(np.float32)
+        self.matrix = np.zeros((n_symptoms, n_diseases), dtype=np.float32)
+        rows = np.repeat(np.arange(n_diseases), np.diff(indptr))
+        self.matrix[indices, rows] = 1.0
+        self.disease_weight = self.weights @ self.matrix
+
+        # Colloquial and misspelled phrases map onto the same symptom IDs
+        self.normalizer = normalizer if normalizer is not None else (
+            get_normalizer() if index is None else SymptomNormalizer(self.index.symptoms))
+
+        descriptions = _read_disease_table(description_path)
+        precautions = _read_disease_table(precaution_path)
+        self.descriptions = tuple(" ".join(_lookup(descriptions, d)) for d in self.index.diseases)
+        self.precautions = tuple(tuple(_lookup(precautions, d)) for d in self.index.diseases)
+
+    def symptom_ids(self, note: str) -> List[int]:
+        """IDs of the dataset symptoms mentioned in a note."""
+        return sorted({self.index.symptom_ids[symptom] for symptom in self.normalizer.normalize(note)})
+
+    def symptom_matrix(self, notes: Sequence[str]) -> np.ndarray:
+        """Binary (notes x symptoms) matrix of the symptoms each note mentions."""
+        vectors = np.zeros((len(notes), self.index.n_symptoms), dtype=np.float32)
+        for row, note in enumerate(notes):
+            vectors[row, self.symptom_ids(note)] = 1.0
+        return vectors
+
+    def score_matrix(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Weighted Jaccard score of every note against every disease.
+
+        Args:
+            vectors: Binary (notes x symptoms) matrix
+
+        Returns:
+            np.ndarray: (notes x diseases) scores in [0, 1]
+        """
+        weighted = vectors * self.weights
+        matched = weighted @ self.matrix
+        union = weighted.sum(axis=1, keepdims=True) + self.disease_weight - matched
+        return np.divide(matched, union, out=np.zeros_like(matched), where=union > 0)
+
+    def rank_batch(self, notes: Sequence[str], k: int = 5) -> List[List[Differential]]:
+        """
+        Ranked top-k differential for each of many notes in one pass.
+
+        Args:
+            notes: Symptom descriptions
+            k: Candidates per note
+
+        Returns:
+            list: Per note, Differential entries by descending score (diseases
+            with no matching symptom are left out)
+        """
+        if len(notes) == 0:
+            return []
+        vectors = self.symptom_matrix(notes)
+        scores = self.score_matrix(vectors)
+        k = min(k, self.index.n_diseases)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+
+        results = []
+        for row, diseases in enumerate(top):
+            note_symptoms = vectors[row]
+            ranked = []
+            for d in diseases:
+                score = float(scores[row, d])
+                if score <= 0:
+                    break
+                matched = np.flatnonzero(note_symptoms * self.matrix[:, d])
+                ranked.append(Differential(
+                    self.index.diseases[d], score,
+                    tuple(symptom_label(self.index.symptoms[s]) for s in matched),
+                    self.descriptions[d], self.precautions[d],
+                ))
+            results.append(ranked)
+        return results
+
+    def rank(self, note: str, k: int = 5) -> List[Differential]:
+        """Ranked top-k differential for one note."""
+        return self.rank_batch([note], k)[0]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_differential_engine() -> DifferentialEngine:
+    """Get the process-wide differential engine (built once from the symptom index)."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = DifferentialEngine()
+    return _engine
+
+
+def rank_differential(symptoms: str, k: int = 5) -> List[Differential]:
+    """
+    Rank dataset diseases for a symptom note.
+
+    Args:
+        symptoms: Text description of symptoms
+        k: Number of candidates to return
+
+    Returns:
+        list: Differential entries, most likely first
+    """
+    if not symptoms or not symptoms.strip():
+        return []
+    try:
+        engine = get_differential_engine()
+    except (OSError, ValueError):  # symptom index not built yet
+        return []
+    return engine.rank(symptoms, k)
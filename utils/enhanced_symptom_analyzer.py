@@ -1,13 +1,17 @@
 """
 Enhanced symptom analyzer using Kaggle disease-symptom datasets
 """
-import json
-import os
-from typing import Tuple
+from typing import Optional, Tuple
 
-# Enhanced keywords from disease-symptom datasets
+from utils import metrics
+from utils.result_cache import ResultCache, persistent_path, text_key
+from utils.symptom_normalizer import SymptomNormalizer, available_normalizer, count_tiers
+from utils.vocabulary import Vocabulary, VocabularyStore
+
+# Enhanced keywords from disease-symptom datasets (immutable; dataset
+# symptoms are merged into a separate snapshot by the VocabularyStore)
 ENHANCED_KEYWORDS = {
-    'high_risk': [
+    'high_risk': (
         # Original high-risk keywords
         "fever", "high temperature", "cough", "shortness of breath", "difficulty breathing",
         "chest pain", "bleeding", "severe pain", "unconscious", "seizure", "convulsion",
@@ -18,44 +22,64 @@ ENHANCED_KEYWORDS = {
         "persistent fever", "high fever", "breathing difficulty", "rapid breathing",
         "chest tightness", "severe cough", "bloody cough", "severe fatigue",
         "severe weakness", "confusion", "loss of consciousness", "severe dizziness",
-        "severe nausea", "severe vomiting", "severe diarrhea", "severe abdominal pain"
-    ],
-    'medium_risk': [
+        "severe nausea", "severe vomiting", "severe diarrhea", "severe abdominal pain",
+        # Matched "fever" under the original substring scan; whole-word matching needs them listed
+        "fevers", "feverish"
+    ),
+    'medium_risk': (
         # Original medium-risk keywords
         "headache", "fatigue", "persistent pain", "nausea", "vomiting", "diarrhea",
         "dizziness", "weakness", "sore throat", "runny nose", "congestion", "body aches",
         "muscle pain", "joint pain", "swelling", "redness", "itchy", "rash",
         "persistent cough", "mild fever", "chills", "loss of appetite", "sleep problems",
+        "stomach pain",
         # Enhanced from disease datasets
         "mild cough", "sneezing", "watery eyes", "mild headache", "mild fatigue",
         "slight fever", "mild body aches", "mild sore throat", "mild congestion",
         "itchy skin", "dry cough", "mild nausea", "mild dizziness", "mild weakness"
-    ]
+    )
 }
 
+# One vocabulary store per JSON path, loaded once and reloaded only on change
+_stores = {}
+
+# Results keyed by normalized symptom text and vocabulary version; the JSON
+# hash does not cover ENHANCED_KEYWORDS or the scoring, so they are versioned here
+_SCORING_VERSION = "enhanced-3"
+_result_cache = ResultCache(max_entries=4096, path=persistent_path("enhanced_symptom_results"),
+                            name="enhanced_symptom_results")
+
+def get_vocabulary(json_path="data/enhanced_symptoms.json", use_dataset=True) -> Vocabulary:
+    """
+    Get the current immutable vocabulary snapshot.
+    
+    Args:
+        json_path: Path to enhanced symptoms JSON file
+        use_dataset: Whether to merge in symptoms from the dataset file
+        
+    Returns:
+        Vocabulary: Frozen keyword tiers with their compiled matcher
+    """
+    store = _stores.get(json_path)
+    if store is None:
+        store = _stores.setdefault(json_path, VocabularyStore(ENHANCED_KEYWORDS, json_path))
+    return store.get() if use_dataset else store.base
+
 def load_enhanced_keywords(json_path="data/enhanced_symptoms.json"):
     """
     Load enhanced keywords from JSON file if available.
     
+    The file is parsed once and cached; later calls return the same frozen
+    keyword tuples until the file changes on disk.
+    
     Args:
         json_path: Path to enhanced symptoms JSON file
         
     Returns:
         dict: Enhanced keywords dictionary
     """
-    if os.path.exists(json_path):
-        try:
-            with open(json_path, 'r') as f:
-                enhanced_data = json.load(f)
-                # Merge with existing keywords
-                if 'symptoms' in enhanced_data:
-                    # Add new symptoms to medium risk (can be refined)
-                    ENHANCED_KEYWORDS['medium_risk'].extend(enhanced_data['symptoms'][:20])
-                return ENHANCED_KEYWORDS
-        except Exception as e:
-            print(f"⚠️ Could not load enhanced keywords: {e}")
-    
-    return ENHANCED_KEYWORDS
+    vocabulary = get_vocabulary(json_path)
+    return {'high_risk': vocabulary.high_risk, 'medium_risk': vocabulary.medium_risk}
 
 def analyze_symptoms_enhanced(symptoms: str, use_dataset: bool = True) -> Tuple[str, str, str]:
     """
@@ -71,17 +95,25 @@ def analyze_symptoms_enhanced(symptoms: str, use_dataset: bool = True) -> Tuple[
     if not symptoms or len(symptoms.strip()) == 0:
         return "Low", "Please describe your symptoms for analysis.", "Enter detailed symptoms for a better assessment."
     
-    # Load enhanced keywords if available
-    if use_dataset:
-        keywords = load_enhanced_keywords()
-    else:
-        keywords = ENHANCED_KEYWORDS
+    # Cached vocabulary, with dataset keywords if available
+    vocabulary = get_vocabulary(use_dataset=use_dataset)
     
+    # Plain keyword matching until the symptom index has been built
+    normalizer = available_normalizer()
+    version = f"{vocabulary.version}+{_SCORING_VERSION}" + ("+normalized" if normalizer is not None else "")
+    key = text_key(symptoms, version)
+    return _result_cache.get_or_compute(key, lambda: _score_symptoms(symptoms, vocabulary, normalizer))
+
+@metrics.timer("keyword_scoring", sample=32)
+def _score_symptoms(symptoms: str, vocabulary: Vocabulary,
+                    normalizer: Optional[SymptomNormalizer] = None) -> Tuple[str, str, str]:
+    """Score a non-empty symptom note against a vocabulary snapshot."""
     text = symptoms.lower()
     
-    # Count risk indicators
-    high_count = sum(1 for keyword in keywords['high_risk'] if keyword in text)
-    medium_count = sum(1 for keyword in keywords['medium_risk'] if keyword in text)
+    # Count risk indicators, including misspelled or colloquial symptom phrases
+    counts = count_tiers(vocabulary.matcher, text, normalizer)
+    high_count = counts['high_risk']
+    medium_count = counts['medium_risk']
     
     # Enhanced risk assessment
     if high_count >= 2:
@@ -1,4 +1,53 @@
 # utils/helpers.py
+from utils import metrics
+from utils.keyword_matcher import KeywordMatcher
+from utils.result_cache import ResultCache, persistent_path, text_key
+from utils.symptom_normalizer import available_normalizer, count_tiers
+
+# High-risk symptom keywords (enhanced with common medical terms)
+HIGH_RISK_KEYWORDS = [
+    # Critical symptoms
+    "fever", "high temperature", "cough", "shortness of breath", "difficulty breathing",
+    "chest pain", "bleeding", "severe pain", "unconscious", "seizure", "convulsion",
+    "cannot breathe", "choking", "severe headache", "stiff neck", "rash with fever",
+    "vomiting blood", "blood in stool", "severe dehydration", "severe allergic reaction",
+    "anaphylaxis", "heart attack", "stroke", "severe burn", "broken bone", "fracture",
+    # Enhanced from medical datasets
+    "persistent fever", "high fever", "breathing difficulty", "rapid breathing",
+    "chest tightness", "severe cough", "bloody cough", "severe fatigue",
+    "severe weakness", "confusion", "loss of consciousness", "severe dizziness",
+    "severe nausea", "severe vomiting", "severe diarrhea", "severe abdominal pain",
+    "rapid heart rate", "irregular heartbeat", "severe chest pain", "unable to speak",
+    # Matched "fever" under the original substring scan; whole-word matching needs them listed
+    "fevers", "feverish"
+]
+
+# Medium-risk symptom keywords (enhanced)
+MEDIUM_RISK_KEYWORDS = [
+    # Common symptoms
+    "headache", "fatigue", "persistent pain", "nausea", "vomiting", "diarrhea",
+    "dizziness", "weakness", "sore throat", "runny nose", "congestion", "body aches",
+    "muscle pain", "joint pain", "swelling", "redness", "itchy", "rash",
+    "persistent cough", "mild fever", "chills", "loss of appetite", "sleep problems",
+    "stomach pain",
+    # Enhanced from medical datasets
+    "mild cough", "sneezing", "watery eyes", "mild headache", "mild fatigue",
+    "slight fever", "mild body aches", "mild sore throat", "mild congestion",
+    "itchy skin", "dry cough", "mild nausea", "mild dizziness", "mild weakness",
+    "tiredness", "slight pain", "mild discomfort", "minor swelling"
+]
+
+# Compiled once at import; scoring is then a single pass per note
+_MATCHER = KeywordMatcher({
+    'high_risk': HIGH_RISK_KEYWORDS,
+    'medium_risk': MEDIUM_RISK_KEYWORDS,
+})
+
+# Results keyed by normalized symptom text; the keyword lists never change at runtime,
+# but notes score differently with and without the symptom index
+_VOCABULARY_VERSION = "builtin-3+normalized-3"
+_KEYWORD_ONLY_VERSION = "builtin-3"
+_result_cache = ResultCache(max_entries=4096, path=persistent_path("symptom_results"), name="symptom_results")
 
 def analyze_symptoms(symptoms):
     """
@@ -13,41 +62,20 @@ def analyze_symptoms(symptoms):
     if not symptoms or len(symptoms.strip()) == 0:
         return "Low", "Please describe your symptoms for analysis.", "Enter detailed symptoms for a better assessment."
     
+    # Plain keyword matching until the symptom index has been built
+    normalizer = available_normalizer()
+    key = text_key(symptoms, _VOCABULARY_VERSION if normalizer is not None else _KEYWORD_ONLY_VERSION)
+    return _result_cache.get_or_compute(key, lambda: _score_symptoms(symptoms, normalizer))
+
+@metrics.timer("keyword_scoring", sample=32)
+def _score_symptoms(symptoms, normalizer=None):
+    """Score a non-empty symptom note against the built-in keyword tiers."""
     text = symptoms.lower()
     
-    # High-risk symptom keywords (enhanced with common medical terms)
-    high_risk_keywords = [
-        # Critical symptoms
-        "fever", "high temperature", "cough", "shortness of breath", "difficulty breathing",
-        "chest pain", "bleeding", "severe pain", "unconscious", "seizure", "convulsion",
-        "cannot breathe", "choking", "severe headache", "stiff neck", "rash with fever",
-        "vomiting blood", "blood in stool", "severe dehydration", "severe allergic reaction",
-        "anaphylaxis", "heart attack", "stroke", "severe burn", "broken bone", "fracture",
-        # Enhanced from medical datasets
-        "persistent fever", "high fever", "breathing difficulty", "rapid breathing",
-        "chest tightness", "severe cough", "bloody cough", "severe fatigue",
-        "severe weakness", "confusion", "loss of consciousness", "severe dizziness",
-        "severe nausea", "severe vomiting", "severe diarrhea", "severe abdominal pain",
-        "rapid heart rate", "irregular heartbeat", "severe chest pain", "unable to speak"
-    ]
-    
-    # Medium-risk symptom keywords (enhanced)
-    medium_risk_keywords = [
-        # Common symptoms
-        "headache", "fatigue", "persistent pain", "nausea", "vomiting", "diarrhea",
-        "dizziness", "weakness", "sore throat", "runny nose", "congestion", "body aches",
-        "muscle pain", "joint pain", "swelling", "redness", "itchy", "rash",
-        "persistent cough", "mild fever", "chills", "loss of appetite", "sleep problems",
-        # Enhanced from medical datasets
-        "mild cough", "sneezing", "watery eyes", "mild headache", "mild fatigue",
-        "slight fever", "mild body aches", "mild sore throat", "mild congestion",
-        "itchy skin", "dry cough", "mild nausea", "mild dizziness", "mild weakness",
-        "tiredness", "slight pain", "mild discomfort", "minor swelling"
-    ]
-    
-    # Count risk indicators
-    high_count = sum(1 for keyword in high_risk_keywords if keyword in text)
-    medium_count = sum(1 for keyword in medium_risk_keywords if keyword in text)
+    # Count risk indicators, including misspelled or colloquial symptom phrases
+    counts = count_tiers(_MATCHER, text, normalizer)
+    high_count = counts['high_risk']
+    medium_count = counts['medium_risk']
     
     # Enhanced risk assessment with multiple symptom weighting
     if high_count >= 2:
@@ -0,0 +1,137 @@
+"""
+Compiled multi-pattern keyword matcher for symptom scoring
+"""
+import re
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+# Words are runs of letters/digits; underscores and punctuation separate them,
+# so dataset tokens like "skin_rash" match the free text "skin rash".
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+class KeywordMatch(NamedTuple):
+    """A single keyword hit inside a symptom note."""
+    keyword: str
+    tier: str
+    start: int
+    end: int
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """
+    Split text into lowercase word tokens with their character offsets.
+
+    Args:
+        text: Free text to tokenize
+
+    Returns:
+        list: (word, start, end) tuples
+    """
+    return [(m.group().lower(), m.start(), m.end()) for m in _WORD_RE.finditer(text)]
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over word tokens.
+
+    Every keyword of every tier is compiled once into a single automaton, so
+    scoring a note is one pass over its words regardless of how many keywords
+    are loaded. Matching works on whole words, so "fever" does not fire inside
+    "feverfew", and overlapping keywords ("high fever" and "fever") are all
+    reported, just like the original per-keyword substring scan.
+    """
+
+    def __init__(self, tiers: Dict[str, Iterable[str]]):
+        """
+        Compile the automaton.
+
+        Args:
+            tiers: Mapping of tier name (e.g. 'high_risk') to its keywords
+        """
+        self.tiers = tuple(tiers)
+        # Node 0 is the root; each node has goto edges keyed by word
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per node: (keyword, tier, length in words) for every keyword ending here
+        self._out: List[List[Tuple[str, str, int]]] = [[]]
+        self.size = 0
+
+        for tier, keywords in tiers.items():
+            for keyword in keywords:
+                words = [w for w, _, _ in tokenize(keyword)]
+                if not words:
+                    continue
+                node = 0
+                for word in words:
+                    nxt = self._goto[node].get(word)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[node][word] = nxt
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._out.append([])
+                    node = nxt
+                entry = (keyword, tier, len(words))
+                if entry not in self._out[node]:
+                    self._out[node].append(entry)
+                    self.size += 1
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        """Breadth-first construction of failure links and merged outputs."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(word, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> List[KeywordMatch]:
+        """
+        Find every keyword occurrence in a single pass over the text.
+
+        Args:
+            text: Symptom description
+
+        Returns:
+            list: KeywordMatch entries ordered by end position
+        """
+        matches = []
+        if not text:
+            return matches
+        goto, fail, out = self._goto, self._fail, self._out
+        tokens = tokenize(text)
+        node = 0
+        for i, (word, _, end) in enumerate(tokens):
+            while node and word not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(word, 0)
+            for keyword, tier, length in out[node]:
+                matches.append(KeywordMatch(keyword, tier, tokens[i - length + 1][1], end))
+        return matches
+
+    def count(self, text: str) -> Dict[str, int]:
+        """
+        Count distinct keywords matched per tier.
+
+        Args:
+            text: Symptom description
+
+        Returns:
+            dict: Tier name to number of distinct keywords found
+        """
+        seen = set()
+        counts = dict.fromkeys(self.tiers, 0)
+        for match in self.find(text):
+            key = (match.keyword, match.tier)
+            if key not in seen:
+                seen.add(key)
+                counts[match.tier] += 1
+        return counts
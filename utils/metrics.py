@@ -0,0 +1,344 @@
+"""
+Low-overhead stage timings, error counters and gauges
+
+Each pipeline stage (decode, preprocess, forward pass, label decoding,
+keyword scoring, rendering) records its wall time into a fixed-bucket
+histogram:
+
+    with metrics.timed("decode"):
+        ...
+
+An observation is two perf_counter() calls, a bisect over the bucket bounds
+and three increments: one to two microseconds. That is noise next to a
+decode or a forward pass; stages that take only tens of microseconds (keyword
+scoring) time one call in `sample` and weight it, keeping the overhead below
+1% while counts and sums stay unbiased. Counters are not locked; under heavy
+thread contention an observation may occasionally be lost, which is fine for
+monitoring. Set METRICS_ENABLED=0 to turn timing off.
+
+Exceptions raised inside a timed stage, or reported with count_error(), are
+counted by stage and exception type. Caches and the image model expose their
+state through collectors. Everything is exported as Prometheus text
+(prometheus_text()) or a JSON-friendly dict (snapshot()), and an optional
+sampling profiler (start_profiler()) records where threads spend their time.
+"""
+import bisect
+import functools
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+ENABLED_ENV_VAR = "METRICS_ENABLED"
+# Stack samples per second taken by the profiler; 0 or unset leaves it off
+PROFILE_ENV_VAR = "METRICS_PROFILE_HZ"
+# Show a stage timing table in the Streamlit sidebar
+SIDEBAR_ENV_VAR = "METRICS_IN_SIDEBAR"
+PREFIX = "clinic"
+
+# Histogram upper bounds in seconds, 50 microseconds to 30 seconds
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+ENABLED = os.environ.get(ENABLED_ENV_VAR, "1").strip().lower() not in ("0", "false", "no", "off")
+
+# A collector returns (metric name, labels, value) gauges, read at export time
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout."""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float, weight: int = 1):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += weight
+        self.sum += seconds * weight
+        self.count += weight
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (0 when empty)."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return 0.0
+
+
+_stages: Dict[str, Histogram] = {}
+_errors: Counter = Counter()
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+
+
+def observe(stage: str, seconds: float, weight: int = 1):
+    """Record a duration for a stage (standing for `weight` calls when sampled)."""
+    if not ENABLED:
+        return
+    histogram = _stages.get(stage)
+    if histogram is None:
+        histogram = _stages.setdefault(stage, Histogram())
+    histogram.observe(seconds, weight)
+
+
+def count_error(stage: str, error: BaseException):
+    """Count an exception that a stage handled (e.g. turned into an "Unknown" result)."""
+    _errors[(stage, type(error).__name__)] += 1
+
+
+class _Timer:
+    __slots__ = ("stage", "weight", "start")
+
+    def __init__(self, stage: str, weight: int = 1):
+        self.stage = stage
+        self.weight = weight
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        observe(self.stage, time.perf_counter() - self.start, self.weight)
+        if exc is not None:
+            count_error(self.stage, exc)
+        return False
+
+
+class _NotTimed:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NOT_TIMED = _NotTimed()
+
+
+def timed(stage: str):
+    """Context manager timing a stage; exceptions are counted and re-raised."""
+    return _Timer(stage) if ENABLED else _NOT_TIMED
+
+
+def timer(stage: str, sample: int = 1):
+    """
+    Decorator timing calls of a function as a stage.
+
+    Args:
+        stage: Stage name
+        sample: Time one call in `sample`, weighted by `sample`, for functions
+            so fast that timing every call would cost more than 1%; counts
+            then lag the true number of calls by less than `sample`
+    """
+    def decorate(func):
+        if not ENABLED:
+            return func
+        ticks = itertools.count()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tick = next(ticks)
+            if tick % sample:
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    count_error(stage, e)
+                    raise
+            # A sample stands for the calls since the previous one, the first for itself
+            with _Timer(stage, sample if tick else 1):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def register_collector(collector: Callable[[], Iterable[Sample]]):
+    """Add a function returning gauges (name, labels, value) to every export."""
+    _collectors.append(collector)
+    return collector
+
+
+def _cache_samples() -> Iterable[Sample]:
+    from utils.result_cache import registered_caches
+    for name, cache in registered_caches().items():
+        stats = cache.stats()
+        yield "cache_hits_total", {"cache": name}, stats.hits
+        yield "cache_misses_total", {"cache": name}, stats.misses
+        yield "cache_entries", {"cache": name}, stats.entries
+
+
+register_collector(_cache_samples)
+
+
+def _gauges() -> List[Sample]:
+    samples = []
+    for collector in list(_collectors):
+        try:
+            samples.extend(collector())
+        except Exception as e:
+            samples.append(("collector_errors_total", {"type": type(e).__name__}, 1))
+    return samples
+
+
+def snapshot() -> dict:
+    """
+    All metrics as plain data.
+
+    Returns:
+        dict: stages (count, mean/p50/p95/p99 in milliseconds, the quantiles
+        being bucket upper bounds), errors, cache hit rates, gauges and the
+        profiler's hottest frames
+    """
+    stages = {}
+    for name, histogram in sorted(_stages.items()):
+        count = histogram.count
+        stages[name] = {
+            "count": count,
+            "mean_ms": round(histogram.sum / count * 1000, 3) if count else 0.0,
+            **{f"p{int(q * 100)}_ms": histogram.quantile(q) * 1000 for q in (0.5, 0.95, 0.99)},
+        }
+    gauges = _gauges()
+    caches = {}
+    for name, labels, value in gauges:
+        if name in ("cache_hits_total", "cache_misses_total"):
+            caches.setdefault(labels["cache"], {})[name.split("_")[1]] = value
+    for counts in caches.values():
+        total = counts.get("hits", 0) + counts.get("misses", 0)
+        counts["hit_rate"] = round(counts.get("hits", 0) / total, 4) if total else None
+    return {
+        "enabled": ENABLED,
+        "stages": stages,
+        "errors": [{"stage": stage, "type": kind, "count": count}
+                   for (stage, kind), count in sorted(_errors.items())],
+        "caches": caches,
+        "gauges": [{"name": name, "labels": labels, "value": value}
+                   for name, labels, value in gauges if not name.startswith("cache_")],
+        "profile": _profiler.top() if _profiler else None,
+    }
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (key + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for key, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def prometheus_text() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = [f"# TYPE {PREFIX}_stage_seconds histogram"]
+    for name, histogram in sorted(_stages.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+        lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{name}"}} {histogram.sum!r}')
+        lines.append(f'{PREFIX}_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+    lines.append(f"# TYPE {PREFIX}_errors_total counter")
+    for (stage, kind), count in sorted(_errors.items()):
+        lines.append(f'{PREFIX}_errors_total{{stage="{stage}",type="{kind}"}} {count}')
+    typed = set()
+    for name, labels, value in _gauges():
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {PREFIX}_{name} {'counter' if name.endswith('_total') else 'gauge'}")
+        lines.append(f"{PREFIX}_{name}{_labels(labels)} {float(value)!r}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Forget every observation and error (collectors stay registered)."""
+    _stages.clear()
+    _errors.clear()
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's innermost stack frame at a fixed rate.
+
+    Costs one sys._current_frames() walk per sample on a daemon thread, so at
+    the default rate it stays far below the 1% budget; counts show which
+    functions threads are busy in (or blocked in) most often.
+    """
+
+    def __init__(self, hz: float = 50.0, depth: int = 1):
+        """
+        Args:
+            hz: Samples per second
+            depth: Innermost frames recorded per sample
+        """
+        self.interval = 1.0 / hz
+        self.depth = depth
+        self.samples = 0
+        self.frames: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-profiler", daemon=True)
+
+    def start(self) -> "SamplingProfiler":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def sample(self):
+        """Record the innermost frames of every other thread once."""
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.frames[" < ".join(stack)] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def top(self, n: int = 20) -> dict:
+        """Most sampled frames with their share of samples."""
+        return {
+            "samples": self.samples,
+            "frames": [{"frame": frame, "share": round(count / max(self.samples, 1), 4)}
+                       for frame, count in self.frames.most_common(n)],
+        }
+
+
+_profiler: Optional[SamplingProfiler] = None
+
+
+def start_profiler(hz: Optional[float] = None) -> Optional[SamplingProfiler]:
+    """
+    Start the process-wide sampling profiler (once).
+
+    Args:
+        hz: Samples per second (defaults to $METRICS_PROFILE_HZ; off when 0)
+
+    Returns:
+        SamplingProfiler or None if profiling is off
+    """
+    global _profiler
+    if hz is None:
+        try:
+            hz = float(os.environ.get(PROFILE_ENV_VAR) or 0)
+        except ValueError:
+            hz = 0
+    if _profiler is None and hz > 0:
+        _profiler = SamplingProfiler(hz).start()
+    return _profiler
@@ -0,0 +1,166 @@
+"""
+Content-addressed LRU cache for triage results
+"""
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+# Directory for persisted caches; persistence is off when unset
+CACHE_DIR_ENV_VAR = "RESULT_CACHE_DIR"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+_registry: Dict[str, "ResultCache"] = {}
+
+
+def registered_caches() -> Dict[str, "ResultCache"]:
+    """Named caches by name, for metrics export."""
+    return dict(_registry)
+
+
+class CacheStats(NamedTuple):
+    """Counters for one cache."""
+    hits: int
+    misses: int
+    entries: int
+    bytes: int
+
+
+def content_key(data: bytes, version: str) -> str:
+    """Key for binary content (e.g. image upload bytes) scored by a given model version."""
+    return f"{version}:{hashlib.blake2b(data, digest_size=16).hexdigest()}"
+
+
+def text_key(text: str, version: str) -> str:
+    """Key for free text, normalized for case and whitespace."""
+    return f"{version}:{_WHITESPACE_RE.sub(' ', text).strip().lower()}"
+
+
+def persistent_path(name: str) -> Optional[str]:
+    """Path to persist a named cache to, if $RESULT_CACHE_DIR is set."""
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VAR)
+    return os.path.join(cache_dir, f"{name}.json") if cache_dir else None
+
+
+def _entry_size(key: str, value) -> int:
+    return len(key) + len(json.dumps(value))
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate bytes.
+
+    Values must be JSON serializable (tuples are restored as tuples). When a
+    path is given, entries are loaded from it on creation and written back on
+    save() and at interpreter exit, so results survive restarts.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 4 * 1024 * 1024,
+                 path: Optional[str] = None, name: Optional[str] = None):
+        """
+        Args:
+            max_entries: Largest number of results kept
+            max_bytes: Largest approximate total size of keys and results
+            path: Optional JSON file to persist the cache to
+            name: Optional name the cache's hit rate is reported under (see registered_caches())
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+            atexit.register(self.save)
+        if name:
+            _registry[name] = self
+
+    def get(self, key: str, default=None):
+        """Return the cached result for key, marking it most recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value):
+        """Store a result, evicting least recently used entries to stay in bounds."""
+        size = _entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def get_or_compute(self, key: str, compute):
+        """
+        Return the cached result for key, computing and storing it on a miss.
+
+        Args:
+            key: Cache key (see content_key() and text_key())
+            compute: Zero-argument function producing the result
+
+        Returns:
+            The cached or freshly computed result
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+
+    def stats(self) -> CacheStats:
+        """Current hit/miss counters and size."""
+        return CacheStats(self.hits, self.misses, len(self._entries), self._bytes)
+
+    def save(self):
+        """Write the entries, oldest first, to the persistence path."""
+        if not self.path:
+            return
+        with self._lock:
+            items = [[key, value] for key, (value, _) in self._entries.items()]
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(items, f)
+            os.replace(tmp_path, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️ Could not save result cache: {e}")
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                items = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not load result cache: {e}")
+            return
+        for key, value in items:
+            self.put(key, tuple(value) if isinstance(value, list) else value)
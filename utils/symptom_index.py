@@ -0,0 +1,333 @@
+"""
+Compiled, memory-mapped symptom-disease index built from data/dataset.csv
+
+The build step interns every symptom into an integer ID and writes one
+binary file holding the symptom and disease names, per-symptom severity
+weights from Symptom-severity.csv, a disease x symptom bitset and the same
+matrix in CSR form with per-pair row counts. At runtime the file is
+memory-mapped and its arrays are read in place, so opening it costs a
+header parse and decoding ~170 short strings instead of parsing the CSVs.
+
+File layout (little-endian, every section 8-byte aligned):
+
+    header      MAGIC, FORMAT_VERSION, counts, section offsets, source hash
+    symptoms    uint32 offsets[n_symptoms + 1], then UTF-8 names
+    diseases    uint32 offsets[n_diseases + 1], then UTF-8 names
+    weights     uint8[n_symptoms]        severity weight (DEFAULT_WEIGHT if unlisted)
+    bitset      uint64[n_diseases][words] bit s set if disease has symptom s
+    indptr      uint32[n_diseases + 1]   CSR row pointers
+    indices     uint32[nnz]              symptom IDs, ascending per disease
+    counts      uint16[nnz]              dataset rows listing the pair
+    rows        uint16[n_diseases]       dataset rows per disease
+"""
+import csv
+import hashlib
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b"SYMIDX\x00\x01"
+FORMAT_VERSION = 1
+DEFAULT_WEIGHT = 1
+
+# Resolved from the package, so the index is found whatever the working directory
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_DATASET_PATH = os.path.join(DATA_DIR, "dataset.csv")
+DEFAULT_SEVERITY_PATH = os.path.join(DATA_DIR, "Symptom-severity.csv")
+DEFAULT_INDEX_PATH = os.path.join(DATA_DIR, "symptom_index.bin")
+
+# magic, version, n_symptoms, n_diseases, words, nnz, 9 section offsets, source hash
+_HEADER = struct.Struct("<8sIIIII9Q16s")
+_SECTIONS = ("symptoms", "diseases", "weights", "bitset", "indptr", "indices", "counts", "rows", "end")
+
+_SEPARATOR_RE = re.compile(r"[\s_]+")
+
+
+def normalize_symptom(name: str) -> str:
+    """
+    Canonical symptom ID text, e.g. " dischromic _patches" -> "dischromic_patches".
+
+    Args:
+        name: Symptom name as written in the dataset CSVs
+
+    Returns:
+        str: Lowercase name with runs of spaces/underscores collapsed to "_"
+    """
+    return _SEPARATOR_RE.sub("_", name.strip().lower()).strip("_")
+
+
+def symptom_label(symptom: str) -> str:
+    """Human readable form of a symptom ID ("skin_rash" -> "skin rash")."""
+    return symptom.replace("_", " ")
+
+
+def source_hash(paths: Iterable[str]) -> bytes:
+    """16-byte BLAKE2 digest of the source files' contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.digest()
+
+
+def _sources(dataset_path: str, severity_path: Optional[str]) -> List[str]:
+    """The CSVs an index is built from, in the order their contents are hashed."""
+    return [dataset_path] + ([severity_path] if severity_path and os.path.exists(severity_path) else [])
+
+
+def _align(buffer: bytearray):
+    buffer.extend(b"\x00" * (-len(buffer) % 8))
+
+
+def _pack_strings(buffer: bytearray, names: List[str]):
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    buffer.extend(struct.pack(f"<{len(offsets)}I", *offsets))
+    buffer.extend(b"".join(encoded))
+
+
+def _read_severity(severity_path: Optional[str]) -> Dict[str, int]:
+    weights = {}
+    if severity_path and os.path.exists(severity_path):
+        with open(severity_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                symptom = normalize_symptom(row.get("Symptom") or "")
+                try:
+                    weights[symptom] = int(row.get("weight") or DEFAULT_WEIGHT)
+                except ValueError:
+                    continue
+    return weights
+
+
+def build_index(dataset_path: str = DEFAULT_DATASET_PATH, severity_path: Optional[str] = DEFAULT_SEVERITY_PATH,
+                index_path: str = DEFAULT_INDEX_PATH) -> str:
+    """
+    Compile the disease-symptom CSV (and severity weights) into a binary index.
+
+    Args:
+        dataset_path: CSV with a Disease column followed by symptom columns
+        severity_path: Optional CSV with Symptom and weight columns
+        index_path: Where to write the index
+
+    Returns:
+        str: index_path
+    """
+    weights = _read_severity(severity_path)
+    symptom_ids: Dict[str, int] = {}
+    disease_ids: Dict[str, int] = {}
+    pair_counts: Dict[Tuple[int, int], int] = {}
+    disease_rows: List[int] = []
+
+    # Symptoms listed in the severity table get IDs even if no disease uses them
+    for symptom in weights:
+        symptom_ids.setdefault(symptom, len(symptom_ids))
+
+    with open(dataset_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if not row or not row[0].strip():
+                continue
+            disease = row[0].strip()
+            d = disease_ids.setdefault(disease, len(disease_ids))
+            if d == len(disease_rows):
+                disease_rows.append(0)
+            disease_rows[d] += 1
+            for cell in set(filter(None, map(normalize_symptom, row[1:]))):
+                s = symptom_ids.setdefault(cell, len(symptom_ids))
+                pair_counts[(d, s)] = pair_counts.get((d, s), 0) + 1
+
+    symptoms = list(symptom_ids)
+    diseases = list(disease_ids)
+    n_symptoms, n_diseases = len(symptoms), len(diseases)
+    words = (n_symptoms + 63) // 64
+
+    by_disease: List[List[Tuple[int, int]]] = [[] for _ in diseases]
+    for (d, s), count in pair_counts.items():
+        by_disease[d].append((s, count))
+
+    body = bytearray()
+    offsets = {}
+
+    def section(name):
+        _align(body)
+        offsets[name] = _HEADER.size + len(body)
+
+    section("symptoms")
+    _pack_strings(body, symptoms)
+    section("diseases")
+    _pack_strings(body, diseases)
+    section("weights")
+    body.extend(bytes(min(255, weights.get(symptom, DEFAULT_WEIGHT)) for symptom in symptoms))
+    section("bitset")
+    for pairs in by_disease:
+        bits = 0
+        for s, _ in pairs:
+            bits |= 1 << s
+        body.extend(bits.to_bytes(words * 8, "little"))
+    section("indptr")
+    indptr = [0]
+    for pairs in by_disease:
+        pairs.sort()
+        indptr.append(indptr[-1] + len(pairs))
+    body.extend(struct.pack(f"<{n_diseases + 1}I", *indptr))
+    nnz = indptr[-1]
+    section("indices")
+    body.extend(struct.pack(f"<{nnz}I", *(s for pairs in by_disease for s, _ in pairs)))
+    section("counts")
+    body.extend(struct.pack(f"<{nnz}H", *(min(c, 0xFFFF) for pairs in by_disease for _, c in pairs)))
+    section("rows")
+    body.extend(struct.pack(f"<{n_diseases}H", *(min(r, 0xFFFF) for r in disease_rows)))
+    section("end")
+
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, n_symptoms, n_diseases, words, nnz,
+                          *(offsets[name] for name in _SECTIONS), source_hash(_sources(dataset_path, severity_path)))
+
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+class SymptomIndex:
+    """
+    Read-only view of a compiled index over a memory map.
+
+    Array sections are exposed as memoryviews into the mapping (weights,
+    bitset, indptr, indices, counts, rows), so nothing is copied and every
+    worker process shares the same page cache.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        """
+        Args:
+            path: Index written by build_index()
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            raise ValueError(f"{path} is not a symptom index")
+        (magic, version, self.n_symptoms, self.n_diseases, self.words, self.nnz,
+         *section_offsets, self.source_hash) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} symptom index")
+        self._offsets = dict(zip(_SECTIONS, section_offsets))
+
+        self._view = view = memoryview(self._mmap)
+        self.weights = self._array(view, "weights", "B", self.n_symptoms)
+        self.bitset = self._array(view, "bitset", "Q", self.n_diseases * self.words)
+        self.indptr = self._array(view, "indptr", "I", self.n_diseases + 1)
+        self.indices = self._array(view, "indices", "I", self.nnz)
+        self.counts = self._array(view, "counts", "H", self.nnz)
+        self.rows = self._array(view, "rows", "H", self.n_diseases)
+        self.symptoms = self._strings(view, "symptoms", self.n_symptoms)
+        self.diseases = self._strings(view, "diseases", self.n_diseases)
+        self.symptom_ids = {symptom: i for i, symptom in enumerate(self.symptoms)}
+        self.disease_ids = {disease: i for i, disease in enumerate(self.diseases)}
+
+    def _array(self, view, name, fmt, length):
+        start = self._offsets[name]
+        return view[start:start + length * struct.calcsize(fmt)].cast(fmt)
+
+    def _strings(self, view, name, count) -> Tuple[str, ...]:
+        start = self._offsets[name]
+        offsets = view[start:start + (count + 1) * 4].cast("I")
+        blob = start + (count + 1) * 4
+        return tuple(str(view[blob + offsets[i]:blob + offsets[i + 1]], "utf-8") for i in range(count))
+
+    def symptom_id(self, name: str) -> Optional[int]:
+        """ID of a symptom given in any dataset spelling, or None."""
+        return self.symptom_ids.get(normalize_symptom(name))
+
+    def weight(self, symptom_id: int) -> int:
+        """Severity weight of a symptom."""
+        return self.weights[symptom_id]
+
+    def has(self, disease_id: int, symptom_id: int) -> bool:
+        """Whether any dataset row lists the symptom for the disease."""
+        return bool(self.bitset[disease_id * self.words + (symptom_id >> 6)] >> (symptom_id & 63) & 1)
+
+    def symptoms_of(self, disease_id: int) -> List[Tuple[int, int]]:
+        """
+        Symptoms of a disease with how many dataset rows list each.
+
+        Returns:
+            list: (symptom_id, row_count) pairs in ascending symptom order
+        """
+        start, end = self.indptr[disease_id], self.indptr[disease_id + 1]
+        return list(zip(self.indices[start:end], self.counts[start:end]))
+
+    def diseases_with(self, symptom_id: int) -> List[int]:
+        """IDs of the diseases that list a symptom."""
+        word, bit = symptom_id >> 6, 1 << (symptom_id & 63)
+        return [d for d in range(self.n_diseases) if self.bitset[d * self.words + word] & bit]
+
+    def close(self):
+        for name in ("weights", "bitset", "indptr", "indices", "counts", "rows"):
+            getattr(self, name).release()
+        self._view.release()
+        self._mmap.close()
+
+
+def stale(index: SymptomIndex, dataset_path: str = DEFAULT_DATASET_PATH,
+          severity_path: Optional[str] = DEFAULT_SEVERITY_PATH) -> bool:
+    """Whether the CSVs changed since the index was built (False if the dataset is not shipped)."""
+    if not os.path.exists(dataset_path):
+        return False
+    return index.source_hash != source_hash(_sources(dataset_path, severity_path))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_symptom_index(index_path: str = DEFAULT_INDEX_PATH, dataset_path: str = DEFAULT_DATASET_PATH,
+                      severity_path: Optional[str] = DEFAULT_SEVERITY_PATH, build: bool = False) -> SymptomIndex:
+    """
+    Get the process-wide memory-mapped index.
+
+    Serving code only opens the index; it is compiled offline by
+    scripts/build_artifacts.py (or scripts/build_symptom_index.py). An
+    index built from other CSVs than the current ones is still served,
+    with a warning, until it is rebuilt.
+
+    Args:
+        index_path: Compiled index location
+        dataset_path: Source CSV used if the index has to be built
+        severity_path: Severity CSV used if the index has to be built
+        build: Compile the index first if it is missing or stale (offline scripts only)
+
+    Returns:
+        SymptomIndex: Shared read-only index
+
+    Raises:
+        OSError: The index has not been built
+        ValueError: The file is not a symptom index of this format version
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if build and not os.path.exists(index_path):
+                    build_index(dataset_path, severity_path, index_path)
+                index = SymptomIndex(index_path)
+                if stale(index, dataset_path, severity_path):
+                    if build:
+                        index.close()
+                        build_index(dataset_path, severity_path, index_path)
+                        index = SymptomIndex(index_path)
+                    else:
+                        print(f"⚠️ {index_path} was built from other CSVs than {dataset_path}; "
+                              "run scripts/build_artifacts.py to rebuild it")
+                _index = index
+    return _index
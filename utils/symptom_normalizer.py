@@ -0,0 +1,336 @@
+"""
+Fuzzy and synonym normalization of free-text symptom phrases to dataset symptom IDs
+"""
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from utils.keyword_matcher import tokenize
+from utils.symptom_index import SymptomIndex, get_symptom_index, normalize_symptom, symptom_label
+
+# Longest phrase (in words) tried against the vocabulary
+MAX_PHRASE_WORDS = 5
+
+# Field phrasing -> dataset symptom ID
+SYNONYMS = {
+    "stomach ache": "stomach_pain",
+    "stomachache": "stomach_pain",
+    "tummy ache": "stomach_pain",
+    "tummy pain": "stomach_pain",
+    "sore stomach": "stomach_pain",
+    "belly ache": "belly_pain",
+    "feverish": "mild_fever",
+    "fever": "high_fever",
+    "high temperature": "high_fever",
+    "temperature": "mild_fever",
+    "hot body": "mild_fever",
+    "throwing up": "vomiting",
+    "vomit": "vomiting",
+    "puking": "vomiting",
+    "feeling sick": "nausea",
+    "nauseous": "nausea",
+    "queasy": "nausea",
+    "runny stomach": "diarrhoea",
+    "diarrhea": "diarrhoea",
+    "loose stools": "diarrhoea",
+    "short of breath": "breathlessness",
+    "shortness of breath": "breathlessness",
+    "difficulty breathing": "breathlessness",
+    "cannot breathe": "breathlessness",
+    "tired": "fatigue",
+    "tiredness": "fatigue",
+    "exhausted": "fatigue",
+    "no energy": "lethargy",
+    "itchy": "itching",
+    "itchy skin": "itching",
+    "rash": "skin_rash",
+    "spots on skin": "red_spots_over_body",
+    "pimples": "pus_filled_pimples",
+    "headaches": "headache",
+    "head ache": "headache",
+    "head pain": "headache",
+    "sore head": "headache",
+    "dizzy": "dizziness",
+    "lightheaded": "dizziness",
+    "coughing": "cough",
+    "sneezing": "continuous_sneezing",
+    "blocked nose": "congestion",
+    "stuffy nose": "congestion",
+    "yellow eyes": "yellowing_of_eyes",
+    "red eyes": "redness_of_eyes",
+    "watery eyes": "watering_from_eyes",
+    "blurry vision": "blurred_and_distorted_vision",
+    "blurred vision": "blurred_and_distorted_vision",
+    "chest tightness": "chest_pain",
+    "heart racing": "fast_heart_rate",
+    "racing heart": "fast_heart_rate",
+    "rapid heart rate": "fast_heart_rate",
+    "burning when urinating": "burning_micturition",
+    "painful urination": "burning_micturition",
+    "sore joints": "joint_pain",
+    "aching joints": "joint_pain",
+    "body aches": "muscle_pain",
+    "body pain": "muscle_pain",
+    "sore muscles": "muscle_pain",
+    "no appetite": "loss_of_appetite",
+    "not eating": "loss_of_appetite",
+    "losing weight": "weight_loss",
+    "shaking": "shivering",
+    "shivers": "shivering",
+    "sweats": "sweating",
+    "night sweats": "sweating",
+    "swollen glands": "swelled_lymph_nodes",
+    "swollen legs": "swollen_legs",
+    "bloody cough": "blood_in_sputum",
+    "coughing blood": "blood_in_sputum",
+    "blood in stool": "bloody_stool",
+    "sore throat": "throat_irritation",
+    "heartburn": "acidity",
+    "confused": "altered_sensorium",
+    "confusion": "altered_sensorium",
+    "unconscious": "coma",
+    "sad": "depression",
+    "anxious": "anxiety",
+}
+
+# Words that never start or end a symptom phrase
+STOPWORDS = frozenset({
+    "a", "an", "and", "the", "with", "of", "in", "on", "my", "i", "he", "she", "they", "has", "have",
+    "had", "is", "was", "for", "since", "days", "day", "weeks", "also", "some", "very", "at",
+})
+
+
+class SymptomMention(NamedTuple):
+    """A phrase in a note mapped to a canonical symptom."""
+    symptom: str
+    phrase: str
+    start: int
+    end: int
+    distance: int
+
+
+def edit_budget(length: int) -> int:
+    """Edits allowed for a phrase of the given length."""
+    if length <= 4:
+        return 0
+    if length <= 8:
+        return 1
+    return 2
+
+
+def trigrams(text: str) -> Set[str]:
+    """Padded character trigrams of a phrase."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 as soon as it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            current.append(value)
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SymptomNormalizer:
+    """
+    Maps free-text phrases to dataset symptom IDs.
+
+    Each candidate phrase is looked up exactly in the synonym table and the
+    vocabulary labels first. Otherwise only labels whose length is within the
+    edit budget are considered, those sharing too few character trigrams to
+    be within it are skipped (one edit breaks at most three trigrams), and
+    the rest are checked with a bounded Levenshtein distance. Phrase results
+    are kept in an LRU cache.
+    """
+
+    def __init__(self, symptoms: Iterable[str], synonyms: Optional[Dict[str, str]] = None,
+                 cache_size: int = 8192):
+        """
+        Args:
+            symptoms: Canonical symptom IDs (e.g. "stomach_pain")
+            synonyms: Phrase -> symptom ID table (defaults to SYNONYMS)
+            cache_size: Number of normalized phrases kept in the LRU cache
+        """
+        self.symptoms = tuple(symptoms)
+        known = set(self.symptoms)
+        self._exact: Dict[str, str] = {}
+        for symptom in self.symptoms:
+            self._exact[self._key(symptom_label(symptom))] = symptom
+        for phrase, symptom in (SYNONYMS if synonyms is None else synonyms).items():
+            symptom = normalize_symptom(symptom)
+            if symptom in known:
+                self._exact[self._key(phrase)] = symptom
+
+        # Labels by length with their trigrams; most multi-word windows of a note match no length at all
+        self._by_length: Dict[int, List[Tuple[str, str, Set[str], int]]] = defaultdict(list)
+        for label, symptom in self._exact.items():
+            grams = trigrams(label)
+            self._by_length[len(label)].append((label, symptom, grams, len(grams)))
+        self._max_length = max(self._by_length, default=0) + edit_budget(max(self._by_length, default=0))
+
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    @staticmethod
+    def _key(phrase: str) -> str:
+        return " ".join(word for word, _, _ in tokenize(phrase))
+
+    def _lookup(self, phrase: str) -> Optional[Tuple[str, int]]:
+        """
+        Canonical symptom for a phrase (already lowercase, single-spaced).
+
+        Returns:
+            tuple: (symptom ID, edit distance), or None if nothing is close enough
+        """
+        symptom = self._exact.get(phrase)
+        if symptom is not None:
+            return symptom, 0
+        budget = edit_budget(len(phrase))
+        if budget == 0:
+            return None
+
+        grams = None
+        best = None
+        for length in range(len(phrase) - budget, len(phrase) + budget + 1):
+            for label, symptom, label_grams, count in self._by_length.get(length, ()):
+                if grams is None:
+                    grams = trigrams(phrase)
+                # Each edit changes at most 3 trigrams on either side
+                if len(grams & label_grams) < max(len(grams), count) - 3 * budget:
+                    continue
+                distance = bounded_levenshtein(phrase, label, budget)
+                if distance <= budget and (best is None or distance < best[1]):
+                    best = (symptom, distance)
+        return best
+
+    def find(self, text: str) -> List[SymptomMention]:
+        """
+        Find symptom mentions in a note, longest phrases first, left to right.
+
+        Args:
+            text: Free-text symptom note
+
+        Returns:
+            list: Non-overlapping SymptomMention entries in text order
+        """
+        tokens = tokenize(text)
+        mentions = []
+        i = 0
+        while i < len(tokens):
+            if tokens[i][0] in STOPWORDS:
+                i += 1
+                continue
+            for n in range(min(MAX_PHRASE_WORDS, len(tokens) - i), 0, -1):
+                if tokens[i + n - 1][0] in STOPWORDS:
+                    continue
+                phrase = " ".join(word for word, _, _ in tokens[i:i + n])
+                if len(phrase) > self._max_length:
+                    continue
+                found = self.lookup(phrase)
+                if found is not None:
+                    start, end = tokens[i][1], tokens[i + n - 1][2]
+                    mentions.append(SymptomMention(found[0], text[start:end], start, end, found[1]))
+                    i += n
+                    break
+            else:
+                i += 1
+        return mentions
+
+    def normalize(self, text: str) -> List[str]:
+        """Distinct canonical symptom IDs mentioned in a note, in text order."""
+        return list(dict.fromkeys(mention.symptom for mention in self.find(text)))
+
+
+_normalizer = None
+_normalizer_lock = threading.Lock()
+
+
+def get_normalizer(index: Optional[SymptomIndex] = None) -> SymptomNormalizer:
+    """Get the process-wide normalizer over the dataset symptom vocabulary."""
+    global _normalizer
+    if _normalizer is None:
+        with _normalizer_lock:
+            if _normalizer is None:
+                _normalizer = SymptomNormalizer((index or get_symptom_index()).symptoms)
+    return _normalizer
+
+
+def available_normalizer() -> Optional[SymptomNormalizer]:
+    """get_normalizer(), or None while the symptom index is missing or unreadable."""
+    try:
+        return get_normalizer()
+    except (OSError, ValueError):
+        return None
+
+
+def symptom_keyword(matcher, symptom: str) -> Optional[Tuple[str, str]]:
+    """
+    The one keyword a canonical symptom is scored as.
+
+    That is the longest keyword inside its label ("mild fever" for
+    mild_fever, not also "fever"), the earlier tier on a tie.
+
+    Returns:
+        tuple: (keyword, tier), or None if no keyword occurs in the label
+    """
+    best = None
+    for match in matcher.find(symptom_label(symptom)):
+        rank = (match.end - match.start, -matcher.tiers.index(match.tier))
+        if best is None or rank > best[0]:
+            best = (rank, (match.keyword, match.tier))
+    return best[1] if best is not None else None
+
+
+def count_tiers(matcher, text: str, normalizer: Optional[SymptomNormalizer] = None) -> Dict[str, int]:
+    """
+    Count the distinct symptoms per tier in a note.
+
+    Every dataset symptom the note mentions counts once, however it is
+    written ("tummy pain", "vomitting"), in the highest tier of the
+    keywords inside the mention and of its label's keyword
+    (symptom_keyword()). A symptom whose label holds no keyword
+    ("diarrhoea") counts in the lowest tier, where the enhanced vocabulary
+    puts the dataset symptoms it merges, so both analyzers score it alike.
+    Keywords outside any mention count once each. Without a symptom index
+    only the keywords are counted.
+
+    Args:
+        matcher: KeywordMatcher with the risk tiers
+        text: Symptom description
+        normalizer: Normalizer to use (defaults to available_normalizer())
+
+    Returns:
+        dict: Tier name to number of distinct symptoms found
+    """
+    normalizer = normalizer or available_normalizer()
+    mentions = normalizer.find(text) if normalizer is not None else []
+    rank = {tier: i for i, tier in enumerate(matcher.tiers)}
+    # ("keyword", keyword) or ("symptom", symptom ID) -> tier
+    found = {}
+    inside = defaultdict(list)
+    for match in matcher.find(text):
+        mention = next((m for m in mentions if m.start <= match.start and match.end <= m.end), None)
+        if mention is None:
+            found[("keyword", match.keyword)] = match.tier
+        else:
+            inside[mention].append(match.tier)
+    for mention in mentions:
+        keyword = symptom_keyword(matcher, mention.symptom)
+        tiers = inside[mention] + [keyword[1] if keyword is not None else matcher.tiers[-1]]
+        key = ("symptom", mention.symptom)
+        found[key] = min(tiers + ([found[key]] if key in found else []), key=rank.__getitem__)
+    counts = dict.fromkeys(matcher.tiers, 0)
+    for tier in found.values():
+        counts[tier] += 1
+    return counts
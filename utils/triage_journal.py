@@ -0,0 +1,518 @@
+"""
+Offline triage journal with delta sync
+
+Health workers screen patients without connectivity, so every result is
+appended to a local journal and uploaded whenever a connection is there.
+Records are compact binary frames holding no free text and no photos:
+
+    frame     <H payload length><I crc32 of payload> payload
+    payload   <I unix time><B kind><B risk><H confidence * 65535><H symptom count>
+              [16-byte BLAKE2 hash of the photo, image records only]
+              <H symptom id> per symptom
+
+Symptom ids are positions in the compiled symptom index
+(utils.symptom_index), whose source hash is written in every segment
+header, so a segment is always decoded with the vocabulary it was written
+with. A note with four symptoms takes 24 bytes, an image result 32.
+
+The journal is a directory of segments named by the sequence number of
+their first record (records are numbered from 1 without gaps):
+
+    <first seq>.seg   <8s magic><H version><Q first seq><16s vocabulary hash>, then frames
+    sync.json         highest sequence number the server has acknowledged
+
+Appends are buffered and fsync'ed in batches, after `sync_every` records
+or `sync_interval` seconds, whichever comes first, so a power cut loses at
+most one batch; a torn frame at the end is cut off when the journal is
+opened. The active segment is sealed when it reaches `segment_bytes`, when
+the vocabulary changes and when a sync starts. Sync uploads only sealed
+segments that hold unacknowledged records, each deflate-compressed in one
+request, and compact() then deletes acknowledged segments and merges runs
+of small unsent ones.
+
+Sync protocol (scripts/journal_sync_server.py is a local stand-in server):
+
+    GET  <url>/journal/<device>            -> {"acked": seq}
+    POST <url>/journal/<device>/segments   deflated segment -> {"acked": seq}
+
+The server keeps the records after its acknowledged sequence number, so
+resending a segment after a lost response is harmless.
+"""
+import atexit
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import urllib.request
+import zlib
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+JOURNAL_DIR_ENV_VAR = "TRIAGE_JOURNAL_DIR"
+SYNC_URL_ENV_VAR = "TRIAGE_SYNC_URL"
+DEVICE_ENV_VAR = "TRIAGE_DEVICE_ID"
+
+MAGIC = b"TRIAGEJ1"
+FORMAT_VERSION = 1
+SEGMENT_HEADER = struct.Struct("<8sHQ16s")
+_FRAME = struct.Struct("<HI")
+_RECORD = struct.Struct("<IBBHH")
+_HASH_BYTES = 16
+
+# Record kinds and risk levels as stored
+SYMPTOMS, IMAGE = 0, 1
+RISKS = ("Unknown", "Low", "Low-Medium", "Medium", "High")
+_RISK_CODES = {risk: code for code, risk in enumerate(RISKS)}
+
+
+class TriageRecord(NamedTuple):
+    """One decoded journal record."""
+    seq: int
+    time: int
+    kind: int
+    risk: str
+    confidence: float
+    symptom_ids: Tuple[int, ...]
+    image_hash: Optional[bytes]
+
+
+class SyncReport(NamedTuple):
+    """What one sync() transferred."""
+    segments: int
+    records: int
+    raw_bytes: int
+    sent_bytes: int
+    seconds: float
+    acked: int
+
+
+def encode_record(kind: int, risk: str, confidence: float = 0.0, symptom_ids: Iterable[int] = (),
+                  image_hash: Optional[bytes] = None, timestamp: Optional[float] = None) -> bytes:
+    """
+    Encode one record as a length-prefixed, checksummed frame.
+
+    Args:
+        kind: SYMPTOMS or IMAGE
+        risk: Risk level, one of RISKS (anything else is stored as "Unknown")
+        confidence: Result confidence in [0, 1]; 0 when the analysis has none
+        symptom_ids: Symptom index ids mentioned by the note
+        image_hash: 16-byte hash of the photo, image records only
+        timestamp: Unix time of the result (defaults to now)
+
+    Returns:
+        bytes: The frame
+    """
+    symptom_ids = list(symptom_ids)
+    payload = _RECORD.pack(int(time.time() if timestamp is None else timestamp), kind,
+                           _RISK_CODES.get(risk, 0), round(min(max(confidence, 0.0), 1.0) * 65535),
+                           len(symptom_ids))
+    if kind == IMAGE:
+        payload += image_hash or bytes(_HASH_BYTES)
+    payload += struct.pack(f"<{len(symptom_ids)}H", *symptom_ids)
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_record(frame: bytes, seq: int) -> TriageRecord:
+    """Decode a frame written by encode_record()."""
+    payload = memoryview(frame)[_FRAME.size:]
+    timestamp, kind, risk, confidence, count = _RECORD.unpack_from(payload)
+    offset = _RECORD.size
+    image_hash = None
+    if kind == IMAGE:
+        image_hash = bytes(payload[offset:offset + _HASH_BYTES])
+        offset += _HASH_BYTES
+    symptom_ids = struct.unpack_from(f"<{count}H", payload, offset)
+    risk = RISKS[risk] if risk < len(RISKS) else "Unknown"
+    return TriageRecord(seq, timestamp, kind, risk, confidence / 65535, symptom_ids, image_hash)
+
+
+def split_frames(data: bytes, offset: int = SEGMENT_HEADER.size) -> Tuple[List[bytes], int]:
+    """
+    Split intact frames off a segment, stopping at the first torn or corrupt one.
+
+    Returns:
+        tuple: (frames, offset just past the last intact frame)
+    """
+    view = memoryview(data)
+    frames = []
+    while offset + _FRAME.size <= len(data):
+        length, crc = _FRAME.unpack_from(view, offset)
+        end = offset + _FRAME.size + length
+        if end > len(data) or zlib.crc32(view[offset + _FRAME.size:end]) != crc:
+            break
+        frames.append(bytes(view[offset:end]))
+        offset = end
+    return frames, offset
+
+
+def parse_segment(data: bytes) -> Tuple[int, bytes, List[bytes]]:
+    """
+    Read a segment's header and frames.
+
+    Returns:
+        tuple: (first sequence number, vocabulary hash, frames)
+    """
+    if len(data) < SEGMENT_HEADER.size:
+        raise ValueError("not a triage journal segment")
+    magic, version, first_seq, vocabulary = SEGMENT_HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"not a version {FORMAT_VERSION} triage journal segment")
+    return first_seq, vocabulary, split_frames(data)[0]
+
+
+def segment_header(first_seq: int, vocabulary: bytes) -> bytes:
+    return SEGMENT_HEADER.pack(MAGIC, FORMAT_VERSION, first_seq, vocabulary)
+
+
+def _fsync_dir(path: str):
+    # Makes a created or renamed file's name durable; directories cannot be opened on Windows
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Segment:
+    __slots__ = ("path", "first_seq", "count", "vocabulary", "size")
+
+    def __init__(self, path: str, first_seq: int, count: int, vocabulary: bytes, size: int):
+        self.path = path
+        self.first_seq = first_seq
+        self.count = count
+        self.vocabulary = vocabulary
+        self.size = size
+
+    @property
+    def last_seq(self) -> int:
+        return self.first_seq + self.count - 1
+
+
+class TriageJournal:
+    """Append-only journal of triage results, synced to a server in sealed segments."""
+
+    def __init__(self, root: str, segment_bytes: int = 256 * 1024, sync_every: int = 32,
+                 sync_interval: float = 1.0):
+        """
+        Args:
+            root: Directory the journal is kept in
+            segment_bytes: Size at which the active segment is sealed
+            sync_every: Records appended between fsyncs
+            sync_interval: Longest time in seconds an appended record waits for its fsync
+        """
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        # Held by sync() and compact(), which read and rewrite sealed segments
+        self._sync_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.acked = 0
+        state_path = self._path("sync.json")
+        if os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                self.acked = json.load(f)["acked"]
+        self.segments = self._open_segments()
+        last = self.segments[-1] if self.segments else None
+        self.next_seq = max(self.acked, last.last_seq if last else 0) + 1
+        # Nothing of the last segment was sent yet, so appends may continue it
+        self._active = last if last is not None and last.first_seq > self.acked \
+            and last.size < segment_bytes else None
+        self._file = None
+        self._unsynced = 0
+        self._new_file = False
+        self._timer = None
+
+    def _path(self, *names: str) -> str:
+        return os.path.join(self.root, *names)
+
+    def _open_segments(self) -> List[_Segment]:
+        segments = []
+        for name in sorted(os.listdir(self.root)):
+            path = self._path(name)
+            if name.endswith(".tmp"):
+                os.remove(path)  # an interrupted compaction
+                continue
+            if not name.endswith(".seg"):
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            try:
+                first_seq, vocabulary, _ = parse_segment(data)
+            except ValueError:
+                os.remove(path)  # created but never got its header
+                continue
+            frames, end = split_frames(data)
+            if end < len(data):
+                os.truncate(path, end)
+            if segments and first_seq <= segments[-1].last_seq:
+                os.remove(path)  # already merged into the previous segment
+                continue
+            segments.append(_Segment(path, first_seq, len(frames), vocabulary, end))
+        return segments
+
+    def append(self, kind: int, risk: str, confidence: float = 0.0, symptom_ids: Iterable[int] = (),
+               image_hash: Optional[bytes] = None, vocabulary: bytes = bytes(_HASH_BYTES)) -> int:
+        """
+        Append one result.
+
+        Args:
+            kind: SYMPTOMS or IMAGE
+            risk: Risk level
+            confidence: Result confidence (0 when the analysis has none)
+            symptom_ids: Symptom index ids mentioned by the note
+            image_hash: 16-byte hash of the photo
+            vocabulary: Source hash of the symptom index the ids refer to
+
+        Returns:
+            int: Sequence number of the record
+        """
+        frame = encode_record(kind, risk, confidence, symptom_ids, image_hash)
+        with self._lock:
+            active = self._active
+            if active is None or active.vocabulary != vocabulary or \
+                    (active.count and active.size + len(frame) > self.segment_bytes):
+                self._seal_locked()
+                active = self._start_segment(vocabulary)
+            elif self._file is None:
+                self._file = open(active.path, "ab")
+            self._file.write(frame)
+            active.count += 1
+            active.size += len(frame)
+            seq = self.next_seq
+            self.next_seq += 1
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.sync_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return seq
+
+    def record_symptoms(self, note: str, risk: str, confidence: float = 0.0) -> int:
+        """Append a symptom triage result, keeping the symptoms the note mentions but not the note."""
+        from utils.symptom_index import get_symptom_index
+        from utils.symptom_normalizer import get_normalizer
+        index = get_symptom_index()
+        symptom_ids = [index.symptom_ids[symptom] for symptom in get_normalizer(index).normalize(note)]
+        return self.append(SYMPTOMS, risk, confidence, symptom_ids, vocabulary=index.source_hash)
+
+    def record_image(self, digest: bytes, risk: str, confidence: float) -> int:
+        """
+        Append an image triage result, keeping a hash of the photo but not the photo.
+
+        Args:
+            digest: 16-byte BLAKE2 digest of the photo bytes (model.image_store.ImageRef.digest)
+            risk: Risk level
+            confidence: Result confidence
+        """
+        from utils.symptom_index import get_symptom_index
+        try:
+            vocabulary = get_symptom_index().source_hash
+        except (OSError, ValueError):  # image records name no symptoms, so no index is needed
+            vocabulary = bytes(_HASH_BYTES)
+        return self.append(IMAGE, risk, confidence, image_hash=digest, vocabulary=vocabulary)
+
+    def _start_segment(self, vocabulary: bytes) -> _Segment:
+        path = self._path(f"{self.next_seq:016d}.seg")
+        self._file = open(path, "wb")
+        header = segment_header(self.next_seq, vocabulary)
+        self._file.write(header)
+        self._new_file = True
+        self._active = _Segment(path, self.next_seq, 0, vocabulary, len(header))
+        self.segments.append(self._active)
+        return self._active
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._file is not None and (self._unsynced or self._new_file):
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if self._new_file:
+                _fsync_dir(self.root)
+                self._new_file = False
+        self._unsynced = 0
+
+    def flush(self):
+        """Make every appended record durable."""
+        with self._lock:
+            self._flush_locked()
+
+    def _seal_locked(self):
+        self._flush_locked()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._active = None
+
+    def close(self):
+        """Flush and close the active segment (appending reopens it)."""
+        with self._lock:
+            self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @property
+    def pending(self) -> int:
+        """Records the server has not acknowledged yet."""
+        return self.next_seq - 1 - self.acked
+
+    def records(self, after: int = 0) -> Iterator[TriageRecord]:
+        """Decoded records with a sequence number above `after`, oldest first."""
+        self.flush()
+        with self._lock:
+            segments = [(s.path, s.first_seq, s.count) for s in self.segments]
+        for path, first_seq, count in segments:
+            if first_seq + count - 1 <= after:
+                continue
+            with open(path, "rb") as f:
+                frames, _ = split_frames(f.read())
+            for seq, frame in enumerate(frames[:count], first_seq):
+                if seq > after:
+                    yield decode_record(frame, seq)
+
+    def _save_acked(self, acked: int):
+        temporary = self._path("sync.json.tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"acked": acked}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self._path("sync.json"))
+        self.acked = acked
+
+    def sync(self, url: str, device: str, timeout: float = 30.0, compact: bool = True) -> SyncReport:
+        """
+        Upload the sealed segments holding records the server has not acknowledged.
+
+        Args:
+            url: Base URL of the sync server
+            device: Id of this device on the server
+            timeout: Seconds per request
+            compact: Run compact() after a successful sync
+
+        Returns:
+            SyncReport: Transfer totals
+
+        Raises:
+            OSError: The server is unreachable or rejected a segment; what it
+                acknowledged before that is kept
+        """
+        start = time.perf_counter()
+        base = f"{url.rstrip('/')}/journal/{device}"
+        with self._sync_lock:
+            with self._lock:
+                self._seal_locked()
+                segments = [s for s in self.segments if s.count]
+            acked = _call(base, timeout=timeout)["acked"]
+            sent_segments = records = raw_bytes = sent_bytes = 0
+            try:
+                for segment in segments:
+                    if segment.last_seq <= acked:
+                        continue
+                    with open(segment.path, "rb") as f:
+                        data = f.read(segment.size)
+                    body = zlib.compress(data, 6)
+                    records += segment.last_seq - max(acked, segment.first_seq - 1)
+                    acked = _call(f"{base}/segments", body, timeout)["acked"]
+                    sent_segments += 1
+                    raw_bytes += len(data)
+                    sent_bytes += len(body)
+            finally:
+                if acked != self.acked:
+                    self._save_acked(acked)
+            if compact:
+                self._compact_locked()
+        return SyncReport(sent_segments, records, raw_bytes, sent_bytes, time.perf_counter() - start, acked)
+
+    def compact(self) -> Tuple[int, int]:
+        """
+        Delete acknowledged segments and merge runs of small unsent ones.
+
+        Returns:
+            tuple: (segments deleted, segments merged away)
+        """
+        with self._sync_lock:
+            return self._compact_locked()
+
+    def _compact_locked(self) -> Tuple[int, int]:
+        with self._lock:
+            sealed = [s for s in self.segments if s is not self._active]
+        deleted = [s for s in sealed if s.last_seq <= self.acked]
+        for segment in deleted:
+            os.remove(segment.path)
+
+        merged = 0
+        runs, run = [], []
+        for segment in (s for s in sealed if s.last_seq > self.acked):
+            if run and (segment.vocabulary != run[0].vocabulary
+                        or sum(s.size for s in run) + segment.size > self.segment_bytes):
+                runs.append(run)
+                run = []
+            run.append(segment)
+        runs.append(run)
+        for run in (r for r in runs if len(r) > 1):
+            # Written aside and renamed over the first segment; its followers are then removed
+            temporary = run[0].path + ".tmp"
+            with open(temporary, "wb") as out:
+                out.write(segment_header(run[0].first_seq, run[0].vocabulary))
+                for segment in run:
+                    with open(segment.path, "rb") as f:
+                        out.write(f.read(segment.size)[SEGMENT_HEADER.size:])
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(temporary, run[0].path)
+            _fsync_dir(self.root)
+            for segment in run[1:]:
+                os.remove(segment.path)
+            run[0].count = sum(s.count for s in run)
+            run[0].size = SEGMENT_HEADER.size + sum(s.size - SEGMENT_HEADER.size for s in run)
+            merged += len(run) - 1
+
+        gone = {id(s) for s in deleted} | {id(s) for r in runs for s in r[1:]}
+        with self._lock:
+            self.segments = [s for s in self.segments if id(s) not in gone]
+        return len(deleted), merged
+
+
+def _call(url: str, body: Optional[bytes] = None, timeout: float = 30.0) -> dict:
+    headers = {"Accept": "application/json"}
+    if body is not None:
+        headers.update({"Content-Type": "application/octet-stream", "Content-Encoding": "deflate"})
+    request = urllib.request.Request(url, data=body, headers=headers, method="GET" if body is None else "POST")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    """Whether $TRIAGE_JOURNAL_DIR turns the journal on."""
+    return bool(os.environ.get(JOURNAL_DIR_ENV_VAR))
+
+
+def get_journal() -> Optional[TriageJournal]:
+    """The journal in $TRIAGE_JOURNAL_DIR, or None if the journal is off."""
+    global _journal
+    if not enabled():
+        return None
+    with _journal_lock:
+        if _journal is None:
+            _journal = TriageJournal(os.environ[JOURNAL_DIR_ENV_VAR])
+            atexit.register(_journal.close)
+    return _journal
+
+
+def device_id() -> str:
+    """This device's id on the sync server ($TRIAGE_DEVICE_ID, else the host name)."""
+    return os.environ.get(DEVICE_ENV_VAR) or socket.gethostname()
@@ -0,0 +1,371 @@
+"""
+On-disk IVF index for approximate nearest-neighbour search over embeddings
+
+Vectors are L2-normalized, reduced by PCA to `dim` components and
+partitioned into `nlist` clusters by spherical k-means (an inverted file).
+The main segment keeps the reduced vectors as float16 sorted by cluster, so
+every cluster is one contiguous slice of a memory-mapped file. A query
+scores the centroids, scans the `nprobe` closest clusters plus any recently
+inserted vectors, and returns the top k by cosine similarity.
+
+Inserts are appended to a small delta segment that is scanned exhaustively.
+Once it holds more than `max_delta` vectors it is merged into the main
+segment by compact(), which re-sorts rows by cluster without retraining.
+The merged segment is written as a new generation next to the old one, and
+meta.json is atomically replaced to name it; the old generation and its
+delta are deleted only after that, so a crash at any point leaves either
+the old or the new index, never a mix of the two.
+
+The reduced vectors only shortlist candidates: the original vectors are
+also kept (float16, append-only, in insertion order) and the best `rerank`
+candidates are re-scored with them, so PCA does not cost recall at the top.
+
+Directory layout (<g> is the current generation, named in meta.json):
+
+    meta.json                    format version, dimensions, current generation
+    mean.npy, projection.npy     PCA parameters (input dim -> dim)
+    centroids.npy                float32[nlist, dim]
+    main.<g>/offsets.npy         int64[nlist + 1] first row of each cluster
+    main.<g>/vectors.npy         float16[n, dim] main segment, sorted by cluster
+    main.<g>/ids.npy             int64[n] ids of the main segment rows
+    main.<g>/positions.npy       int64[n] rows of the main segment in full.f16
+    full.f16                     float16[total, input dim] original vectors, append-only
+    delta.<g>.f16, .ids, .pos    reduced vectors, ids and full.f16 rows appended since
+"""
+import json
+import os
+import shutil
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 2
+DEFAULT_DIM = 128
+DEFAULT_NPROBE = 16
+DEFAULT_RERANK = 100
+DEFAULT_MAX_DELTA = 20_000
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+def _save_npy(path: str, array: np.ndarray):
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def _write_meta(path: str, meta: dict):
+    tmp_path = os.path.join(path, "meta.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+
+def _write_main(directory: str, vectors: np.ndarray, ids: np.ndarray, positions: np.ndarray,
+                offsets: np.ndarray):
+    """Write a main segment generation; a leftover of a crashed compaction is replaced."""
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    for name, array in (("vectors.npy", vectors), ("ids.npy", ids), ("positions.npy", positions),
+                        ("offsets.npy", offsets)):
+        with open(os.path.join(directory, name), "wb") as f:
+            np.save(f, array)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _remove_segments(path: str, keep: Optional[int] = None):
+    """Delete the main and delta segments of every generation but `keep`."""
+    for name in os.listdir(path):
+        kind, _, rest = name.partition(".")
+        if kind not in ("main", "delta") or rest.split(".")[0] == str(keep):
+            continue
+        if os.path.isdir(os.path.join(path, name)):
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        else:
+            os.remove(os.path.join(path, name))
+
+
+def spherical_kmeans(points: np.ndarray, k: int, iterations: int = 15, seed: int = 0,
+                     batch_size: int = 16384) -> np.ndarray:
+    """
+    Cluster unit vectors by cosine similarity.
+
+    Args:
+        points: (N, D) unit vectors
+        k: Number of clusters
+        iterations: Lloyd iterations
+        seed: Initialization seed
+        batch_size: Points assigned per matrix product
+
+    Returns:
+        np.ndarray: (k, D) unit centroids
+    """
+    rng = np.random.default_rng(seed)
+    centroids = points[rng.choice(len(points), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        sums = np.zeros_like(centroids)
+        counts = np.zeros(k, dtype=np.int64)
+        for start in range(0, len(points), batch_size):
+            batch = points[start:start + batch_size]
+            labels = np.argmax(batch @ centroids.T, axis=1)
+            np.add.at(sums, labels, batch)
+            counts += np.bincount(labels, minlength=k)
+        empty = counts == 0
+        # Empty clusters restart from random points
+        sums[empty] = points[rng.choice(len(points), size=int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class VectorIndex:
+    """
+    IVF index over a directory, read through memory maps.
+
+    Searches are thread-safe; one writer at a time may add() or compact().
+    """
+
+    def __init__(self, path: str, max_delta: int = DEFAULT_MAX_DELTA):
+        """
+        Args:
+            path: Directory written by VectorIndex.train()
+            max_delta: Appended vectors kept before add() compacts
+        """
+        self.path = path
+        self.max_delta = max_delta
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} vector index")
+        self.input_dim, self.dim, self.nlist = meta["input_dim"], meta["dim"], meta["nlist"]
+        self.generation = meta["generation"]
+        self.mean = np.load(self._file("mean.npy"))
+        self.projection = np.load(self._file("projection.npy"))
+        self.centroids = np.load(self._file("centroids.npy"))
+        self._lock = threading.RLock()
+        self._open_main()
+        self._open_delta()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _main_file(self, name: str) -> str:
+        return os.path.join(self.path, f"main.{self.generation}", name)
+
+    def _delta_file(self, suffix: str) -> str:
+        return os.path.join(self.path, f"delta.{self.generation}.{suffix}")
+
+    def _open_main(self):
+        self.offsets = np.load(self._main_file("offsets.npy"))
+        self.vectors = self._load_segment("vectors.npy")
+        self.ids = self._load_segment("ids.npy")
+        self.positions = self._load_segment("positions.npy")
+
+    def _load_segment(self, name: str) -> np.ndarray:
+        # Empty arrays cannot be memory-mapped
+        array = np.load(self._main_file(name), mmap_mode="r")
+        return np.load(self._main_file(name)) if array.size == 0 else array
+
+    def _read_delta(self, suffix: str, dtype) -> np.ndarray:
+        path = self._delta_file(suffix)
+        return np.fromfile(path, dtype=dtype) if os.path.exists(path) else np.empty(0, dtype=dtype)
+
+    def _open_delta(self):
+        vectors = self._read_delta("f16", np.float16)
+        ids = self._read_delta("ids", np.int64)
+        positions = self._read_delta("pos", np.int64)
+        # A write interrupted between the files leaves extra entries in the earlier ones; they are ignored
+        rows = min(len(vectors) // self.dim, len(ids), len(positions))
+        self.delta_vectors = vectors[:rows * self.dim].reshape(rows, self.dim)
+        self.delta_ids = ids[:rows]
+        self.delta_positions = positions[:rows]
+        self._open_full()
+
+    def _open_full(self):
+        path = self._file("full.f16")
+        rows = os.path.getsize(path) // (2 * self.input_dim) if os.path.exists(path) else 0
+        self.full = (np.memmap(path, dtype=np.float16, mode="r", shape=(rows, self.input_dim)) if rows
+                     else np.empty((0, self.input_dim), dtype=np.float16))
+
+    @classmethod
+    def train(cls, path: str, sample: np.ndarray, dim: int = DEFAULT_DIM, nlist: Optional[int] = None,
+              iterations: int = 15, seed: int = 0, **kwargs) -> "VectorIndex":
+        """
+        Learn the projection and clusters from a sample and create an empty index.
+
+        Args:
+            path: Directory to create (existing index files are replaced)
+            sample: (N, input dim) representative vectors, ideally 40+ per cluster
+            dim: Reduced dimension
+            nlist: Clusters (default: about sqrt(expected size), from the sample size)
+            iterations: k-means iterations
+            seed: Random seed
+
+        Returns:
+            VectorIndex: The new, empty index
+        """
+        sample = _normalize(sample)
+        dim = min(dim, sample.shape[1])
+        nlist = nlist or max(1, min(4096, int(np.sqrt(len(sample) * 16))))
+        nlist = min(nlist, len(sample))
+
+        mean = sample.mean(axis=0)
+        centered = sample - mean
+        eigenvalues, eigenvectors = np.linalg.eigh(centered.T @ centered)
+        projection = np.ascontiguousarray(eigenvectors[:, np.argsort(eigenvalues)[::-1][:dim]], dtype=np.float32)
+        reduced = _normalize(centered @ projection)
+        centroids = spherical_kmeans(reduced, nlist, iterations, seed)
+
+        os.makedirs(path, exist_ok=True)
+        _remove_segments(path)
+        if os.path.exists(os.path.join(path, "full.f16")):
+            os.remove(os.path.join(path, "full.f16"))
+        _save_npy(os.path.join(path, "mean.npy"), mean.astype(np.float32))
+        _save_npy(os.path.join(path, "projection.npy"), projection)
+        _save_npy(os.path.join(path, "centroids.npy"), centroids.astype(np.float32))
+        _write_main(os.path.join(path, "main.0"), np.empty((0, dim), dtype=np.float16),
+                    np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.zeros(nlist + 1, dtype=np.int64))
+        _write_meta(path, {"format_version": FORMAT_VERSION, "input_dim": int(sample.shape[1]), "dim": dim,
+                           "nlist": nlist, "generation": 0})
+        return cls(path, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.delta_ids)
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        """Reduce input vectors to unit vectors in the index space."""
+        return _normalize((_normalize(vectors) - self.mean) @ self.projection)
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray, compact: bool = True):
+        """
+        Append vectors to the delta segment.
+
+        Args:
+            vectors: (N, input dim) vectors
+            ids: N int64 ids returned by search()
+            compact: Merge into the main segment if the delta grew past max_delta
+        """
+        vectors = _normalize(np.atleast_2d(vectors))
+        reduced = self.project(vectors).astype(np.float16)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if len(ids) != len(reduced):
+            raise ValueError("vectors and ids differ in length")
+        with self._lock:
+            first = len(self.full)
+            with open(self._file("full.f16"), "ab") as f:
+                vectors.astype(np.float16).tofile(f)
+            positions = np.arange(first, first + len(ids), dtype=np.int64)
+            for suffix, array in (("f16", reduced), ("ids", ids), ("pos", positions)):
+                with open(self._delta_file(suffix), "ab") as f:
+                    array.tofile(f)
+            self.delta_vectors = np.concatenate([self.delta_vectors, reduced])
+            self.delta_ids = np.concatenate([self.delta_ids, ids])
+            self.delta_positions = np.concatenate([self.delta_positions, positions])
+            self._open_full()
+            if compact and len(self.delta_ids) > self.max_delta:
+                self.compact()
+
+    def _assign(self, reduced: np.ndarray, batch_size: int = 16384) -> np.ndarray:
+        """Closest cluster of each reduced vector, in batches to bound memory."""
+        labels = np.empty(len(reduced), dtype=np.int64)
+        for start in range(0, len(reduced), batch_size):
+            batch = reduced[start:start + batch_size].astype(np.float32)
+            labels[start:start + batch_size] = np.argmax(batch @ self.centroids.T, axis=1)
+        return labels
+
+    def compact(self):
+        """Merge the delta segment into the cluster-sorted main segment."""
+        with self._lock:
+            if len(self.delta_ids):
+                self._rewrite()
+
+    def truncate(self, limit: int):
+        """
+        Drop the vectors whose id is `limit` or higher (and merge the delta segment).
+
+        For owners that number ids by their own records, to drop vectors
+        added just before a crash kept their record from being written.
+        """
+        with self._lock:
+            if (np.asarray(self.ids) >= limit).any() or (self.delta_ids >= limit).any():
+                self._rewrite(limit)
+
+    def _rewrite(self, limit: Optional[int] = None):
+        """Write main and delta, minus ids from `limit` on, as the next generation's main segment."""
+        main_labels = np.repeat(np.arange(self.nlist), np.diff(self.offsets))
+        labels = np.concatenate([main_labels, self._assign(self.delta_vectors)])
+        vectors = np.concatenate([np.asarray(self.vectors), self.delta_vectors])
+        ids = np.concatenate([np.asarray(self.ids), self.delta_ids])
+        positions = np.concatenate([np.asarray(self.positions), self.delta_positions])
+        if limit is not None:
+            keep = ids < limit
+            labels, vectors, ids, positions = labels[keep], vectors[keep], ids[keep], positions[keep]
+        order = np.argsort(labels, kind="stable")
+        offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(labels, minlength=self.nlist))
+        generation = self.generation + 1
+        _write_main(os.path.join(self.path, f"main.{generation}"), vectors[order], ids[order], positions[order],
+                    offsets)
+
+        # The one step that switches generations; the new one starts with an empty delta
+        _write_meta(self.path, dict(self.meta, generation=generation))
+        self.meta["generation"] = self.generation = generation
+        # The old maps must be dropped before their files are deleted
+        self.vectors = self.ids = self.positions = None
+        self._open_main()
+        self._open_delta()
+        # Also clears what an interrupted compaction left behind
+        _remove_segments(self.path, keep=generation)
+
+    def search(self, queries: np.ndarray, k: int = 10, nprobe: int = DEFAULT_NPROBE,
+               rerank: int = DEFAULT_RERANK) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k cosine neighbours.
+
+        Args:
+            queries: (Q, input dim) query vectors (or one vector)
+            k: Neighbours per query
+            nprobe: Clusters scanned per query
+            rerank: Shortlisted candidates re-scored with the original vectors (0 to skip)
+
+        Returns:
+            tuple: (Q, k) float32 similarities and (Q, k) int64 ids, best
+            first; rows are padded with -inf / -1 if the index has fewer than
+            k vectors
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        reduced = self.project(queries)
+        nprobe = min(nprobe, self.nlist)
+        with self._lock:
+            vectors, ids, positions, offsets = self.vectors, self.ids, self.positions, self.offsets
+            delta = self.delta_vectors, self.delta_ids, self.delta_positions
+            full = self.full
+        probes = np.argpartition(-(reduced @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        scores = np.full((len(reduced), k), -np.inf, dtype=np.float32)
+        found = np.full((len(reduced), k), -1, dtype=np.int64)
+        for row, (query, clusters) in enumerate(zip(reduced, probes)):
+            slices = [slice(offsets[c], offsets[c + 1]) for c in clusters if offsets[c + 1] > offsets[c]]
+            candidate_scores = np.concatenate([vectors[s] for s in slices] + [delta[0]]).astype(np.float32) @ query
+            if not len(candidate_scores):
+                continue
+            candidate_ids = np.concatenate([ids[s] for s in slices] + [delta[1]])
+            candidate_positions = np.concatenate([positions[s] for s in slices] + [delta[2]])
+
+            shortlist = min(max(k, rerank), len(candidate_scores))
+            best = np.argpartition(-candidate_scores, shortlist - 1)[:shortlist]
+            if rerank:
+                # Sorted positions keep the reads from the memory map sequential
+                order = np.argsort(candidate_positions[best])
+                best = best[order]
+                candidate_scores[best] = full[candidate_positions[best]].astype(np.float32) @ queries[row]
+            best = best[np.argsort(-candidate_scores[best], kind="stable")][:k]
+            scores[row, :len(best)] = candidate_scores[best]
+            found[row, :len(best)] = candidate_ids[best]
+        return scores, found
@@ -0,0 +1,131 @@
+"""
+Immutable, hot-reloadable symptom vocabulary backed by enhanced_symptoms.json
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from utils.keyword_matcher import KeywordMatcher
+
+# How many dataset symptoms are promoted into the medium-risk tier
+DATASET_SYMPTOM_LIMIT = 20
+
+
+class Vocabulary(NamedTuple):
+    """A frozen keyword vocabulary and the matcher compiled from it."""
+    high_risk: Tuple[str, ...]
+    medium_risk: Tuple[str, ...]
+    matcher: KeywordMatcher
+    version: str
+
+
+def _dedupe(keywords: Iterable[str], exclude=frozenset()) -> Tuple[str, ...]:
+    """Return keywords as a tuple, dropping repeats and excluded terms, keeping order."""
+    seen = set(exclude)
+    result = []
+    for keyword in keywords:
+        if keyword not in seen:
+            seen.add(keyword)
+            result.append(keyword)
+    return tuple(result)
+
+
+def build_vocabulary(base: Dict[str, Iterable[str]], extra_medium: Iterable[str] = (),
+                     version: str = "base") -> Vocabulary:
+    """
+    Freeze keyword tiers and compile their matcher.
+
+    Args:
+        base: Dictionary with 'high_risk' and 'medium_risk' keyword lists
+        extra_medium: Additional medium-risk keywords (e.g. from the dataset)
+        version: Identifier of the source the vocabulary was built from
+
+    Returns:
+        Vocabulary: Immutable vocabulary snapshot
+    """
+    high = _dedupe(base['high_risk'])
+    medium = _dedupe(list(base['medium_risk']) + list(extra_medium), exclude=frozenset(high))
+    matcher = KeywordMatcher({'high_risk': high, 'medium_risk': medium})
+    return Vocabulary(high, medium, matcher, version)
+
+
+class VocabularyStore:
+    """
+    Loads the dataset vocabulary once and serves it as an immutable snapshot.
+
+    The JSON file is only re-read when its mtime or size changes, and only
+    re-compiled when its content hash changes. A new snapshot replaces the old
+    one in a single reference assignment, so concurrent readers always see
+    either the old or the new vocabulary, never a partially built one.
+    """
+
+    def __init__(self, base: Dict[str, Iterable[str]], json_path: str = "data/enhanced_symptoms.json",
+                 check_interval: float = 1.0):
+        """
+        Args:
+            base: Built-in keyword tiers the dataset symptoms are merged into
+            json_path: Path to enhanced symptoms JSON file
+            check_interval: Minimum seconds between file change checks
+        """
+        self.json_path = json_path
+        self.check_interval = check_interval
+        self._base = build_vocabulary(base)
+        self._current = self._base
+        self._signature: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def base(self) -> Vocabulary:
+        """The built-in vocabulary without dataset symptoms."""
+        return self._base
+
+    def get(self) -> Vocabulary:
+        """
+        Get the current vocabulary, reloading it if the JSON file changed.
+
+        Returns:
+            Vocabulary: Current immutable snapshot
+        """
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._refresh()
+        return self._current
+
+    def _refresh(self):
+        """Reload the snapshot if the file's signature and content changed."""
+        try:
+            stat = os.stat(self.json_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+
+        if signature == self._signature:
+            return
+
+        with self._lock:
+            if signature == self._signature:
+                return
+            if signature is None:
+                self._current = self._base
+                self._signature = None
+                return
+            try:
+                with open(self.json_path, 'rb') as f:
+                    raw = f.read()
+                version = hashlib.sha256(raw).hexdigest()[:16]
+                if version != self._current.version:
+                    enhanced_data = json.loads(raw.decode('utf-8'))
+                    symptoms = enhanced_data.get('symptoms', [])[:DATASET_SYMPTOM_LIMIT]
+                    self._current = build_vocabulary(
+                        {'high_risk': self._base.high_risk, 'medium_risk': self._base.medium_risk},
+                        extra_medium=symptoms,
+                        version=version,
+                    )
+            except Exception as e:
+                print(f"⚠️ Could not load enhanced keywords: {e}")
+            self._signature = signature